@@ -0,0 +1,73 @@
+# benchmarks/bench_cli.py
+#
+# Batch translation from the command line. Writes a directory of generated episodes, translates it with
+# `filmbright-srt translate` on the mock backend into two languages, then runs again for one of them and for a
+# new one, as a user re-running the tool over the same directory would. Reports the wall time and cues per second
+# of each run and checks that no run picks up an earlier output as a source (e.g. "German_French_ep1.srt").
+# Exits non-zero on a regression:
+#
+#     python -m benchmarks.bench_cli
+#     python -m benchmarks.bench_cli --files 20 --cues 400
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check batch translation with the CLI")
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--cues", type=int, default=200)
+    args = parser.parse_args()
+
+    # Nothing is shared between runs, so every run translates what it is given
+    os.environ["SRT_TRANSLATION_MEMORY_PATH"] = ""
+    os.environ["SRT_REVISION_STORE_PATH"] = ""
+    os.environ["SRT_JOB_LOG_PATH"] = ""
+    os.environ["SRT_GLOSSARY_PATH"] = ""
+    os.environ["SRT_MOCK_LATENCY"] = "0"
+    os.environ["SRT_MOCK_TOKENS_PER_SECOND"] = "1000000"
+
+    from benchmarks.bench_prompt_tokens import sample_film
+    from filmbright_srt.cli import main as cli
+    from filmbright_srt.cues import serialize_srt
+
+    directory = tempfile.mkdtemp()
+    sources = [f"ep{number}.srt" for number in range(1, args.files + 1)]
+    for number, name in enumerate(sources):
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(serialize_srt(sample_film(args.cues, seed=number)))
+
+    failures = []
+    print(f"{'run':<28} {'files':>6} {'seconds':>8} {'cues/s':>8}")
+    for languages in (["German", "French"], ["German"], ["Italian"]):
+        before = set(os.listdir(directory))
+        argv = ["translate", directory, "--backend", "mock"]
+        for language in languages:
+            argv += ["--lang", language]
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            status = cli(argv)
+        seconds = time.perf_counter() - started
+        written = sorted(set(os.listdir(directory)) - before)
+        expected = sorted(f"{language}_{name}" for language in languages for name in sources)
+        expected = [name for name in expected if name not in before]
+        cues = len(written) * args.cues
+        print(f"{'+'.join(languages):<28} {len(written):6d} {seconds:8.2f} {cues / max(seconds, 1e-6):8.0f}")
+        if status != 0:
+            failures.append(f"{'+'.join(languages)}: the CLI exited with {status}")
+        if written != expected:
+            unexpected = sorted(set(written) - set(expected))
+            failures.append(f"{'+'.join(languages)}: wrote {', '.join(unexpected) or 'too few files'}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# benchmarks/bench_dedup.py
+#
+# Repeated cue texts ("Yes.", "What?", a chorus) translated once per file. Generates films where a share of the
+# cues repeat a small set of lines, as on music-heavy content, translates them with the mock backend
+# (filmbright_srt.backends.MockBackend) with and without deduplication, and reports the dedup ratio, the
+# requests and tokens sent and the wall time. Exits non-zero when deduplication sends more requests than the same
+# film without it:
+#
+#     python -m benchmarks.bench_dedup
+#     python -m benchmarks.bench_dedup --cues 2000 --repeats 0.1,0.3 --latency-ms 200
+
+import argparse
+import os
+import random
+import sys
+import time
+
+REFRAINS = (
+    "Yes.", "What?", "No.", "Okay.", "Thank you.", "Come on!", "<i>♪ We will, we will rock you ♪</i>",
+    "<i>♪ Oh, baby, baby ♪</i>\n<i>♪ How was I supposed to know? ♪</i>", "[LAUGHS]", "[MUSIC PLAYING]",
+)
+
+
+def film_with_repeats(count, share, seed):
+    from benchmarks.bench_prompt_tokens import sample_film
+
+    rng = random.Random(seed)
+    return [
+        cue.with_text(rng.choice(REFRAINS)) if rng.random() < share else cue
+        for cue in sample_film(count, seed=seed)
+    ]
+
+
+def run(cues, language, deduplicate):
+    from filmbright_srt import translation
+    from filmbright_srt.alignment import AlignmentStats
+    from filmbright_srt.tracing import start_trace
+
+    translation.DEDUPLICATE_CUES = deduplicate
+    stats = AlignmentStats()
+    started = time.perf_counter()
+    with start_trace() as trace:
+        translation.translate_srt(cues, language, stats=stats)
+    seconds = time.perf_counter() - started
+    requests = trace.stages().get("translate.request", {})
+    return {
+        "seconds": seconds,
+        "requests": requests.get("count", 0),
+        "tokens": requests.get("prompt_tokens", 0) + requests.get("completion_tokens", 0),
+        "dedup_ratio": stats.as_dict()["dedup_ratio"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the translation of repeated cue texts")
+    parser.add_argument("--cues", type=int, default=1500)
+    parser.add_argument("--repeats", default="0,0.1,0.2,0.3", help="comma-separated shares of repeated cues")
+    parser.add_argument("--language", default="German")
+    parser.add_argument("--latency-ms", type=float, default=50, help="mock backend latency per request")
+    args = parser.parse_args()
+
+    # Nothing is shared between runs, so the second run cannot reuse the first one's translations
+    os.environ["SRT_TRANSLATION_MEMORY_PATH"] = ""
+    os.environ["SRT_REVISION_STORE_PATH"] = ""
+    os.environ["SRT_JOB_LOG_PATH"] = ""
+    os.environ["SRT_GLOSSARY_PATH"] = ""
+
+    from filmbright_srt.backends import configure_backend
+    from filmbright_srt.ratelimit import configure_scheduler
+
+    configure_backend("mock", latency=args.latency_ms / 1000)
+    configure_scheduler(requests_per_minute=1e9, tokens_per_minute=1e12)
+
+    # Warm up (imports, tokenizer) so that the first film is not slower for it
+    run(film_with_repeats(50, 0, seed=1), args.language, deduplicate=True)
+    print(f"{'repeats':>7} {'dedup':>6} {'requests':>17} {'tokens':>19} {'seconds':>15}")
+    failures = []
+    for share in (float(value) for value in args.repeats.split(",")):
+        cues = film_with_repeats(args.cues, share, seed=7)
+        before = run(cues, args.language, deduplicate=False)
+        after = run(cues, args.language, deduplicate=True)
+        print(
+            f"{share:7.0%} {after['dedup_ratio']:6.1%} {before['requests']:8d} -> {after['requests']:5d} "
+            f"{before['tokens']:8d} -> {after['tokens']:7d} {before['seconds']:6.2f} -> {after['seconds']:5.2f}"
+        )
+        if after["requests"] > before["requests"]:
+            failures.append(
+                f"{share:.0%} repeats: {after['requests']} requests with deduplication, {before['requests']} without"
+            )
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
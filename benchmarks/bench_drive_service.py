@@ -0,0 +1,64 @@
+# benchmarks/bench_drive_service.py
+#
+# Per-request Drive overhead before and after caching the Drive service, measured against the local
+# fake Drive server (no network or real credentials needed):
+#
+#     python -m benchmarks.bench_drive_service --requests 100
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.fake_drive import FakeDriveServer, make_service_account_file
+
+
+def _report(label, timings):
+    timings = sorted(timings)
+    print(
+        f"{label:<34} mean {statistics.mean(timings) * 1000:8.2f} ms   "
+        f"p50 {timings[len(timings) // 2] * 1000:8.2f} ms   "
+        f"p99 {timings[int(len(timings) * 0.99) - 1] * 1000:8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Drive service setup cost per webhook request")
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+
+    server = FakeDriveServer().start()
+    file_id = server.add_file("episode.srt", b"1\n00:00:01,000 --> 00:00:02,000\nHello\n\n" * 500)
+    credentials_path = make_service_account_file(os.path.join(tempfile.mkdtemp(), "credentials.json"), server)
+
+    from google.oauth2.service_account import Credentials
+    from googleapiclient.discovery import build
+    from filmbright_srt import drive
+
+    drive.DRIVE_API_ENDPOINT = server.url
+
+    # Old behaviour: load the key file, parse the discovery document and open a new transport on every request
+    per_request = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        creds = Credentials.from_service_account_file(credentials_path)
+        service = build("drive", "v3", credentials=creds, client_options={"api_endpoint": server.url + "drive/v3/"})
+        drive.download_srt_file(service, file_id)
+        per_request.append(time.perf_counter() - start)
+
+    # New behaviour: cached credentials, discovery document and per-thread transport
+    drive.download_srt_file(drive.get_drive_service(credentials_path), file_id)
+    cached = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        drive.download_srt_file(drive.get_drive_service(credentials_path), file_id)
+        cached.append(time.perf_counter() - start)
+
+    print(f"{args.requests} downloads, token requests: {server.counts.get('POST /token', 0)}")
+    _report("authenticate + build per request", per_request)
+    _report("cached Drive service", cached)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_drive_transfers.py
+#
+# Moving a bundle of subtitle files through Drive (look up names, download, upload the results), one file
+# after another versus batched metadata plus concurrent transfers. Runs against the local fake Drive
+# server with a simulated round-trip latency:
+#
+#     python -m benchmarks.bench_drive_transfers --files 40 --latency-ms 50
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fake_drive import FakeDriveServer, make_service_account_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial versus concurrent Drive bundle transfers")
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    server = FakeDriveServer(latency=args.latency_ms / 1000).start()
+    episode = b"".join(
+        f"{i}\n00:00:{i % 60:02d},000 --> 00:00:{i % 60:02d},900\nLine number {i}\n\n".encode() for i in range(1, 800)
+    )
+    file_ids = [server.add_file(f"episode_{n:02d}.srt", episode) for n in range(1, args.files + 1)]
+    credentials_path = make_service_account_file(os.path.join(tempfile.mkdtemp(), "credentials.json"), server)
+
+    from filmbright_srt import drive, transfers
+
+    drive.DRIVE_API_ENDPOINT = server.url
+    drive.DRIVE_UPLOAD_STATE_PATH = ""
+    service = drive.get_drive_service(credentials_path)
+    service.files().get(fileId=file_ids[0], fields="id").execute()
+
+    # One file at a time: metadata, download and upload are each a blocking round-trip
+    before = server.round_trips
+    start = time.perf_counter()
+    for file_id in file_ids:
+        name = service.files().get(fileId=file_id, fields="name").execute()["name"]
+        content = drive.download_srt_file(service, file_id)
+        drive.upload_file_to_drive(service, content, "German_" + name, "folder")
+    serial = time.perf_counter() - start
+    serial_trips = server.round_trips - before
+
+    # Batched metadata, concurrent downloads and uploads
+    before = server.round_trips
+    start = time.perf_counter()
+    metadata = transfers.get_files_metadata(file_ids, fields="id, name", credentials_path=credentials_path)
+    contents = transfers.download_files(file_ids, credentials_path=credentials_path, max_workers=args.workers)
+    transfers.upload_files(
+        [("German_" + metadata[file_id]["name"], contents[file_id]) for file_id in file_ids],
+        "folder", credentials_path=credentials_path, max_workers=args.workers,
+    )
+    concurrent = time.perf_counter() - start
+    concurrent_trips = server.round_trips - before
+
+    print(f"{args.files} files of {len(episode) / 1024:.0f} KiB, {args.latency_ms:.0f} ms per round-trip")
+    print(f"serial      {serial:7.2f} s   {serial_trips:4d} HTTP requests")
+    print(f"concurrent  {concurrent:7.2f} s   {concurrent_trips:4d} HTTP requests ({args.workers} workers)")
+    print(f"speed-up    {serial / concurrent:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
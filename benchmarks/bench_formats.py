@@ -0,0 +1,112 @@
+# benchmarks/bench_formats.py
+#
+# Subtitle codecs. Writes a generated film as SubRip, WebVTT, ASS and TTML with styling on every cue, then
+# reports per format the document size, read and write throughput, the peak memory of a read next to the
+# size of the document (a streaming read stays well below it plus the parsed cues), whether any tag reached
+# the plain cue text and whether the document is written back byte for byte. The TTML document also has an
+# empty, self-closing paragraph (<p .../>) after every hundredth cue, each of which must read as a cue without text.
+# Exits non-zero when a format leaks tags, reads the wrong number of cues or does not round-trip exactly:
+#
+#     python -m benchmarks.bench_formats
+#     python -m benchmarks.bench_formats --cues 20000
+
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+
+
+def _vtt_time(ms):
+    return f"{ms // 3_600_000:02d}:{ms // 60_000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+
+def _ass_time(ms):
+    return f"{ms // 3_600_000}:{ms // 60_000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000 // 10:02d}"
+
+
+def documents(cues):
+    from filmbright_srt.cues import format_timestamp
+
+    srt = "".join(
+        f"{cue.index}\n{format_timestamp(cue.start_ms)} --> {format_timestamp(cue.end_ms)}\n"
+        + "\n".join(f"<i>{line}</i>" for line in cue.text.split("\n")) + "\n\n"
+        for cue in cues
+    )
+    vtt = "WEBVTT\n\n" + "".join(
+        f"{_vtt_time(cue.start_ms)} --> {_vtt_time(cue.end_ms)} line:90% align:center\n<v Speaker>"
+        + cue.text + "</v>\n\n"
+        for cue in cues
+    )
+    ass = (
+        "[Script Info]\nScriptType: v4.00+\n\n[V4+ Styles]\nFormat: Name, Fontname, Fontsize\nStyle: Default,Arial,20"
+        "\n\n[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+        + "".join(
+            f"Dialogue: 0,{_ass_time(cue.start_ms)},{_ass_time(cue.end_ms)},Default,,0,0,0,,{{\\an8}}"
+            + cue.text.replace("\n", "\\N") + "\n"
+            for cue in cues
+        )
+    )
+    ttml = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<tt xmlns="http://www.w3.org/ns/ttml" '
+        'xmlns:tts="http://www.w3.org/ns/ttml#styling">\n  <body>\n    <div>\n'
+        + "".join(
+            f'      <p begin="{_vtt_time(cue.start_ms)}" end="{_vtt_time(cue.end_ms)}" region="bottom">'
+            f'<span tts:fontStyle="italic">{cue.text.replace(chr(10), "<br/>")}</span></p>\n'
+            + (f'      <p begin="{_vtt_time(cue.end_ms)}" end="{_vtt_time(cue.end_ms)}"/>\n' * (number % 100 == 99))
+            for number, cue in enumerate(cues)
+        )
+        + "    </div>\n  </body>\n</tt>\n"
+    )
+    return {"srt": srt, "vtt": vtt, "ass": ass, "ttml": ttml}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reading and writing each subtitle format")
+    parser.add_argument("--cues", type=int, default=5000)
+    args = parser.parse_args()
+
+    from benchmarks.bench_prompt_tokens import sample_film
+    from filmbright_srt.formats import read_subtitles
+
+    cues = sample_film(args.cues, seed=7)
+    failures = []
+    print(f"{'format':<6} {'KiB':>7} {'read cues/s':>12} {'write cues/s':>13} {'read peak KiB':>14} "
+          f"{'tags in text':>13} {'round trip':>11}")
+    for name, document in documents(cues).items():
+        data = document.encode("utf-8")
+        started = time.perf_counter()
+        subtitles = read_subtitles(io.BytesIO(data), name)
+        read_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        output = io.StringIO()
+        subtitles.write(subtitles.cues, output)
+        write_seconds = time.perf_counter() - started
+
+        tracemalloc.start()
+        read_subtitles(io.BytesIO(data), name)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        tagged = sum(1 for cue in subtitles.cues if "<" in cue.text or "{" in cue.text)
+        expected = len(cues) + (len(cues) // 100 if name == "ttml" else 0)
+        print(
+            f"{name:<6} {len(data) / 1024:7.0f} {len(subtitles.cues) / read_seconds:12.0f} "
+            f"{len(subtitles.cues) / write_seconds:13.0f} {peak / 1024:14.0f} {tagged:13d} "
+            f"{'exact' if output.getvalue() == document else 'differs':>11}"
+        )
+        if tagged:
+            failures.append(f"{name}: tags in the text of {tagged} cues")
+        if len(subtitles.cues) != expected:
+            failures.append(f"{name}: read {len(subtitles.cues)} cues, expected {expected}")
+        if output.getvalue() != document:
+            failures.append(f"{name}: the document is not written back exactly")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
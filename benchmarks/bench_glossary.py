@@ -0,0 +1,74 @@
+# benchmarks/bench_glossary.py
+#
+# Glossary of names and recurring terms. Times the term index over generated films with a cast of recurring
+# names and reports, per film size, the terms found and the prompt tokens the glossary adds per chunk when each
+# chunk only gets the entries for its own lines, against sending the whole glossary with every chunk:
+#
+#     python -m benchmarks.bench_glossary
+#     python -m benchmarks.bench_glossary --sizes 500,5000 --names 40
+
+import argparse
+import random
+import time
+
+CAST = (
+    "Walter", "Jesse", "Skyler", "Hank", "Marie", "Saul Goodman", "Gus Fring", "Mike", "Todd", "Lydia",
+    "Los Angeles", "Albuquerque", "the DEA", "Los Pollos Hermanos", "Mr. White", "Dr. Delcavoli",
+)
+SURNAMES = ("Baker", "Kovac", "Reyes", "Molina", "Tanaka", "Lund", "Soto", "Varga", "Okafor", "Brandt")
+
+
+def film_with_names(count, names, seed):
+    from benchmarks.bench_prompt_tokens import sample_film
+
+    rng = random.Random(seed)
+    cues = sample_film(count, seed=seed)
+    # A few characters carry most of the dialogue, as in a real film
+    weights = [1 / rank for rank in range(1, len(names) + 1)]
+    texts = []
+    for cue in cues:
+        text = cue.text
+        if rng.random() < 0.35:
+            text = f"{text.rstrip('.?!')}, {rng.choices(names, weights)[0]}."
+        texts.append(cue.with_text(text))
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the glossary term index and its prompt overhead")
+    parser.add_argument("--sizes", default="500,2000,20000", help="comma-separated film sizes in cues")
+    parser.add_argument("--names", type=int, default=80, help="recurring names and terms in each film")
+    args = parser.parse_args()
+
+    from filmbright_srt.chunking import CHUNK_TOKEN_BUDGET, estimate_tokens, make_chunks
+    from filmbright_srt.glossary import Glossary, TermIndex
+
+    # The cast first, then the first ten of them with other surnames ("Walter Kovac") for any further names
+    names = [
+        CAST[number] if number < len(CAST) else f"{CAST[number % 10]} {SURNAMES[number // 10 % len(SURNAMES)]}"
+        for number in range(args.names)
+    ]
+    print(f"{'cues':>6} {'index ms':>9} {'terms':>6} {'chunks':>7} {'entries/chunk':>14} "
+          f"{'tokens/chunk':>13} {'whole glossary':>15}")
+    for count in (int(size) for size in args.sizes.split(",")):
+        cues = film_with_names(count, names, seed=count)
+        started = time.perf_counter()
+        index = TermIndex(cues)
+        seconds = time.perf_counter() - started
+        terms = index.recurring()
+        glossary = Glossary(index, {term: f"<{term}>" for term in terms})
+        chunks = make_chunks(
+            list(range(len(cues))), max_tokens=CHUNK_TOKEN_BUDGET,
+            size=lambda position: estimate_tokens(cues[position].text),
+        )
+        entries = [glossary.entries(chunk.items) for chunk in chunks]
+        tokens = [estimate_tokens("\n".join(f"{term} = {text}" for term, text in found)) for found in entries]
+        whole = estimate_tokens("\n".join(f"{term} = {text}" for term, text in glossary.translations.items()))
+        print(
+            f"{count:6d} {seconds * 1000:9.2f} {len(terms):6d} {len(chunks):7d} "
+            f"{sum(map(len, entries)) / len(chunks):14.1f} {sum(tokens) / len(chunks):13.1f} {whole:15d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_import_time.py
+#
+# Measures cold import time of the filmbright_srt modules with `python -X importtime` and checks that the
+# light modules do not pull in heavy optional dependencies. Exits non-zero on a regression:
+#
+#     python -m benchmarks.bench_import_time
+#     python -m benchmarks.bench_import_time --budget-ms 150 --runs 5
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+HEAVY = [
+    "openai", "httpx", "googleapiclient", "google", "flask", "starlette", "PIL", "streamlit", "numpy", "tiktoken",
+    "requests",
+]
+
+# Modules imported on every Streamlit rerun, CLI start or webhook boot, and the heavy dependencies that each of
+# them must only load once it is actually used
+GUARDED_MODULES = {
+    "filmbright_srt.cues": HEAVY,
+    "filmbright_srt.chunking": HEAVY,
+    "filmbright_srt.translation": HEAVY,
+    "filmbright_srt.batch": HEAVY,
+    "filmbright_srt.cli": HEAVY,
+    "filmbright_srt.webhook": HEAVY,
+}
+
+
+# Run `python -X importtime -c "import module"` and return (total microseconds, {module name: cumulative us})
+def import_profile(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.setdefault(name.strip(), int(cumulative))
+    return modules.get(module, 0), modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time regression check for filmbright_srt")
+    parser.add_argument("--runs", type=int, default=3, help="imports per module (the median is reported)")
+    parser.add_argument("--budget-ms", type=float, default=200.0, help="maximum median import time per module")
+    parser.add_argument("--top", type=int, default=5, help="slowest dependencies to list per module")
+    args = parser.parse_args()
+
+    failures = []
+    for module, forbidden in GUARDED_MODULES.items():
+        totals = []
+        for _ in range(args.runs):
+            total, modules = import_profile(module)
+            totals.append(total)
+        median_ms = statistics.median(totals) / 1000
+        loaded = sorted({name.split(".")[0] for name in modules} & set(forbidden))
+        slowest = sorted(
+            ((us, name) for name, us in modules.items() if name != module and "." not in name),
+            reverse=True,
+        )[:args.top]
+
+        print(f"{module:<28} {median_ms:8.1f} ms")
+        for us, name in slowest:
+            print(f"    {name:<32} {us / 1000:8.1f} ms")
+        if median_ms > args.budget_ms:
+            failures.append(f"{module} takes {median_ms:.1f} ms to import (budget {args.budget_ms:.0f} ms)")
+        if loaded:
+            failures.append(f"{module} imports heavy dependencies at import time: {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# benchmarks/bench_openai_client.py
+#
+# Compares the per-call cost of building a new OpenAI client (the old translate_text
+# behaviour) with reusing the pooled client from filmbright_srt.clients.
+# Requests go to a local stand-in for the chat completions endpoint, so no API key is needed:
+#
+#     python -m benchmarks.bench_openai_client --calls 200
+#
+# Against the real API (TLS handshakes included), set OPENAI_BASE_URL and
+# OPEN_AI_KEY_SRT_FILMBRIGHT and pass --no-local-server.
+
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETION = json.dumps({
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "[1]\nHola"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13},
+}).encode("utf-8")
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _call(client):
+    client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "[1]\nHello"}])
+
+
+def _report(label, timings):
+    timings = sorted(timings)
+    print(
+        f"{label:<28} mean {statistics.mean(timings) * 1000:8.2f} ms   "
+        f"p50 {timings[len(timings) // 2] * 1000:8.2f} ms   "
+        f"p99 {timings[int(len(timings) * 0.99) - 1] * 1000:8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OpenAI client setup cost per call")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--no-local-server", action="store_true")
+    args = parser.parse_args()
+
+    if not args.no_local_server:
+        server = start_local_server()
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ.setdefault("OPEN_AI_KEY_SRT_FILMBRIGHT", "sk-bench")
+
+    from openai import OpenAI
+    from filmbright_srt import clients
+
+    api_key = os.environ["OPEN_AI_KEY_SRT_FILMBRIGHT"]
+
+    # Client construction alone
+    construct = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        OpenAI(api_key=api_key).close()
+        construct.append(time.perf_counter() - start)
+
+    # Old behaviour: a new client (and connection pool) for every request
+    per_call = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        client = OpenAI(api_key=api_key)
+        _call(client)
+        client.close()
+        per_call.append(time.perf_counter() - start)
+
+    # New behaviour: one pooled client with keep-alive connections
+    clients.OPENAI_API_KEY = api_key
+    _call(clients.get_openai_client())
+    pooled = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        _call(clients.get_openai_client())
+        pooled.append(time.perf_counter() - start)
+    clients.close_openai_client()
+
+    print(f"{args.calls} calls, HTTP/2 available: {clients.HTTP2_AVAILABLE}")
+    _report("client construction only", construct)
+    _report("new client per call", per_call)
+    _report("pooled client", pooled)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# benchmarks/bench_pipeline.py
+#
+# End-to-end benchmark suite for the translation pipeline, offline: the stages run on synthetic films and
+# the model is the mock backend (filmbright_srt.backends.MockBackend), so no API key is spent. For every film
+# size each stage is run --repeat times and reported with its throughput, p50/p99 run time and peak memory:
+#
+#   parse      SRT bytes to cues
+#   chunk      translation memory lookup and token-budgeted chunking
+#   translate  the whole of translate_srt against the mock backend (alignment, retries, subtitle limits)
+#   validate   line alignment of every chunk's answer plus the subtitle limit check of the whole film
+#   serialize  cues back to SRT text
+#
+#     python -m benchmarks.bench_pipeline
+#     python -m benchmarks.bench_pipeline --sizes 100,20000 --latency-ms 50 --error-rate 0.05
+#     python -m benchmarks.bench_pipeline --save baseline.json
+#     python -m benchmarks.bench_pipeline --compare baseline.json --tolerance 0.25
+#
+# With --compare it exits non-zero when a stage's p50 or peak memory grew by more than the tolerance.
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+STAGES = ("parse", "chunk", "translate", "validate", "serialize")
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# Run fn() `repeat` times for timings, then once more under tracemalloc for its peak memory
+def measure(fn, repeat):
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "p50_ms": statistics.median(seconds) * 1000,
+        "p99_ms": _percentile(seconds, 0.99) * 1000,
+        "peak_mib": peak / 2 ** 20,
+    }
+
+
+def bench_size(count, language, repeat):
+    from benchmarks.bench_prompt_tokens import sample_film
+    from filmbright_srt import readability, translation
+    from filmbright_srt.alignment import validate_lines
+    from filmbright_srt.backends import get_backend
+    from filmbright_srt.cues import iter_numbered_lines, parse_srt, serialize_srt
+
+    cues = sample_film(count, seed=count)
+    data = serialize_srt(cues).encode("utf-8")
+    _, chunks, _ = translation._plan_translation(cues, language, None)
+    backend = get_backend()
+    answers = []
+    for chunk in chunks:
+        text, context_before, context_after = translation._chunk_prompt(cues, chunk)
+        messages = translation._build_messages(text, language, context_before, context_after)
+        answers.append((chunk, backend._answer(messages).content))
+    translated = parse_srt(translation.translate_srt(cues, language).encode("utf-8"))
+    times = readability.cue_times(cues)
+    sources = [cue.text for cue in cues]
+
+    def validate():
+        for chunk, content in answers:
+            validate_lines(iter_numbered_lines([content]), [cues[position].text for position in chunk.items])
+        readability.violations(*times, sources, [cue.text for cue in translated])
+
+    stages = {
+        "parse": lambda: parse_srt(data),
+        "chunk": lambda: translation._plan_translation(cues, language, None),
+        "translate": lambda: translation.translate_srt(cues, language),
+        "validate": validate,
+        "serialize": lambda: serialize_srt(translated),
+    }
+    results = {}
+    for stage in STAGES:
+        result = measure(stages[stage], repeat)
+        result["cues_per_s"] = count / (result["p50_ms"] / 1000) if result["p50_ms"] else float("inf")
+        results[stage] = result
+    return results
+
+
+# Regressions of `results` against a saved baseline: p50 or peak memory more than `tolerance` above it
+def regressions(results, baseline, tolerance):
+    found = []
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            before = baseline.get(size, {}).get(stage)
+            if not before:
+                continue
+            for metric in ("p50_ms", "peak_mib"):
+                if result[metric] > before[metric] * (1 + tolerance) and result[metric] - before[metric] > 0.5:
+                    found.append(f"{size} cues {stage}: {metric} {before[metric]:.2f} -> {result[metric]:.2f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the translation pipeline")
+    parser.add_argument("--sizes", default="100,1000,5000,20000", help="comma-separated film sizes in cues")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per stage (p50/p99 over these)")
+    parser.add_argument("--language", default="German")
+    parser.add_argument("--latency-ms", type=float, default=0, help="mock backend latency per request")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="mock generation speed (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0, help="share of mock requests that fail")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth over the baseline")
+    args = parser.parse_args()
+
+    # Nothing is shared between runs, so every translate run does the full amount of work
+    os.environ["SRT_TRANSLATION_MEMORY_PATH"] = ""
+    os.environ["SRT_REVISION_STORE_PATH"] = ""
+    os.environ["SRT_JOB_LOG_PATH"] = ""
+    os.environ.setdefault("OPENAI_RETRY_BASE_DELAY", "0.01")
+
+    from filmbright_srt.backends import configure_backend
+    from filmbright_srt.ratelimit import configure_scheduler
+
+    configure_backend(
+        "mock", latency=args.latency_ms / 1000, tokens_per_second=args.tokens_per_second, error_rate=args.error_rate
+    )
+    configure_scheduler(requests_per_minute=1e9, tokens_per_minute=1e12)
+
+    results = {}
+    print(f"{'cues':>6} {'stage':<10} {'cues/s':>12} {'p50 ms':>10} {'p99 ms':>10} {'peak MiB':>9}")
+    for count in (int(size) for size in args.sizes.split(",")):
+        results[str(count)] = bench_size(count, args.language, args.repeat)
+        for stage, result in results[str(count)].items():
+            print(
+                f"{count:6d} {stage:<10} {result['cues_per_s']:12.0f} {result['p50_ms']:10.2f} "
+                f"{result['p99_ms']:10.2f} {result['peak_mib']:9.2f}"
+            )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+        print(f"No regressions over {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# benchmarks/bench_prompt_tokens.py
+#
+# Tokens per cue sent to (and expected back from) the model for three prompt formats, over the same chunks:
+#   full SRT        - the original prompt: whole SRT blocks with numbers and timecodes, instructions and example
+#                     in every user message
+#   numbered blocks - prompt version 2: "[n]" blocks, instructions and example still in every user message
+#   numbered lines  - current prompt: "n|text" lines, instructions in a shared system message
+#
+#     python -m benchmarks.bench_prompt_tokens                # generated sample films
+#     python -m benchmarks.bench_prompt_tokens film1.srt film2.srt
+
+import argparse
+import os
+import random
+
+from filmbright_srt import translation
+from filmbright_srt.cues import Cue, parse_srt, serialize_srt
+from filmbright_srt.estimator import _encoding, count_tokens
+
+WORDS = (
+    "I you we they it what where why how never always maybe tonight tomorrow money house car door gun "
+    "know think want need going come look listen wait stop tell said sure right okay really just now "
+    "here there back again sorry please thanks father mother brother friend police doctor boss"
+).split()
+
+FULL_SRT_PROMPT = """
+    You are a professional subtitle translator. Your task is to translate the content of an SRT file into {language}. 
+    Ensure the following:
+
+    1. Maintain natural flow and readability typical of subtitles in movies or videos.
+    2. Keep each translated subtitle's duration and text length approximately similar to the original for synchronization purposes.
+    3. Preserve context and cultural nuances while adapting to the linguistic style of the target language.
+    4. Ensure consistent formatting, avoiding any changes to the timecodes or the SRT file structure.
+
+    Generate the translated output in the same format, replacing the original text 
+    with the translated text. Only output the text and numbers and timecodes, no additional comments from you or anything.
+
+    Example Input:
+    1
+    00:00:01,000 --> 00:00:03,000
+    Hello, how are you?
+
+    2
+    00:00:04,000 --> 00:00:06,000
+    I'm doing great, thank you.
+
+    Example Output:
+    1
+    00:00:01,000 --> 00:00:03,000
+    Hola, ¿cómo estás?
+
+    2
+    00:00:04,000 --> 00:00:06,000
+    Estoy muy bien, gracias.
+
+    Input:
+    {text}
+
+    Note: If a word-for-word translation would seem unnatural in {language}, adapt the translation to align with 
+    commonly used expressions in that language. Try to make use of the overall context in the original language to 
+    improve your response. Your output must always be in the format specified by the example output section, 
+    and only include the translations and the timecode with the matching numbers and values
+    """
+
+NUMBERED_BLOCKS_PROMPT = """
+    You are a professional subtitle translator. Your task is to translate subtitle texts into {language}. 
+    Each subtitle is introduced by its number in square brackets. Ensure the following:
+
+    1. Maintain natural flow and readability typical of subtitles in movies or videos.
+    2. Keep each translated subtitle's text length approximately similar to the original for synchronization purposes.
+    3. Preserve context and cultural nuances while adapting to the linguistic style of the target language.
+    4. Keep every subtitle under its own [number] marker and keep its line breaks; never merge, split or skip subtitles.
+
+    Generate the translated output in the same format, replacing the original text 
+    with the translated text. Only output the markers and the translations, no additional comments from you or anything.
+
+    Example Input:
+    [1]
+    Hello, how are you?
+
+    [2]
+    I'm doing great, thank you.
+
+    Example Output:
+    [1]
+    Hola, ¿cómo estás?
+
+    [2]
+    Estoy muy bien, gracias.
+
+    {context}Input:
+    {text}
+
+    Note: If a word-for-word translation would seem unnatural in {language}, adapt the translation to align with 
+    commonly used expressions in that language. Try to make use of the overall context in the original language to 
+    improve your response. Your output must always be in the format specified by the example output section, 
+    and only include the translations under the matching [number] markers
+    """
+LEGACY_SYSTEM_MESSAGE = "You are a professional translation assistant."
+
+
+# A synthetic film: dialogue cues of one or two lines with realistic lengths and timings
+def sample_film(cue_count, seed):
+    rng = random.Random(seed)
+    cues = []
+    start = 0
+    for index in range(1, cue_count + 1):
+        lines = []
+        for _ in range(rng.choice((1, 1, 2))):
+            line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 8)))
+            lines.append(line.capitalize() + rng.choice((".", "?", "!", "...")))
+        start += rng.randint(500, 4000)
+        end = start + rng.randint(1000, 4500)
+        cues.append(Cue(index, start, end, "\n".join(lines)))
+        start = end
+    return cues
+
+
+def _blocks(cues):
+    return "\n\n".join(f"[{cue.index}]\n{cue.text}" for cue in cues)
+
+
+# Context section of prompt version 2
+def _context_v2(context_before, context_after):
+    if not (context_before or context_after):
+        return ""
+    section = "The following subtitles surround the input. Use them only as context and do not translate or output them.\n"
+    if context_before:
+        section += f"\n    Preceding subtitles:\n    {context_before}\n"
+    if context_after:
+        section += f"\n    Following subtitles:\n    {context_after}\n"
+    return section + "\n    "
+
+
+def _tokens(*texts):
+    return sum(count_tokens(text, translation.TRANSLATION_MODEL) for text in texts)
+
+
+# (input tokens, output tokens) for every chunk of a film in each prompt format
+def measure(cues, language):
+    _, chunks, _ = translation._plan_translation(cues, language, None)
+    totals = {"full SRT": [0, 0], "numbered blocks": [0, 0], "numbered lines": [0, 0]}
+    for chunk in chunks:
+        chunk_cues = [cues[position] for position in chunk.items]
+        first, last = chunk.items[0], chunk.items[-1]
+        before = cues[max(0, first - translation.CHUNK_CONTEXT_ITEMS):first]
+        after = cues[last + 1:last + 1 + translation.CHUNK_CONTEXT_ITEMS]
+
+        srt = serialize_srt(chunk_cues)
+        totals["full SRT"][0] += _tokens(LEGACY_SYSTEM_MESSAGE, FULL_SRT_PROMPT.format(language=language, text=srt))
+        totals["full SRT"][1] += _tokens(srt)
+
+        blocks = _blocks(chunk_cues)
+        context = _context_v2(_blocks(before), _blocks(after))
+        prompt = NUMBERED_BLOCKS_PROMPT.format(language=language, text=blocks, context=context)
+        totals["numbered blocks"][0] += _tokens(LEGACY_SYSTEM_MESSAGE, prompt)
+        totals["numbered blocks"][1] += _tokens(blocks)
+
+        text, context_before, context_after = translation._chunk_prompt(cues, chunk)
+        messages = translation._build_messages(text, language, context_before, context_after)
+        totals["numbered lines"][0] += _tokens(*(message["content"] for message in messages))
+        totals["numbered lines"][1] += _tokens(text)
+    return len(chunks), totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare prompt tokens per cue across prompt formats")
+    parser.add_argument("paths", nargs="*", help="SRT files to measure (default: generated sample films)")
+    parser.add_argument("--language", default="German")
+    args = parser.parse_args()
+
+    if args.paths:
+        films = [(os.path.basename(path), parse_srt(path)) for path in args.paths]
+    else:
+        films = [("short (120 cues)", sample_film(120, 1)), ("episode (450 cues)", sample_film(450, 2)),
+                 ("feature (1400 cues)", sample_film(1400, 3))]
+
+    tokenizer = "tiktoken" if _encoding(translation.TRANSLATION_MODEL) is not None else "4 characters/token estimate"
+    print(f"Token counts via {tokenizer}; chunk budget {translation.CHUNK_TOKEN_BUDGET} tokens\n")
+    print(f"{'film':<22} {'format':<16} {'chunks':>6} {'in/cue':>8} {'out/cue':>8} {'in total':>10}")
+    for name, cues in films:
+        chunk_count, totals = measure(cues, args.language)
+        baseline = totals["full SRT"][0]
+        for label, (input_tokens, output_tokens) in totals.items():
+            print(
+                f"{name:<22} {label:<16} {chunk_count:>6} {input_tokens / len(cues):>8.1f} "
+                f"{output_tokens / len(cues):>8.1f} {input_tokens:>10}  ({input_tokens / baseline:.0%})"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_readability.py
+#
+# Subtitle limits after translation. Times the vectorized check of line length, line count and reading speed
+# over whole films against a per-cue Python loop, then runs the translation pipeline against the local fake
+# chat completions server (whose "translations" are longer than the source) and reports how many cues were
+# re-wrapped locally and how many had to go back to the model:
+#
+#     python -m benchmarks.bench_readability --cues 1500
+
+import argparse
+import os
+import time
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+
+# The same check one cue at a time, without NumPy
+def violations_loop(cues, source_texts, texts, max_line_length, max_lines, max_cps):
+    from filmbright_srt.readability import visible_length
+
+    broken = []
+    for number, (cue, source, text) in enumerate(zip(cues, source_texts, texts)):
+        seconds = max(cue.end_ms - cue.start_ms, 1) / 1000
+        lines = [visible_length(line) for line in text.split("\n")]
+        cps = sum(lines) / seconds
+        source_cps = sum(visible_length(line) for line in source.split("\n")) / seconds
+        if max(lines) > max_line_length or len(lines) > max_lines or (cps > max_cps and cps > source_cps):
+            broken.append(number)
+    return broken
+
+
+def best_of(fn, runs=5):
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the subtitle limit checks and re-wrapping")
+    parser.add_argument("--cues", type=int, default=1500)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer().start()
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ.setdefault("OPEN_AI_KEY_SRT_FILMBRIGHT", "sk-bench")
+    os.environ["SRT_TRANSLATION_MEMORY_PATH"] = ""
+    os.environ["SRT_REVISION_STORE_PATH"] = ""
+    os.environ["SRT_JOB_LOG_PATH"] = ""
+
+    from benchmarks.bench_prompt_tokens import sample_film
+    from filmbright_srt import readability
+    from filmbright_srt.alignment import AlignmentStats
+    from filmbright_srt.cues import parse_srt
+    from filmbright_srt.translation import translate_srt
+
+    limits = (readability.MAX_LINE_LENGTH, readability.MAX_LINES, readability.MAX_CHARS_PER_SECOND)
+    print(f"limits: {limits[0]} characters per line, {limits[1]} lines, {limits[2]:g} characters per second\n")
+    for count in (args.cues, args.cues * 10):
+        cues = sample_film(count, seed=3)
+        sources = [cue.text for cue in cues]
+        texts = [f"[Finnish] {text} ja niin edelleen" for text in sources]
+        vectorized, found = best_of(
+            lambda: readability.violations(*readability.cue_times(cues), sources, texts, *limits)
+        )
+        loop, expected = best_of(lambda: violations_loop(cues, sources, texts, *limits))
+        assert found == expected
+        print(
+            f"{count:6d} cues  numpy {vectorized * 1000:7.2f} ms   python loop {loop * 1000:7.2f} ms   "
+            f"{len(found)} cues over the limits"
+        )
+
+    cues = sample_film(args.cues, seed=3)
+    stats = AlignmentStats()
+    started = time.perf_counter()
+    output = parse_srt(translate_srt(cues, "Finnish", stats=stats).encode("utf-8"))
+    seconds = time.perf_counter() - started
+    left = readability.violations(*readability.cue_times(output), [cue.text for cue in cues],
+                                  [cue.text for cue in output], *limits)
+    print(
+        f"\ntranslation of {args.cues} cues in {seconds:.2f} s: {stats['rewrapped']} re-wrapped locally, "
+        f"{stats['shorten_requested']} sent back in {stats['shorten_requests']} requests, "
+        f"{stats['shortened']} shortened, {len(left)} left over the limits"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_revisions.py
+#
+# Cost of re-translating an edited revision of a film: a few cue texts changed and every timing shifted.
+# Runs the whole translation pipeline against the local fake chat completions server and counts the cue
+# lines actually sent to the model. The translation memory is disabled so only the revision store counts:
+#
+#     python -m benchmarks.bench_revisions --cues 1200 --edits 10
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental re-translation of an edited revision")
+    parser.add_argument("--cues", type=int, default=1200)
+    parser.add_argument("--edits", type=int, default=10)
+    parser.add_argument("--shift-ms", type=int, default=750)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer().start()
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ.setdefault("OPEN_AI_KEY_SRT_FILMBRIGHT", "sk-bench")
+    os.environ["SRT_TRANSLATION_MEMORY_PATH"] = ""
+    os.environ["SRT_JOB_LOG_PATH"] = ""
+    os.environ["SRT_REVISION_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "revisions.sqlite3")
+
+    from benchmarks.bench_prompt_tokens import sample_film
+    from filmbright_srt.alignment import AlignmentStats
+    from filmbright_srt.cues import Cue, parse_srt
+    from filmbright_srt.translation import translate_srt
+
+    first = sample_film(args.cues, seed=7)
+    rng = random.Random(11)
+    edited = set(rng.sample(range(len(first)), args.edits))
+    second = [
+        Cue(
+            cue.index, cue.start_ms + args.shift_ms, cue.end_ms + args.shift_ms,
+            cue.text + " (fixed)" if position in edited else cue.text,
+        )
+        for position, cue in enumerate(first)
+    ]
+
+    print(f"{args.cues} cues; revision 2 edits {args.edits} texts and shifts every cue by {args.shift_ms} ms\n")
+    for label, cues in (("revision 1", first), ("revision 2", second), ("revision 2 again", second)):
+        server.reset()
+        stats = AlignmentStats()
+        started = time.perf_counter()
+        output = translate_srt(cues, "German", stats=stats, revision_key="bench-film")
+        seconds = time.perf_counter() - started
+        print(
+            f"{label:<17} {server.lines:5d} lines sent in {server.requests:3d} requests, "
+            f"{stats['reused']:5d} carried over, {seconds:6.2f} s"
+        )
+    translated = parse_srt(output.encode("utf-8"))
+    retimed = all((a.start_ms, a.end_ms) == (b.start_ms, b.end_ms) for a, b in zip(translated, second))
+    print(f"\nOutput follows the shifted timings: {'yes' if retimed else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_routing.py
+#
+# Model tiers. Translates generated films with the mock backend (filmbright_srt.backends.MockBackend) under each
+# routing policy and reports, per policy, the cues sent to each tier, the cues escalated to the premium model,
+# the requests in all (auto should send about as many as premium), the requests, average latency and cost of
+# each model and the wall time:
+#
+#     python -m benchmarks.bench_routing
+#     python -m benchmarks.bench_routing --cues 3000 --policies premium,auto --latency-ms 200
+
+import argparse
+import os
+import time
+
+
+def run(cues, language, policy):
+    from filmbright_srt import translation
+    from filmbright_srt.alignment import AlignmentStats
+
+    stats = AlignmentStats()
+    started = time.perf_counter()
+    translation.translate_srt(cues, language, stats=stats, routing=policy)
+    return stats.as_dict(), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the routing of cues to the fast and premium models")
+    parser.add_argument("--cues", type=int, default=2000)
+    parser.add_argument("--repeats", type=float, default=0.1, help="share of short repeated cues in the film")
+    parser.add_argument("--policies", default="premium,auto,fast", help="comma-separated routing modes")
+    parser.add_argument("--language", default="German")
+    parser.add_argument("--latency-ms", type=float, default=50, help="mock backend latency per request")
+    args = parser.parse_args()
+
+    # Nothing is shared between runs, so a later policy cannot reuse an earlier one's translations
+    os.environ["SRT_TRANSLATION_MEMORY_PATH"] = ""
+    os.environ["SRT_REVISION_STORE_PATH"] = ""
+    os.environ["SRT_JOB_LOG_PATH"] = ""
+    os.environ["SRT_GLOSSARY_PATH"] = ""
+
+    from benchmarks.bench_dedup import film_with_repeats
+    from filmbright_srt.backends import configure_backend
+    from filmbright_srt.ratelimit import configure_scheduler
+
+    configure_backend("mock", latency=args.latency_ms / 1000)
+    configure_scheduler(requests_per_minute=1e9, tokens_per_minute=1e12)
+
+    cues = film_with_repeats(args.cues, args.repeats, seed=7)
+    # Warm up (imports, tokenizer) so that the first policy is not slower for it
+    run(cues[:50], args.language, "premium")
+    print(
+        f"{'policy':<8} {'fast':>6} {'premium':>8} {'escalated':>10} {'requests':>9} {'cost ($)':>9} {'seconds':>8}"
+        "  models"
+    )
+    for policy in args.policies.split(","):
+        stats, seconds = run(cues, args.language, policy)
+        models = ", ".join(
+            f"{model} {usage['requests']}x {usage['avg_seconds']:.2f}s ${usage['cost']:.4f}"
+            for model, usage in stats["models"].items()
+        )
+        cost = sum(usage["cost"] for usage in stats["models"].values())
+        requests = sum(usage["requests"] for usage in stats["models"].values())
+        print(
+            f"{policy:<8} {stats['fast_cues']:6d} {stats['premium_cues']:8d} {stats['escalated']:10d} "
+            f"{requests:9d} {cost:9.4f} {seconds:8.2f}  {models}"
+        )
+
+
+if __name__ == "__main__":
+    main()
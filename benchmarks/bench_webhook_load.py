@@ -0,0 +1,146 @@
+# benchmarks/bench_webhook_load.py
+#
+# Load test for the ASGI webhook service: fires many /webhook requests at once and waits for every job to
+# finish. Drive and the chat completions API are the local fake servers, each with a simulated latency, and
+# the service runs in its own uvicorn process exactly as in the container (one worker, one event loop):
+#
+#     python -m benchmarks.bench_webhook_load --jobs 200 --cues 300 --model-latency-ms 400
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_drive import FakeDriveServer, make_service_account_file
+from benchmarks.fake_openai import FakeOpenAIServer
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run_load(base_url, file_ids, languages, poll_interval):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=200)) as client:
+        async def post(file_id):
+            started = time.perf_counter()
+            response = await client.post(
+                "/webhook", json={"file_id": file_id, "file_name": "episode.srt", "target_languages": languages}
+            )
+            response.raise_for_status()
+            return time.perf_counter() - started, response.json()["job_id"]
+
+        started = time.perf_counter()
+        accepted = await asyncio.gather(*(post(file_id) for file_id in file_ids))
+        accept_seconds = time.perf_counter() - started
+
+        pending = {job_id for _, job_id in accepted}
+        statuses = {}
+        peak_depth = 0
+        while pending:
+            await asyncio.sleep(poll_interval)
+            peak_depth = max(peak_depth, (await client.get("/rate-limit")).json()["job_queue_depth"])
+            for job_id in list(pending):
+                job = (await client.get(f"/jobs/{job_id}")).json()
+                if job["status"] in ("succeeded", "failed"):
+                    statuses[job_id] = job["status"]
+                    pending.discard(job_id)
+        total_seconds = time.perf_counter() - started
+    return [latency for latency, _ in accepted], accept_seconds, total_seconds, statuses, peak_depth
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the webhook service against stubbed backends")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--cues", type=int, default=300)
+    parser.add_argument("--languages", default="German", help="comma-separated target languages per job")
+    parser.add_argument("--model-latency-ms", type=float, default=400)
+    parser.add_argument("--drive-latency-ms", type=float, default=30)
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    args = parser.parse_args()
+
+    openai_server = FakeOpenAIServer(latency=args.model_latency_ms / 1000).start()
+    drive_server = FakeDriveServer(latency=args.drive_latency_ms / 1000).start()
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        "OPENAI_BASE_URL": openai_server.url,
+        "OPEN_AI_KEY_SRT_FILMBRIGHT": os.environ.get("OPEN_AI_KEY_SRT_FILMBRIGHT", "sk-bench"),
+        "OPENAI_REQUESTS_PER_MINUTE": "1000000",
+        "OPENAI_TOKENS_PER_MINUTE": "1000000000",
+        "SRT_MAX_CONCURRENT_REQUESTS": "256",
+        "OPENAI_MAX_CONNECTIONS": "256",
+        "SRT_TRANSLATION_MEMORY_PATH": "",
+        "SRT_REVISION_STORE_PATH": "",
+        "SRT_JOB_LOG_PATH": "",
+        "SRT_JOB_STORE_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "DRIVE_API_ENDPOINT": drive_server.url,
+        "DRIVE_UPLOAD_STATE_PATH": "",
+        "GOOGLE_CREDENTIALS_JSON_PATH": make_service_account_file(
+            os.path.join(workdir, "credentials.json"), drive_server
+        ),
+    })
+
+    from benchmarks.bench_prompt_tokens import sample_film
+    from filmbright_srt.cues import serialize_srt
+
+    # Every job gets its own file, so nothing is reused between jobs
+    file_ids = [
+        drive_server.add_file(f"episode_{n}.srt", serialize_srt(sample_film(args.cues, seed=n)).encode("utf-8"))
+        for n in range(args.jobs)
+    ]
+    languages = [language.strip() for language in args.languages.split(",") if language.strip()]
+
+    port = _free_port()
+    service = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "webhook_app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    try:
+        _wait_for_port(port)
+        latencies, accept_seconds, total_seconds, statuses, peak_depth = asyncio.run(
+            run_load(f"http://127.0.0.1:{port}", file_ids, languages, args.poll_interval)
+        )
+    finally:
+        service.terminate()
+        service.wait()
+
+    succeeded = sum(1 for status in statuses.values() if status == "succeeded")
+    print(
+        f"{args.jobs} jobs x {len(languages)} languages, {args.cues} cues each; model {args.model_latency_ms:.0f} ms, "
+        f"Drive {args.drive_latency_ms:.0f} ms per round-trip"
+    )
+    print(
+        f"accepted     {accept_seconds:7.2f} s   p50 {statistics.median(latencies) * 1000:6.0f} ms   "
+        f"p99 {_percentile(latencies, 0.99) * 1000:6.0f} ms"
+    )
+    print(f"completed    {total_seconds:7.2f} s   {succeeded}/{args.jobs} succeeded   {args.jobs / total_seconds:.1f} jobs/s")
+    print(f"model calls  {openai_server.requests:7d}     peak jobs in flight {peak_depth}")
+
+
+if __name__ == "__main__":
+    main()
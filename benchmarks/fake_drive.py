@@ -0,0 +1,193 @@
+# benchmarks/fake_drive.py
+#
+# Minimal local stand-in for the Google OAuth token endpoint and the Drive v3 API, enough for the
+# benchmarks to exercise filmbright_srt.drive and filmbright_srt.transfers without network access or
+# real credentials: token exchange, metadata and ranged media downloads, multipart and resumable
+# uploads, and batch requests. `latency` adds a fixed delay to every response to mimic a real round-trip.
+# Point the code at it with DRIVE_API_ENDPOINT=<server.url> and a service-account file from
+# make_service_account_file().
+
+import email
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _json_response(body, status=200):
+    return status, json.dumps(body).encode("utf-8"), {"Content-Type": "application/json"}
+
+
+def _error(status, message):
+    return _json_response({"error": {"code": status, "message": message}}, status)
+
+
+def _parse_multipart(content_type, body):
+    return email.message_from_bytes(b"Content-Type: " + content_type.encode("ascii") + b"\r\n\r\n" + body)
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status, body=b"", headers=None):
+        time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+        self.server.count(f"{self.command} {url.path}")
+        return url, parse_qs(url.query), body
+
+    def do_GET(self):
+        url, query, _ = self._start()
+        self._respond(*self.server.get_file(url.path, query, self.headers.get("Range")))
+
+    def do_POST(self):
+        url, query, body = self._start()
+        if url.path == "/token":
+            self._respond(*_json_response({"access_token": "fake-token", "token_type": "Bearer", "expires_in": 3600}))
+        elif url.path == "/batch/drive/v3":
+            self._respond(*self.server.batch(_parse_multipart(self.headers["Content-Type"], body)))
+        elif url.path == "/upload/drive/v3/files" and query.get("uploadType") == ["multipart"]:
+            metadata_part, media_part = _parse_multipart(self.headers["Content-Type"], body).get_payload()
+            metadata = json.loads(metadata_part.get_payload())
+            self._respond(*_json_response(self.server.store_file(metadata, media_part.get_payload(decode=True))))
+        elif url.path == "/upload/drive/v3/files" and query.get("uploadType") == ["resumable"]:
+            session_id = self.server.open_session(json.loads(body or b"{}"))
+            location = f"{self.server.url}upload/drive/v3/files?uploadType=resumable&upload_id={session_id}"
+            self._respond(200, headers={"Location": location})
+        else:
+            self._respond(*_error(404, f"Unknown path {url.path}"))
+
+    # Resumable upload chunk, or an empty status query ("bytes */total")
+    def do_PUT(self):
+        url, query, body = self._start()
+        session = self.server.sessions.get(query.get("upload_id", [""])[0])
+        if session is None:
+            self._respond(*_error(404, "Upload session not found"))
+            return
+        received, total = re.fullmatch(r"bytes (\*|\d+-\d+)/(\*|\d+)", self.headers["Content-Range"]).groups()
+        if received != "*":
+            start = int(received.split("-")[0])
+            del session["data"][start:]
+            session["data"] += body
+        if total != "*" and len(session["data"]) == int(total):
+            self._respond(*_json_response(self.server.store_file(session["metadata"], bytes(session["data"]))))
+        elif session["data"]:
+            self._respond(308, headers={"Range": f"bytes=0-{len(session['data']) - 1}"})
+        else:
+            self._respond(308)
+
+
+class FakeDriveServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, latency=0.0):
+        super().__init__(("127.0.0.1", 0), FakeDriveHandler)
+        self.latency = latency
+        self.files = {}
+        self.sessions = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    @property
+    def round_trips(self):
+        return sum(self.counts.values())
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def add_file(self, name, data, file_id=None, parents=None):
+        file_id = file_id or uuid.uuid4().hex
+        with self.lock:
+            self.files[file_id] = {
+                "id": file_id, "name": name, "mimeType": "text/plain", "size": str(len(data)),
+                "parents": parents or [], "data": data,
+            }
+        return file_id
+
+    def store_file(self, metadata, data):
+        file_id = self.add_file(metadata.get("name", "untitled"), data, parents=metadata.get("parents"))
+        return {"id": file_id}
+
+    def open_session(self, metadata):
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = {"metadata": metadata, "data": bytearray()}
+        return session_id
+
+    def get_file(self, path, query, range_header=None):
+        match = re.fullmatch(r"/drive/v3/files/([^/]+)", path)
+        file = self.files.get(match.group(1)) if match else None
+        if file is None:
+            return _error(404, "File not found")
+        if query.get("alt") != ["media"]:
+            return _json_response({key: value for key, value in file.items() if key != "data"})
+        data = file["data"]
+        if not range_header:
+            return 200, data, {"Content-Type": "application/octet-stream"}
+        start, end = (int(part) for part in range_header.split("=")[1].split("-"))
+        end = min(end, len(data) - 1)
+        headers = {"Content-Type": "application/octet-stream", "Content-Range": f"bytes {start}-{end}/{len(data)}"}
+        return 206, data[start:end + 1], headers
+
+    # Answer every GET in a multipart/mixed batch request, in one multipart/mixed response
+    def batch(self, message):
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in message.get_payload():
+            method, target, _ = part.get_payload().splitlines()[0].split(" ")
+            if method == "GET":
+                target = urlparse(target)
+                status, body, _ = self.get_file(target.path, parse_qs(target.query))
+            else:
+                status, body, _ = _error(400, "Only GET is supported in batches")
+            content_id = part["Content-ID"].replace("<", "<response-", 1)
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: {content_id}\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n{body.decode('utf-8')}\r\n"
+            )
+        body = ("".join(parts) + f"--{boundary}--\r\n").encode("utf-8")
+        return 200, body, {"Content-Type": f"multipart/mixed; boundary={boundary}"}
+
+
+# Write a throwaway service-account JSON whose token endpoint is the fake server
+def make_service_account_file(path, server):
+    import rsa
+
+    _, private_key = rsa.newkeys(1024)
+    info = {
+        "type": "service_account",
+        "project_id": "fake-project",
+        "private_key_id": "fake-key",
+        "private_key": private_key.save_pkcs1().decode("ascii"),
+        "client_email": "bench@fake-project.iam.gserviceaccount.com",
+        "client_id": "1",
+        "token_uri": server.url + "token",
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    return path
@@ -0,0 +1,89 @@
+# benchmarks/fake_openai.py
+#
+# Local stand-in for the chat completions endpoint that "translates" the numbered lines of the prompt by
+# tagging them with the target language and condensing them to any character limits the prompt gives, so the
+# full translation pipeline can run without an API key. Counts requests and translated lines, and can add a
+# fixed model latency to every answer. Point the client at it with OPENAI_BASE_URL=<server.url>.
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NUMBERED_LINE_RE = re.compile(r"^(\d+)\|(.*)$", re.MULTILINE)
+LANGUAGE_RE = re.compile(r"Translate film subtitles into (.+?)\.")
+LIMIT_RE = re.compile(r"^(\d+): (\d+)$", re.MULTILINE)
+
+
+# Drop words from the end until the text fits a character limit, like a condensed rendition would
+def _shorten(text, limit):
+    words = text.replace("<br>", " ").split()
+    while limit and len(words) > 1 and len(" ".join(words)) > limit:
+        words.pop()
+    return " ".join(words) if limit else text
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        system, user = request["messages"][0]["content"], request["messages"][-1]["content"]
+        language = LANGUAGE_RE.search(system)
+        tag = f"[{language.group(1) if language else 'translated'}] "
+        lines = NUMBERED_LINE_RE.findall(user.split("Translate:\n", 1)[-1].split("\n\nContext:", 1)[0])
+        limits = {number: int(limit) for number, limit in LIMIT_RE.findall(user.split("Translate:\n", 1)[0])}
+        content = "\n".join(f"{number}|{_shorten(tag + text, limits.get(number))}" for number, text in lines)
+        self.server.count(len(lines))
+        time.sleep(self.server.latency)
+        body = json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": 0,
+            "model": request.get("model", "gpt-4"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": len(system + user) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(system + user) + len(content)) // 4,
+            },
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, latency=0.0):
+        super().__init__(("127.0.0.1", 0), FakeOpenAIHandler)
+        self.latency = latency
+        self.requests = 0
+        self.lines = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def count(self, lines):
+        with self._lock:
+            self.requests += 1
+            self.lines += lines
+
+    def reset(self):
+        with self._lock:
+            self.requests = self.lines = 0
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
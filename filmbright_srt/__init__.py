@@ -0,0 +1 @@
+# filmbright_srt/__init__.py
@@ -0,0 +1,6 @@
+# filmbright_srt/__main__.py
+
+import sys
+from filmbright_srt.cli import main
+
+sys.exit(main())
@@ -0,0 +1,148 @@
+# filmbright_srt/alignment.py
+
+import os
+import threading
+from filmbright_srt.estimator import cost_of
+
+# How many more times the cues that failed validation are sent again, on their own
+ALIGNMENT_MAX_RETRIES = int(os.getenv("SRT_ALIGNMENT_MAX_RETRIES", "2"))
+# A line this many times longer than its source, followed by a missing line, is taken as two cues merged into one
+MERGE_LENGTH_RATIO = 1.6
+
+# Problems that make a line unusable, so its cue is re-requested
+FAILURES = ("missing", "empty", "duplicate", "merged")
+ISSUES = FAILURES + ("unexpected",)
+
+
+# Check numbered lines returned by the model against the source texts they translate (line n is source_texts[n - 1]).
+# Returns ({number: text} for the lines that align, {issue: [numbers]}); lines with a number outside the
+# request are ignored, every other problem marks the line as failed.
+def validate_lines(pairs, source_texts):
+    count = len(source_texts)
+    valid = {}
+    issues = {issue: [] for issue in ISSUES}
+    seen = set()
+    for number, text in pairs:
+        if not 1 <= number <= count:
+            issues["unexpected"].append(number)
+        elif number in seen:
+            issues["duplicate"].append(number)
+            valid.pop(number, None)
+        elif not text:
+            issues["empty"].append(number)
+        else:
+            valid[number] = text
+        seen.add(number)
+    duplicates = set(issues["duplicate"])
+    issues["missing"] = [number for number in range(1, count + 1) if number not in seen]
+
+    missing = set(issues["missing"])
+    for number in sorted(valid):
+        if number + 1 in missing and len(valid[number]) > MERGE_LENGTH_RATIO * len(source_texts[number - 1]):
+            issues["merged"].append(number)
+            del valid[number]
+    issues["duplicate"] = sorted(duplicates)
+    return valid, issues
+
+
+# Line numbers to re-request after validate_lines
+def failed_lines(issues):
+    return sorted({number for issue in FAILURES for number in issues[issue]})
+
+
+# Positions of output cues whose number or timing differs from the source cue
+def timing_mismatches(source_cues, output_cues):
+    return [
+        position for position, (source, output) in enumerate(zip(source_cues, output_cues))
+        if (source.index, source.start_ms, source.end_ms) != (output.index, output.start_ms, output.end_ms)
+    ]
+
+
+# Alignment counters for one job, shared by all of its chunks and languages:
+#   requested     cues sent to the model (previous-revision and translation memory hits are not)
+#   revised       cues edited or added since the file's previous revision (when one was found)
+#   deduplicated  cues not sent because they repeat the text of a cue that was; dedup_ratio is their share
+#                 of the cues that needed a translation
+#   aligned       cues whose first answer was valid
+#   retried       cues sent again because their answer failed validation (or was escalated, see below)
+#   repaired      retried cues that came back valid
+#   fallback      cues that never came back valid and keep their source text
+# and the subtitle limits (filmbright_srt.readability) of the translated cues:
+#   rewrapped          cues whose lines were re-wrapped locally
+#   shorten_requested  cues sent back for a shorter rendition, of which `shortened` came back within the limits
+#   over_limits        cues left breaking the limits
+# and the glossary of names and recurring terms (filmbright_srt.glossary):
+#   glossary_terms     pinned terms that occur in the cues sent, per language
+#   glossary_requests  requests that translated new terms
+#   glossary_misses    translated cues that leave out the pinned rendition of one of their terms
+# and the model tiers (filmbright_srt.routing):
+#   fast_cues, premium_cues  cues sent to the fast and to the premium model first
+#   escalated                fast-model cues sent again to the premium model because they failed or looked doubtful
+# The requests, latency, tokens and cost of every model are kept per model (add_usage, "models" in as_dict).
+class AlignmentStats:
+    COUNTERS = (
+        "cues", "reused", "revised", "memory_hits", "requested", "deduplicated", "aligned", "retried", "repaired",
+        "fallback", "requests", "retry_requests", "timing_mismatches",
+        "rewrapped", "shorten_requested", "shortened", "over_limits", "shorten_requests",
+        "glossary_terms", "glossary_requests", "glossary_misses", "fast_cues", "premium_cues", "escalated",
+    ) + ISSUES
+    USAGE = ("requests", "seconds", "prompt_tokens", "completion_tokens", "cost")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.COUNTERS, 0)
+        self._usage = {}
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self._counts[name] += value
+
+    # One finished request on `model`
+    def add_usage(self, model, seconds, prompt_tokens, completion_tokens):
+        with self._lock:
+            usage = self._usage.setdefault(model, dict.fromkeys(self.USAGE, 0))
+            usage["requests"] += 1
+            usage["seconds"] += seconds
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+            usage["cost"] += cost_of(model, prompt_tokens, completion_tokens)
+
+    def add_issues(self, issues):
+        self.add(**{issue: len(numbers) for issue, numbers in issues.items()})
+
+    def __getitem__(self, name):
+        with self._lock:
+            return self._counts[name]
+
+    def as_dict(self):
+        with self._lock:
+            stats = dict(self._counts)
+            models = {model: dict(usage) for model, usage in self._usage.items()}
+        stats["alignment_rate"] = round(stats["aligned"] / stats["requested"], 4) if stats["requested"] else 1.0
+        needed = stats["requested"] + stats["deduplicated"]
+        stats["dedup_ratio"] = round(stats["deduplicated"] / needed, 4) if needed else 0.0
+        for usage in models.values():
+            usage["avg_seconds"] = round(usage["seconds"] / usage["requests"], 3)
+            usage["seconds"] = round(usage["seconds"], 3)
+            usage["cost"] = round(usage["cost"], 6)
+        stats["models"] = models
+        return stats
+
+    def summary(self):
+        stats = self.as_dict()
+        return (
+            f"{stats['requested']} cues translated ({stats['reused']} from the previous revision, "
+            f"{stats['memory_hits']} from memory, {stats['deduplicated']} repeats copied, "
+            f"{stats['dedup_ratio']:.1%} deduplicated), "
+            f"{stats['alignment_rate']:.1%} aligned first time, {stats['retried']} re-requested, "
+            f"{stats['repaired']} repaired, {stats['fallback']} kept in the source language; "
+            f"{stats['rewrapped']} re-wrapped, {stats['shortened']}/{stats['shorten_requested']} shortened, "
+            f"{stats['over_limits']} over the subtitle limits; {stats['glossary_terms']} glossary terms, "
+            f"{stats['glossary_misses']} cues off the glossary; {stats['fast_cues']} cues on the fast model, "
+            f"{stats['premium_cues']} on the premium model, {stats['escalated']} escalated"
+            + "".join(
+                f"; {model}: {usage['requests']} requests, {usage['avg_seconds']:.2f}s average, ${usage['cost']:.4f}"
+                for model, usage in stats["models"].items()
+            )
+        )
@@ -0,0 +1,200 @@
+# filmbright_srt/backends.py
+
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+from filmbright_srt.chunking import estimate_tokens
+from filmbright_srt.clients import get_async_openai_client, get_openai_client
+from filmbright_srt.cues import NUMBERED_LINE_RE
+
+# Where translate_text sends its requests: "openai", or "mock" for the offline stand-in below
+TRANSLATION_BACKEND = os.getenv("SRT_TRANSLATION_BACKEND", "openai")
+# Mock backend: seconds per request, generation speed (0 = instant), share of requests that fail with a
+# transient error and the seed that decides which ones do
+MOCK_LATENCY = float(os.getenv("SRT_MOCK_LATENCY", "0.2"))
+MOCK_TOKENS_PER_SECOND = float(os.getenv("SRT_MOCK_TOKENS_PER_SECOND", "0"))
+MOCK_ERROR_RATE = float(os.getenv("SRT_MOCK_ERROR_RATE", "0"))
+MOCK_SEED = int(os.getenv("SRT_MOCK_SEED", "0"))
+
+LANGUAGE_RE = re.compile(r"into (.+?)\.")
+LIMIT_RE = re.compile(r"^(\d+): (\d+)$", re.MULTILINE)
+
+
+# The answer to one request and its token usage
+class Completion:
+    __slots__ = ("content", "prompt_tokens", "completion_tokens")
+
+    def __init__(self, content, prompt_tokens, completion_tokens):
+        self.content = content
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+
+# A backend answers chat messages for a model with a Completion, asynchronously with complete_async, or as
+# (text fragment, Completion or None) pairs with stream, where the last pair carries the usage. Failures are
+# raised as openai errors, so the rate-limit scheduler retries the transient ones whatever the backend.
+# model_id(model) names the model in the translation memory, revision store and throughput history.
+class OpenAIBackend:
+    name = "openai"
+
+    def model_id(self, model):
+        return model
+
+    def complete(self, model, messages):
+        response = get_openai_client().chat.completions.create(model=model, messages=messages, temperature=0.7)
+        return _completion(response)
+
+    async def complete_async(self, model, messages):
+        response = await get_async_openai_client().chat.completions.create(
+            model=model, messages=messages, temperature=0.7
+        )
+        return _completion(response)
+
+    # The request is made here, so that errors are raised (and retried) before the first fragment
+    def stream(self, model, messages):
+        stream = get_openai_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.7,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        return self._events(stream)
+
+    def _events(self, stream):
+        for event in stream:
+            if event.choices:
+                yield event.choices[0].delta.content or "", None
+            if event.usage:
+                yield "", Completion(None, event.usage.prompt_tokens, event.usage.completion_tokens)
+
+
+def _completion(response):
+    usage = response.usage
+    return Completion(
+        response.choices[0].message.content,
+        usage.prompt_tokens if usage else 0,
+        usage.completion_tokens if usage else 0,
+    )
+
+
+# Offline stand-in for load tests and benchmarks: "translates" every numbered line by tagging it with the
+# target language (condensed to any character limits in the prompt), after a fixed latency plus the time to
+# generate the answer at tokens_per_second. Which requests fail is decided by the seed and the request
+# content, so a run is reproducible whatever the thread scheduling; retries of a failed request draw again.
+class MockBackend:
+    name = "mock"
+
+    def __init__(self, latency=MOCK_LATENCY, tokens_per_second=MOCK_TOKENS_PER_SECOND, error_rate=MOCK_ERROR_RATE,
+                 seed=MOCK_SEED):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.seed = seed
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def model_id(self, model):
+        return f"mock:{model}"
+
+    def complete(self, model, messages):
+        completion = self._answer(messages)
+        time.sleep(self.latency + self._generation_seconds(completion.completion_tokens))
+        return completion
+
+    async def complete_async(self, model, messages):
+        completion = self._answer(messages)
+        await asyncio.sleep(self.latency + self._generation_seconds(completion.completion_tokens))
+        return completion
+
+    def stream(self, model, messages):
+        return self._events(self._answer(messages))
+
+    def _events(self, completion):
+        time.sleep(self.latency)
+        for line in completion.content.splitlines(keepends=True):
+            time.sleep(self._generation_seconds(estimate_tokens(line)))
+            yield line, None
+        yield "", Completion(None, completion.prompt_tokens, completion.completion_tokens)
+
+    def _generation_seconds(self, tokens):
+        return tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0
+
+    def _answer(self, messages):
+        system, user = messages[0]["content"], messages[-1]["content"]
+        self._maybe_fail(system + user)
+        language = LANGUAGE_RE.search(system)
+        tag = f"[{language.group(1) if language else 'translated'}] "
+        sections = user.split("\n\n")
+        lines = next((section for section in sections if section.startswith("Translate:\n")), "").splitlines()[1:]
+        limits = {}
+        for section in sections:
+            if not section.startswith(("Translate:", "Context:")):
+                limits.update((int(number), int(limit)) for number, limit in LIMIT_RE.findall(section))
+        answer = []
+        for line in lines:
+            match = NUMBERED_LINE_RE.match(line)
+            if match:
+                number = int(match.group(1))
+                answer.append(f"{number}|{_condense(tag + match.group(2).strip(), limits.get(number))}")
+        content = "\n".join(answer)
+        return Completion(content, estimate_tokens(system + user), estimate_tokens(content))
+
+    def _maybe_fail(self, content):
+        if self.error_rate <= 0:
+            return
+        key = hashlib.sha1(content.encode("utf-8")).hexdigest()
+        with self._lock:
+            attempt = self._attempts[key] = self._attempts.get(key, 0) + 1
+        draw = hashlib.sha1(f"{self.seed}:{key}:{attempt}".encode("ascii")).digest()
+        if int.from_bytes(draw[:8], "big") / 2 ** 64 < self.error_rate:
+            import httpx
+            import openai
+
+            raise openai.APIConnectionError(request=httpx.Request("POST", "mock://chat/completions"))
+
+
+# Drop words from the end until the text fits a character limit, like a condensed rendition would
+def _condense(text, limit):
+    if not limit:
+        return text
+    words = text.replace("<br>", " ").split()
+    while len(words) > 1 and len(" ".join(words)) > limit:
+        words.pop()
+    return " ".join(words)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+# Process-wide translation backend, chosen by SRT_TRANSLATION_BACKEND
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _make_backend(TRANSLATION_BACKEND)
+        return _backend
+
+
+# Replace the process-wide backend with a backend object or one built by name (e.g. from command-line options)
+def configure_backend(backend, **options):
+    global _backend
+    with _backend_lock:
+        _backend = _make_backend(backend, **options) if isinstance(backend, str) else backend
+        return _backend
+
+
+def _make_backend(name, **options):
+    if name == "openai":
+        return OpenAIBackend(**options)
+    if name == "mock":
+        return MockBackend(**options)
+    raise ValueError(f"Unknown translation backend {name!r} (expected 'openai' or 'mock')")
@@ -0,0 +1,79 @@
+# filmbright_srt/batch.py
+
+import asyncio
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from filmbright_srt.tracing import in_context
+from filmbright_srt.translation import gather_or_cancel, load_subtitles, translate_srt, translate_srt_async
+
+# How many target languages are translated at the same time; the number of simultaneous
+# OpenAI requests is still capped globally by SRT_MAX_CONCURRENT_REQUESTS
+MAX_CONCURRENT_LANGUAGES = int(os.getenv("SRT_MAX_CONCURRENT_LANGUAGES", "4"))
+
+
+# Translate one source into several languages, parsing it once and sharing the cues and translation memory.
+# Returns {language: translated text in the source's format} in the order the languages were given;
+# on_progress(language, done, total) is called from the calling thread each time a language finishes. `stats`
+# (an AlignmentStats) collects the alignment counters of every language; revision_key identifies the file for
+# incremental re-translation, project the glossary it shares with other files (e.g. the episodes of a series)
+# and routing the model tiers.
+def translate_srt_many(
+    source, target_languages, max_languages=MAX_CONCURRENT_LANGUAGES, on_progress=None, stats=None,
+    revision_key=None, project=None, routing=None,
+):
+    subtitles = load_subtitles(source)
+    target_languages = list(dict.fromkeys(target_languages))
+    if not target_languages:
+        return {}
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_languages, len(target_languages)))) as executor:
+        translate = in_context(translate_srt)
+        futures = {
+            executor.submit(
+                translate, subtitles, language, stats=stats, revision_key=revision_key, project=project,
+                routing=routing,
+            ): language
+            for language in target_languages
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if on_progress:
+                on_progress(futures[future], done, len(target_languages))
+    return {language: results[language] for language in target_languages}
+
+
+# translate_srt_many for coroutines: the languages are translated concurrently on the running event loop
+async def translate_srt_many_async(
+    source, target_languages, max_languages=MAX_CONCURRENT_LANGUAGES, stats=None, revision_key=None, project=None,
+    routing=None,
+):
+    subtitles = load_subtitles(source)
+    target_languages = list(dict.fromkeys(target_languages))
+    limit = asyncio.Semaphore(max(1, max_languages))
+
+    async def translate(language):
+        async with limit:
+            return await translate_srt_async(
+                subtitles, language, stats=stats, revision_key=revision_key, project=project, routing=routing
+            )
+
+    results = await gather_or_cancel(translate(language) for language in target_languages)
+    return dict(zip(target_languages, results))
+
+
+# File name used for one language's output, e.g. "German_episode1.srt"
+def translated_file_name(language, file_name):
+    base_name, extension = os.path.splitext(os.path.basename(file_name))
+    return f"{language}_{base_name}{extension or '.srt'}"
+
+
+# Pack {language: translated text} into an in-memory zip archive and return its bytes
+def zip_translations(translations, file_name):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for language, content in translations.items():
+            archive.writestr(translated_file_name(language, file_name), content)
+    return buffer.getvalue()
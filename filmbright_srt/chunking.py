@@ -0,0 +1,65 @@
+# filmbright_srt/chunking.py
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from filmbright_srt.tracing import in_context
+
+# Defaults for chunked translation (overridable through the environment)
+CHUNK_TOKEN_BUDGET = int(os.getenv("SRT_CHUNK_TOKEN_BUDGET", "1500"))
+# Neighbouring cues shown to the model as context before and after the lines of a request
+CHUNK_CONTEXT_ITEMS = int(os.getenv("SRT_CHUNK_CONTEXT_ITEMS", "2"))
+MAX_CONCURRENT_CHUNKS = int(os.getenv("SRT_MAX_CONCURRENT_CHUNKS", "4"))
+
+
+# Rough token estimate (about 4 characters per token for Latin scripts)
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+# A batch of items to translate together and the model tier (filmbright_srt.routing) it is routed to
+class Chunk:
+    __slots__ = ("position", "items", "tier")
+
+    def __init__(self, position, items, tier=None):
+        self.position = position
+        self.items = items
+        self.tier = tier
+
+    def __repr__(self):
+        return f"Chunk(position={self.position}, items={len(self.items)}, tier={self.tier})"
+
+
+# Group items into chunks whose estimated token count stays within the budget
+def make_chunks(items, max_tokens=CHUNK_TOKEN_BUDGET, size=None):
+    size = size or (lambda item: estimate_tokens(str(item)))
+    bounds = []
+    start = 0
+    used = 0
+    for i, item in enumerate(items):
+        cost = size(item)
+        # A single oversized item still gets a chunk of its own
+        if i > start and used + cost > max_tokens:
+            bounds.append((start, i))
+            start = i
+            used = 0
+        used += cost
+    if start < len(items):
+        bounds.append((start, len(items)))
+
+    return [Chunk(position, items[lo:hi]) for position, (lo, hi) in enumerate(bounds)]
+
+
+# Apply fn to every chunk with bounded concurrency and return the results in chunk order
+def run_chunks(chunks, fn, max_workers=MAX_CONCURRENT_CHUNKS, on_done=None):
+    if not chunks:
+        return []
+    results = [None] * len(chunks)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        fn = in_context(fn)
+        futures = {executor.submit(fn, chunk): chunk.position for chunk in chunks}
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if on_done:
+                on_done(done, len(chunks))
+    return results
+
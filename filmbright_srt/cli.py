@@ -0,0 +1,235 @@
+# filmbright_srt/cli.py
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from filmbright_srt.alignment import AlignmentStats
+from filmbright_srt.backends import TRANSLATION_BACKEND, configure_backend
+from filmbright_srt.batch import translate_srt_many, translated_file_name
+from filmbright_srt.estimator import count_tokens
+from filmbright_srt.formats import SUBTITLE_EXTENSIONS
+from filmbright_srt.glossary import get_glossary_store
+from filmbright_srt.ratelimit import MAX_CONCURRENT_REQUESTS, configure_scheduler
+from filmbright_srt.routing import FAST_MODEL, MODES, ROUTING_POLICY, RoutingPolicy
+from filmbright_srt.tracing import span, start_trace
+from filmbright_srt.translation import TRANSLATION_MODEL, load_subtitles
+
+
+# Expand the given files, directories (every subtitle file inside, recursively) and glob patterns into a sorted
+# file list, leaving out earlier outputs written next to the sources: files named for a requested language (e.g.
+# "German_episode1.srt") and files named like the output of another file in the set in any language (e.g.
+# "French_episode1.srt" next to "episode1.srt"), so that a run for other languages never translates them again
+def collect_sources(paths, languages=()):
+    prefixes = tuple(f"{language}_" for language in languages)
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for extension in SUBTITLE_EXTENSIONS:
+                sources.extend(glob.glob(os.path.join(path, "**", f"*{extension}"), recursive=True))
+        elif glob.has_magic(path):
+            sources.extend(glob.glob(path, recursive=True))
+        else:
+            sources.append(path)
+    sources = list(dict.fromkeys(os.path.abspath(source) for source in sources))
+    found = set(sources)
+    return sorted(
+        source for source in sources
+        if not (prefixes and os.path.basename(source).startswith(prefixes)) and not _is_output(source, found)
+    )
+
+
+# Whether a file is named like translated_file_name(language, other) for another file `other` in `found`
+def _is_output(source, found):
+    directory, name = os.path.split(source)
+    return any(
+        os.path.join(directory, name[separator + 1:]) in found
+        for separator, char in enumerate(name) if char == "_" and separator > 0
+    )
+
+
+def output_path(source, language, output_dir):
+    return os.path.join(output_dir or os.path.dirname(source), translated_file_name(language, source))
+
+
+# Write to a temporary file first so that a crash never leaves a half-written output that looks finished
+def _write_atomically(path, content):
+    temporary = f"{path}.part"
+    data = content.encode("utf-8")
+    with span("file.write", path=path, bytes=len(data)):
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+
+# Translate one file into every language that does not have an output yet; returns per-file statistics
+def translate_file(source, languages, output_dir=None, force=False, project=None, routing=None):
+    pending = [
+        language for language in languages
+        if force or not os.path.exists(output_path(source, language, output_dir))
+    ]
+    if not pending:
+        return {"source": source, "skipped": True}
+
+    started = time.monotonic()
+    with start_trace() as trace:
+        subtitles = load_subtitles(source)
+        cues = subtitles.cues
+        stats = AlignmentStats()
+        translations = translate_srt_many(
+            subtitles, pending, stats=stats, revision_key=os.path.abspath(source), project=project, routing=routing
+        )
+        for language, content in translations.items():
+            _write_atomically(output_path(source, language, output_dir), content)
+    seconds = time.monotonic() - started
+    tokens = sum(count_tokens(cue.text, TRANSLATION_MODEL) for cue in cues) * len(pending)
+    return {
+        "source": source,
+        "skipped": False,
+        "languages": pending,
+        "cues": len(cues) * len(pending),
+        "tokens": tokens,
+        "seconds": seconds,
+        "alignment": stats,
+        "stages": trace.stages(),
+    }
+
+
+def _print_result(result, done, total):
+    name = os.path.basename(result["source"])
+    if result["skipped"]:
+        print(f"[{done}/{total}] {name}: already translated, skipped")
+        return
+    seconds = max(result["seconds"], 1e-6)
+    print(
+        f"[{done}/{total}] {name} -> {', '.join(result['languages'])}: {result['cues']} cues in {seconds:.1f}s "
+        f"({result['cues'] / seconds:.1f} cues/s, {result['tokens'] / seconds:.0f} source tokens/s)"
+    )
+    print(f"    alignment: {result['alignment'].summary()}")
+    print(f"    stages: {_stage_summary(result['stages'])}")
+
+
+# "parse_subtitles 0.02s, translate.request 12x 8.4s, ..." (seconds summed over concurrent calls)
+def _stage_summary(stages):
+    return ", ".join(
+        f"{name} {stage['count']}x {stage['seconds']:.2f}s" if stage["count"] > 1
+        else f"{name} {stage['seconds']:.2f}s"
+        for name, stage in stages.items()
+    )
+
+
+def translate_command(args):
+    sources = collect_sources(args.paths, args.lang)
+    if not sources:
+        print("No subtitle files found.", file=sys.stderr)
+        return 1
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    configure_scheduler(max_concurrent=args.max_requests)
+    configure_backend(args.backend)
+    routing = RoutingPolicy(mode=args.routing, fast_model=args.fast_model)
+
+    started = time.monotonic()
+    failures = 0
+    translated = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = {
+            executor.submit(
+                translate_file, source, args.lang, args.output_dir, args.force,
+                args.project or os.path.dirname(os.path.abspath(source)), routing,
+            ): source
+            for source in sources
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                result = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"[{done}/{len(sources)}] {os.path.basename(futures[future])}: failed: {e}", file=sys.stderr)
+                continue
+            _print_result(result, done, len(sources))
+            if not result["skipped"]:
+                translated.append(result)
+
+    seconds = time.monotonic() - started
+    cues = sum(result["cues"] for result in translated)
+    print(
+        f"Translated {len(translated)} file(s), skipped {len(sources) - len(translated) - failures}, "
+        f"failed {failures}: {cues} cues in {seconds:.1f}s ({cues / max(seconds, 1e-6):.1f} cues/s)"
+    )
+    return 1 if failures else 0
+
+
+# Show a project's pinned glossary for one language, after pinning or removing the given terms
+def glossary_command(args):
+    store = get_glossary_store()
+    if store is None:
+        print("The glossary is disabled (SRT_GLOSSARY_PATH is empty).", file=sys.stderr)
+        return 1
+    changes = {}
+    for entry in args.set or ():
+        term, separator, translation = entry.partition("=")
+        if not separator or not term.strip() or not translation.strip():
+            print(f"Expected TERM=TRANSLATION, got {entry!r}", file=sys.stderr)
+            return 1
+        changes[term.strip()] = translation.strip()
+    store.set_many(args.project, args.lang, changes)
+    store.remove(args.project, args.lang, args.remove or ())
+    for term, translation in store.get(args.project, args.lang).items():
+        print(f"{term} = {translation}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="filmbright-srt", description="Filmbright SRT translation tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    translate = subcommands.add_parser(
+        "translate",
+        help="translate subtitle files or directories of subtitle files",
+        description="Translate subtitle files concurrently, each into its own format. Files whose outputs "
+                    "already exist are skipped, so an interrupted run can simply be started again; finished "
+                    "chunks are reused from the translation memory.",
+    )
+    translate.add_argument(
+        "paths", nargs="+", help="subtitle files (SRT, WebVTT, ASS/SSA, TTML), directories or glob patterns"
+    )
+    translate.add_argument("--lang", action="append", required=True,
+                           help="target language (repeat for several languages)")
+    translate.add_argument("--jobs", type=int, default=4, help="files translated at the same time")
+    translate.add_argument("--max-requests", type=int, default=MAX_CONCURRENT_REQUESTS,
+                           help="simultaneous OpenAI requests across all files")
+    translate.add_argument("--output-dir", help="where to write translations (default: next to each source; "
+                                                "files named like another file's output are not translated)")
+    translate.add_argument("--force", action="store_true", help="translate again even if the output exists")
+    translate.add_argument("--backend", choices=("openai", "mock"), default=TRANSLATION_BACKEND,
+                           help="translation backend; 'mock' answers offline (SRT_MOCK_* settings), for load tests")
+    translate.add_argument("--project",
+                           help="glossary of names and terms shared by every file (default: each file's directory)")
+    translate.add_argument("--routing", choices=MODES, default=ROUTING_POLICY,
+                           help="model tiers: 'auto' sends runs of simple cues to the fast model, 'premium' and "
+                                "'fast' send every cue to one model")
+    translate.add_argument("--fast-model", default=FAST_MODEL, help="model of the fast tier")
+    translate.set_defaults(handler=translate_command)
+
+    glossary = subcommands.add_parser(
+        "glossary",
+        help="show or edit the pinned glossary of a project",
+        description="Names and recurring terms are pinned per project and language the first time they are "
+                    "translated. Pin a different rendition with --set, or --remove a term so that it is "
+                    "translated afresh next time.",
+    )
+    glossary.add_argument("project", help="project name (for the translate command, a directory by default)")
+    glossary.add_argument("--lang", required=True, help="target language")
+    glossary.add_argument("--set", action="append", metavar="TERM=TRANSLATION", help="pin a translation")
+    glossary.add_argument("--remove", action="append", metavar="TERM", help="unpin a term")
+    glossary.set_defaults(handler=glossary_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
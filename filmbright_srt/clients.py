@@ -0,0 +1,79 @@
+# filmbright_srt/clients.py
+
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+
+OPENAI_API_KEY = os.getenv("OPEN_AI_KEY_SRT_FILMBRIGHT")
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "32"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "16"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "120"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "600"))
+
+# Retries are handled by filmbright_srt.ratelimit, which also honours the rate-limit budgets
+CLIENT_MAX_RETRIES = 0
+
+# HTTP/2 needs the optional "h2" package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_lock = threading.Lock()
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+# httpx and the openai SDK are imported on first use, they take about half a second to load
+def _client_options():
+    import httpx
+
+    return {
+        "limits": httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(OPENAI_TIMEOUT, connect=10.0),
+        "http2": HTTP2_AVAILABLE,
+    }
+
+
+# Process-wide OpenAI client; its keep-alive connection pool is shared by every thread
+def get_openai_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from openai import DefaultHttpxClient, OpenAI
+
+                _client = OpenAI(
+                    api_key=OPENAI_API_KEY,
+                    max_retries=CLIENT_MAX_RETRIES,
+                    http_client=DefaultHttpxClient(**_client_options()),
+                )
+    return _client
+
+
+# Async OpenAI client for the running event loop (httpx async pools cannot be shared across loops)
+def get_async_openai_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            max_retries=CLIENT_MAX_RETRIES,
+            http_client=DefaultAsyncHttpxClient(**_client_options()),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+# Close the pooled synchronous client, e.g. on shutdown or in benchmarks
+def close_openai_client():
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
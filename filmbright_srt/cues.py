@@ -0,0 +1,167 @@
+# filmbright_srt/cues.py
+
+import io
+import os
+import re
+from filmbright_srt.tracing import span
+
+TIMECODE_RE = re.compile(
+    r"(\d+):(\d{2}):(\d{2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{1,3})"
+)
+NUMBERED_LINE_RE = re.compile(r"^\s*(\d+)\s*\|(.*)$")
+# Stands in for a line break inside a cue, so that every cue fits on one prompt line
+LINE_BREAK_TOKEN = "<br>"
+LINE_BREAK_RE = re.compile(r"\s*<br\s*/?>\s*", re.IGNORECASE)
+
+
+# One subtitle cue: its number, start and end time in milliseconds and its text
+class Cue:
+    __slots__ = ("index", "start_ms", "end_ms", "text")
+
+    def __init__(self, index, start_ms, end_ms, text):
+        self.index = index
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.text = text
+
+    def with_text(self, text):
+        return Cue(self.index, self.start_ms, self.end_ms, text)
+
+    def __eq__(self, other):
+        if not isinstance(other, Cue):
+            return NotImplemented
+        return (self.index, self.start_ms, self.end_ms, self.text) == (
+            other.index, other.start_ms, other.end_ms, other.text
+        )
+
+    def __repr__(self):
+        return f"Cue({self.index}, {self.start_ms}, {self.end_ms}, {self.text!r})"
+
+
+def _to_ms(hours, minutes, seconds, millis):
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(millis.ljust(3, "0"))
+
+
+# Format milliseconds as an SRT timestamp (HH:MM:SS,mmm)
+def format_timestamp(ms):
+    hours, ms = divmod(int(ms), 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+# Open any supported source (path, bytes-like object or file object) as a stream of text lines
+def _iter_lines(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r", encoding="utf-8-sig") as file:
+            yield from file
+        return
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    if isinstance(source, (io.RawIOBase, io.BufferedIOBase)) or "b" in getattr(source, "mode", ""):
+        source = io.TextIOWrapper(source, encoding="utf-8-sig")
+    first = True
+    for line in source:
+        if first:
+            line = line.lstrip("\ufeff")
+            first = False
+        yield line
+
+
+# Stream cues from an SRT source without reading the whole file into memory
+def iter_cues(source):
+    index = None
+    timing = None
+    text = []
+    position = 0
+    for raw in _iter_lines(source):
+        line = raw.rstrip("\r\n")
+        if not line.strip():
+            if timing:
+                position += 1
+                yield Cue(index if index is not None else position, timing[0], timing[1], "\n".join(text))
+            index, timing, text = None, None, []
+            continue
+        if timing is None:
+            match = TIMECODE_RE.search(line)
+            if match:
+                groups = match.groups()
+                timing = (_to_ms(*groups[:4]), _to_ms(*groups[4:]))
+            elif line.strip().isdigit():
+                index = int(line.strip())
+            continue
+        text.append(line)
+    if timing:
+        position += 1
+        yield Cue(index if index is not None else position, timing[0], timing[1], "\n".join(text))
+
+
+# Parse an SRT file, bytes buffer or stream into a list of cues
+def parse_srt(source):
+    with span("parse_srt") as current:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            current.set(bytes=len(source))
+        cues = list(iter_cues(source))
+        current.set(cues=len(cues))
+        return cues
+
+
+# Write cues to a text stream in SRT format
+def write_srt(cues, stream):
+    for cue in cues:
+        stream.write(
+            f"{cue.index}\n{format_timestamp(cue.start_ms)} --> {format_timestamp(cue.end_ms)}\n{cue.text}\n\n"
+        )
+
+
+# Serialize cues to an SRT string
+def serialize_srt(cues):
+    buffer = io.StringIO()
+    write_srt(cues, buffer)
+    return buffer.getvalue()
+
+
+# One cue text on a single line, line breaks written as <br>
+def encode_line(text):
+    return LINE_BREAK_TOKEN.join(line.strip() for line in text.strip().splitlines())
+
+
+def decode_line(line):
+    return "\n".join(part for part in LINE_BREAK_RE.split(line.strip()) if part)
+
+
+# Render texts as compact numbered lines ("1|text") for the translation prompt; IDs count from 1
+def format_numbered_lines(texts):
+    return "\n".join(f"{number}|{encode_line(text)}" for number, text in enumerate(texts, start=1))
+
+
+# Parse numbered lines from streamed text fragments, yielding (number, text) as soon as each line is complete.
+# A line without a number continues the previous one (the model wrote a real line break instead of <br>).
+def iter_numbered_lines(fragments):
+    number = None
+    parts = []
+    pending = ""
+
+    def read_line(line):
+        nonlocal number, parts
+        match = NUMBERED_LINE_RE.match(line)
+        if match:
+            finished = (number, decode_line(LINE_BREAK_TOKEN.join(parts))) if number is not None else None
+            number, parts = int(match.group(1)), [match.group(2)]
+            return finished
+        if number is not None and line.strip():
+            parts.append(line)
+        return None
+
+    for fragment in fragments:
+        pending += fragment
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            finished = read_line(line)
+            if finished:
+                yield finished
+    finished = read_line(pending)
+    if finished:
+        yield finished
+    if number is not None:
+        yield number, decode_line(LINE_BREAK_TOKEN.join(parts))
@@ -0,0 +1,219 @@
+# filmbright_srt/drive.py
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from filmbright_srt.storage import SqliteStore
+from filmbright_srt.tracing import span
+
+GOOGLE_CREDENTIALS_PATH = os.getenv("GOOGLE_CREDENTIALS_JSON_PATH", "credentials_srt_files_translation.json")
+TRANSLATED_FILES_FOLDER_ID = os.getenv("TRANSLATED_FILES_FOLDER_ID", "Translated_Files_Folder_ID")
+DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive"]
+# Alternative root URL for every Drive call (API, uploads, batches), e.g. a local stand-in server for benchmarks
+DRIVE_API_ENDPOINT = os.getenv("DRIVE_API_ENDPOINT")
+DRIVE_HTTP_TIMEOUT = float(os.getenv("DRIVE_HTTP_TIMEOUT", "120"))
+# Transfer chunk size; Drive requires upload chunks to be a multiple of 256 KiB
+DRIVE_CHUNK_SIZE = max(1, int(os.getenv("DRIVE_CHUNK_SIZE", str(8 * 1024 * 1024))) // (256 * 1024)) * 256 * 1024
+# Files larger than this are sent as resumable uploads; smaller ones go up in a single multipart request
+DRIVE_RESUMABLE_THRESHOLD = int(os.getenv("DRIVE_RESUMABLE_THRESHOLD", str(5 * 1024 * 1024)))
+DRIVE_NUM_RETRIES = int(os.getenv("DRIVE_NUM_RETRIES", "5"))
+# Where open resumable upload sessions are remembered across restarts; empty disables resuming
+DRIVE_UPLOAD_STATE_PATH = os.getenv("DRIVE_UPLOAD_STATE_PATH", "drive_uploads.sqlite3")
+# Drive discards unfinished resumable sessions after a week
+UPLOAD_SESSION_TTL = 6 * 24 * 3600
+
+_lock = threading.Lock()
+_credentials = {}
+_discovery_document = None
+_thread_services = threading.local()
+_upload_sessions = None
+
+
+# Service-account credentials, read from disk once per process; google-auth refreshes the token when it expires
+def _get_credentials(credentials_path):
+    with _lock:
+        if credentials_path not in _credentials:
+            from google.oauth2.service_account import Credentials
+
+            _credentials[credentials_path] = Credentials.from_service_account_file(
+                credentials_path, scopes=DRIVE_SCOPES
+            )
+        return _credentials[credentials_path]
+
+
+# Drive v3 discovery document from the copy bundled with google-api-python-client, read once. Kept as
+# JSON text because build_from_document modifies the parsed document it is given.
+def _get_discovery_document():
+    global _discovery_document
+    with _lock:
+        if _discovery_document is None:
+            from googleapiclient.discovery_cache import get_static_doc
+
+            _discovery_document = get_static_doc("drive", "v3")
+        return _discovery_document
+
+
+# Google Drive authentication: one Drive service per thread (httplib2 transports are not thread-safe),
+# all sharing the cached credentials and discovery document
+def get_drive_service(credentials_path=GOOGLE_CREDENTIALS_PATH):
+    services = getattr(_thread_services, "services", None)
+    if services is None:
+        services = _thread_services.services = {}
+    service = services.get(credentials_path)
+    if service is None:
+        # The Google client libraries are slow to import, so they are only loaded once Drive is used
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build_from_document
+
+        transport = httplib2.Http(timeout=DRIVE_HTTP_TIMEOUT)
+        # Resumable uploads answer "308 Resume Incomplete", which must not be followed as a redirect
+        transport.redirect_codes = transport.redirect_codes - {308}
+        http = AuthorizedHttp(_get_credentials(credentials_path), http=transport)
+        document = json.loads(_get_discovery_document())
+        if DRIVE_API_ENDPOINT:
+            # client_options["api_endpoint"] would only move the API calls, not the upload and batch URLs
+            document["rootUrl"] = document["mtlsRootUrl"] = DRIVE_API_ENDPOINT
+            document["baseUrl"] = DRIVE_API_ENDPOINT + document["servicePath"]
+        service = build_from_document(document, http=http)
+        services[credentials_path] = service
+    return service
+
+
+# Kept for existing callers; returns the cached service of the current thread
+def authenticate_google_drive(credentials_path=GOOGLE_CREDENTIALS_PATH):
+    return get_drive_service(credentials_path)
+
+
+# SQLite record of resumable upload sessions that have not finished yet, keyed by upload content and target
+class UploadSessionStore(SqliteStore):
+    def __init__(self, path=DRIVE_UPLOAD_STATE_PATH):
+        super().__init__(path, (
+            """
+            CREATE TABLE IF NOT EXISTS upload_sessions (
+                key TEXT PRIMARY KEY,
+                resumable_uri TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """,
+        ))
+
+    def get(self, key):
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT resumable_uri FROM upload_sessions WHERE key = ? AND created_at > ?",
+                (key, time.time() - UPLOAD_SESSION_TTL),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, resumable_uri):
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO upload_sessions (key, resumable_uri, created_at) VALUES (?, ?, ?)",
+                (key, resumable_uri, time.time()),
+            )
+            conn.execute("DELETE FROM upload_sessions WHERE created_at <= ?", (time.time() - UPLOAD_SESSION_TTL,))
+
+    def delete(self, key):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM upload_sessions WHERE key = ?", (key,))
+
+
+# Process-wide upload session store, or None when resuming is disabled
+def get_upload_sessions():
+    global _upload_sessions
+    if not DRIVE_UPLOAD_STATE_PATH:
+        return None
+    with _lock:
+        if _upload_sessions is None:
+            _upload_sessions = UploadSessionStore(DRIVE_UPLOAD_STATE_PATH)
+        return _upload_sessions
+
+
+def _upload_key(content, file_name, folder_id, mimetype):
+    digest = hashlib.sha256(content)
+    digest.update("\x1f".join(["", file_name, folder_id, mimetype]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Download a file from Google Drive into memory and return its bytes
+def download_srt_file(service, file_id):
+    from googleapiclient.http import MediaIoBaseDownload
+
+    with span("drive.download", file_id=file_id) as current:
+        request = service.files().get_media(fileId=file_id)
+        buffer = io.BytesIO()
+        downloader = MediaIoBaseDownload(buffer, request, chunksize=DRIVE_CHUNK_SIZE)
+        done = False
+        while not done:
+            status, done = downloader.next_chunk(num_retries=DRIVE_NUM_RETRIES)
+        current.set(bytes=buffer.tell())
+        return buffer.getvalue()
+
+
+# Upload in-memory content (bytes or text) to Google Drive under the given file name. Large files use a
+# resumable session that is remembered on disk, so an upload cut short by a restart continues where it
+# stopped the next time the same content is uploaded to the same place.
+def upload_file_to_drive(service, content, file_name, folder_id, mimetype="text/plain"):
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    with span("drive.upload", file_name=file_name, bytes=len(content)):
+        return _upload(service, content, file_name, folder_id, mimetype)
+
+
+def _upload(service, content, file_name, folder_id, mimetype):
+    from googleapiclient.http import MediaIoBaseUpload
+
+    file_metadata = {"name": file_name, "parents": [folder_id]}
+    if len(content) <= DRIVE_RESUMABLE_THRESHOLD:
+        media = MediaIoBaseUpload(io.BytesIO(content), mimetype=mimetype)
+        request = service.files().create(body=file_metadata, media_body=media, fields="id")
+        return request.execute(num_retries=DRIVE_NUM_RETRIES).get("id")
+
+    media = MediaIoBaseUpload(io.BytesIO(content), mimetype=mimetype, chunksize=DRIVE_CHUNK_SIZE, resumable=True)
+    request = service.files().create(body=file_metadata, media_body=media, fields="id")
+    sessions = get_upload_sessions()
+    key = _upload_key(content, file_name, folder_id, mimetype)
+    saved_uri = sessions.get(key) if sessions else None
+    response = None
+    if saved_uri:
+        # Ask Drive how much of the earlier session arrived and send only the rest
+        offset, response = _session_status(request.http, saved_uri)
+        if offset is not None:
+            request.resumable_uri = saved_uri
+            request.resumable_progress = offset
+        elif response is None:
+            # The earlier session expired; start a new one
+            sessions.delete(key)
+            saved_uri = None
+
+    while response is None:
+        status, response = request.next_chunk(num_retries=DRIVE_NUM_RETRIES)
+        if sessions and response is None and request.resumable_uri != saved_uri:
+            saved_uri = request.resumable_uri
+            sessions.put(key, saved_uri)
+    if sessions and saved_uri:
+        sessions.delete(key)
+    return response.get("id")
+
+
+# Status of a resumable upload session, queried with an empty PUT and "Content-Range: bytes */*":
+# (bytes received, None) while it is open, (None, the created file) once everything arrived, or (None, None)
+# when Drive no longer knows the session
+def _session_status(http, resumable_uri):
+    from googleapiclient.errors import HttpError
+
+    response, body = http.request(
+        resumable_uri, method="PUT", headers={"Content-Length": "0", "Content-Range": "bytes */*"}
+    )
+    if response.status in (200, 201):
+        return None, json.loads(body)
+    if response.status == 308:
+        received = response.get("range")
+        return (int(received.rsplit("-", 1)[1]) + 1 if received else 0), None
+    if response.status in (404, 410):
+        return None, None
+    raise HttpError(response, body, uri=resumable_uri)
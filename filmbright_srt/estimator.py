@@ -0,0 +1,272 @@
+# filmbright_srt/estimator.py
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from filmbright_srt.chunking import estimate_tokens
+
+JOB_LOG_PATH = os.getenv("SRT_JOB_LOG_PATH", "translation_job_log.jsonl")
+HISTORY_SIZE = int(os.getenv("SRT_ESTIMATOR_HISTORY_SIZE", "200"))
+
+# Used until enough measurements exist for a model
+DEFAULT_TOKENS_PER_SECOND = 20.0
+DEFAULT_REQUEST_OVERHEAD = 1.5
+
+# USD per 1,000 (input, output) tokens
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+
+_encoding_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(model):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # The encoding files are downloaded on first use; without them fall back to the estimate
+        print(f"Could not load the tokenizer for {model}: {e}")
+        return None
+
+
+def _encoding(model):
+    with _encoding_lock:
+        return _load_encoding(model)
+
+
+# Count tokens with the model's tokenizer (tiktoken), falling back to the character-based estimate
+def count_tokens(text, model="gpt-4"):
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+# Cost in USD of the tokens on a model; a backend's model ID ("mock:gpt-4o-mini") is priced as its model
+def cost_of(model, input_tokens, output_tokens):
+    input_price, output_price = MODEL_PRICES.get(model.rsplit(":", 1)[-1], MODEL_PRICES["gpt-4"])
+    return input_tokens / 1000 * input_price + output_tokens / 1000 * output_price
+
+
+# Least-squares fit of seconds = overhead + output_tokens / tokens_per_second over (output_tokens, seconds) samples
+def fit_throughput(samples):
+    if len(samples) < 2:
+        if samples and samples[0][1] > DEFAULT_REQUEST_OVERHEAD:
+            tokens, seconds = samples[0]
+            return max(1.0, tokens / (seconds - DEFAULT_REQUEST_OVERHEAD)), DEFAULT_REQUEST_OVERHEAD
+        return DEFAULT_TOKENS_PER_SECOND, DEFAULT_REQUEST_OVERHEAD
+    n = len(samples)
+    mean_x = sum(tokens for tokens, _ in samples) / n
+    mean_y = sum(seconds for _, seconds in samples) / n
+    var_x = sum((tokens - mean_x) ** 2 for tokens, _ in samples)
+    if var_x == 0:
+        return max(1.0, mean_x / max(mean_y, 1e-6)), 0.0
+    slope = sum((tokens - mean_x) * (seconds - mean_y) for tokens, seconds in samples) / var_x
+    if slope <= 0:
+        return max(1.0, mean_x / max(mean_y, 1e-6)), 0.0
+    overhead = max(0.0, mean_y - slope * mean_x)
+    return 1 / slope, overhead
+
+
+class Estimate:
+    __slots__ = ("seconds", "cost", "input_tokens", "output_tokens", "chunks")
+
+    def __init__(self, seconds, cost, input_tokens, output_tokens, chunks):
+        self.seconds = seconds
+        self.cost = cost
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.chunks = chunks
+
+    def __repr__(self):
+        return (
+            f"Estimate(seconds={self.seconds:.1f}, cost=${self.cost:.4f}, input_tokens={self.input_tokens}, "
+            f"output_tokens={self.output_tokens}, chunks={self.chunks})"
+        )
+
+
+# Rolling history of measured request throughput per (model, language), persisted to a JSON-lines job log.
+# The log only keeps what the history can use, the last `size` records per (model, language): it is rewritten
+# without older records once it holds twice that, so it neither grows without bound nor slows down startup.
+class ThroughputHistory:
+    def __init__(self, log_path=JOB_LOG_PATH, size=HISTORY_SIZE):
+        self.log_path = log_path
+        self.size = size
+        self._samples = {}
+        self._records = {}
+        self._logged = 0
+        self._lock = threading.Lock()
+        if log_path and os.path.exists(log_path):
+            for record in read_job_log(log_path):
+                self._add(record)
+                self._logged += 1
+            if self._logged > self._retained():
+                self._compact()
+
+    def _add(self, record):
+        for key in ((record["model"], record["language"]), (record["model"], None)):
+            self._samples.setdefault(key, deque(maxlen=self.size)).append(
+                (record["output_tokens"], record["seconds"])
+            )
+        self._records.setdefault((record["model"], record["language"]), deque(maxlen=self.size)).append(record)
+
+    def _retained(self):
+        return sum(len(records) for records in self._records.values())
+
+    # Rewrite the log with the retained records only, through a temporary file so a crash never loses it
+    def _compact(self):
+        records = sorted((record for records in self._records.values() for record in records), key=_record_time)
+        temporary = f"{self.log_path}.part"
+        with open(temporary, "w", encoding="utf-8") as log:
+            log.writelines(json.dumps(record) + "\n" for record in records)
+        os.replace(temporary, self.log_path)
+        self._logged = len(records)
+
+    # Record one finished request and append it to the job log
+    def record(self, model, language, input_tokens, output_tokens, seconds):
+        record = {
+            "time": time.time(),
+            "model": model,
+            "language": language,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "seconds": round(seconds, 3),
+        }
+        with self._lock:
+            self._add(record)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as log:
+                    log.write(json.dumps(record) + "\n")
+                self._logged += 1
+                if self._logged > 2 * max(self._retained(), self.size):
+                    self._compact()
+
+    # (tokens per second, per-request overhead) for the model and language, falling back to the model alone
+    def throughput(self, model, language):
+        with self._lock:
+            samples = self._samples.get((model, language))
+            if not samples or len(samples) < 3:
+                samples = self._samples.get((model, None), samples)
+            return fit_throughput(list(samples or []))
+
+    # Predict wall time and cost for chunks given as (input_tokens, output_tokens) pairs run `concurrency` at a time
+    def predict(self, model, language, chunk_tokens, concurrency=1, tokens_per_minute=None):
+        return self.predict_routed(language, {model: chunk_tokens}, concurrency, tokens_per_minute)
+
+    # predict() for a job whose chunks are spread over several models ({model: [(input_tokens, output_tokens)]}),
+    # all sharing the same workers
+    def predict_routed(self, language, chunk_tokens_by_model, concurrency=1, tokens_per_minute=None):
+        durations = []
+        cost = 0.0
+        for model, chunk_tokens in chunk_tokens_by_model.items():
+            tokens_per_second, overhead = self.throughput(model, language)
+            durations += [overhead + output / tokens_per_second for _, output in chunk_tokens]
+            input_tokens = sum(tokens for tokens, _ in chunk_tokens)
+            cost += cost_of(model, input_tokens, sum(tokens for _, tokens in chunk_tokens))
+        durations.sort(reverse=True)
+        # Longest chunks first onto the least busy worker
+        workers = [0.0] * max(1, min(concurrency, len(durations) or 1))
+        for duration in durations:
+            workers[workers.index(min(workers))] += duration
+        seconds = max(workers)
+        chunk_tokens = [tokens for chunk_tokens in chunk_tokens_by_model.values() for tokens in chunk_tokens]
+        input_tokens = sum(tokens for tokens, _ in chunk_tokens)
+        output_tokens = sum(tokens for _, tokens in chunk_tokens)
+        if tokens_per_minute:
+            # The account's token budget can bound the job more than the concurrency does
+            seconds = max(seconds, (input_tokens + output_tokens) / tokens_per_minute * 60)
+        return Estimate(seconds, cost, input_tokens, output_tokens, len(chunk_tokens))
+
+
+def _record_time(record):
+    return record.get("time", 0)
+
+
+def read_job_log(path):
+    with open(path, "r", encoding="utf-8") as log:
+        for line in log:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+# Process-wide throughput history loaded from the job log
+def get_throughput_history():
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = ThroughputHistory()
+        return _history
+
+
+# Replay job logs in time order, predicting each request from the history before it, and report the fit
+def calibrate(paths, size=HISTORY_SIZE):
+    records = sorted((record for path in paths for record in read_job_log(path)), key=_record_time)
+    history = ThroughputHistory(log_path=None, size=size)
+    errors = {}
+    for record in records:
+        key = (record["model"], record["language"])
+        predicted = history.predict(record["model"], record["language"], [(0, record["output_tokens"])]).seconds
+        errors.setdefault(key, []).append(abs(predicted - record["seconds"]))
+        history._add(record)
+    report = []
+    for (model, language), key_errors in sorted(errors.items()):
+        tokens_per_second, overhead = history.throughput(model, language)
+        report.append({
+            "model": model,
+            "language": language,
+            "samples": len(key_errors),
+            "tokens_per_second": round(tokens_per_second, 2),
+            "overhead_seconds": round(overhead, 2),
+            "mean_abs_error_seconds": round(sum(key_errors) / len(key_errors), 2),
+        })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m filmbright_srt.estimator",
+        description="Calibrate the translation time estimator from past job logs",
+    )
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    calibrate_parser = subcommands.add_parser("calibrate", help="replay job logs and report fitted throughput")
+    calibrate_parser.add_argument("logs", nargs="*", default=[JOB_LOG_PATH])
+    calibrate_parser.add_argument("--history-size", type=int, default=HISTORY_SIZE)
+    calibrate_parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = calibrate(args.logs, size=args.history_size)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'model':<16}{'language':<26}{'samples':>8}{'tok/s':>9}{'overhead':>10}{'MAE (s)':>9}")
+    for row in report:
+        print(
+            f"{row['model']:<16}{row['language']:<26}{row['samples']:>8}{row['tokens_per_second']:>9}"
+            f"{row['overhead_seconds']:>10}{row['mean_abs_error_seconds']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
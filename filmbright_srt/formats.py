@@ -0,0 +1,446 @@
+# filmbright_srt/formats.py
+
+import html
+import io
+import itertools
+import os
+import re
+from xml.sax.saxutils import escape as xml_escape
+from filmbright_srt.cues import Cue, _iter_lines, _to_ms, format_timestamp, iter_cues
+from filmbright_srt.tracing import span
+
+# Formatting tags a SubRip cue may carry: HTML-like tags and SSA-style overrides such as {\an8}
+SRT_TAG_RE = re.compile(r"</?(?:i|b|u|s|font)\b[^>\n]*>|\{\\[^}\n]*\}", re.IGNORECASE)
+# WebVTT cue text tags (<i>, <c.yellow>, <v Bob>, <ruby>, <00:00:01.000>, ...)
+VTT_TAG_RE = re.compile(r"<[^>\n]*>")
+VTT_TIMING_RE = re.compile(
+    r"^\s*(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})\s+-->\s+(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})"
+)
+# ASS/SSA override blocks, and the drawing mode ({\p1}) whose "text" is a vector shape, not words
+ASS_TAG_RE = re.compile(r"\{[^}]*\}")
+ASS_DRAWING_RE = re.compile(r"\{[^}]*\\p[1-9]")
+ASS_TIME_RE = re.compile(r"(\d+):(\d{2}):(\d{2})[.:](\d{1,3})")
+ASS_LINE_BREAK_RE = re.compile(r"\\[Nn]")
+# TTML paragraphs (one per cue) with their start tag and content (None for an empty, self-closing <p .../>), and
+# the tags and line breaks inside them
+TTML_P_START_RE = re.compile(r"<(?:[\w.-]+:)?p(?:\s[^>]*)?>")
+TTML_P_RE = re.compile(r"<((?:[\w.-]+:)?p)((?:\s[^>]*?)?)(?:/>|>(.*?)</\1\s*>)", re.DOTALL)
+TTML_ROOT_RE = re.compile(r"<(?:[\w.-]+:)?tt\b[^>]*>")
+TTML_BR_RE = re.compile(r"<(?:[\w.-]+:)?br\b[^>]*/>|<(?:[\w.-]+:)?br\b[^>]*>\s*</(?:[\w.-]+:)?br\s*>")
+TTML_TAG_RE = re.compile(r"<[^>]*>")
+TTML_ATTRIBUTE_RE = re.compile(r"([\w.:-]+)\s*=\s*(?:\"([^\"]*)\"|'([^']*)')")
+TTML_CLOCK_RE = re.compile(r"^(\d+):(\d{2}):(\d{2})(?:(\.\d+)|:(\d+)(?:\.\d+)?)?$")
+TTML_OFFSET_RE = re.compile(r"^(\d+(?:\.\d+)?)(h|m|s|ms|f|t)$")
+TTML_OFFSET_MS = {"h": 3_600_000, "m": 60_000, "s": 1000, "ms": 1}
+
+
+# How one cue is written back around its translated text: the raw source before the text (timing line, cue
+# settings, ASS fields, the TTML <p> start tag and anything between cues such as comments), the styling tags
+# that wrapped each line of the source text as (prefix, suffix) pairs, and the raw source after the text
+class Frame:
+    __slots__ = ("head", "wrappers", "tail", "line_break")
+
+    def __init__(self, head, wrappers, tail, line_break="\n"):
+        self.head = head
+        self.wrappers = wrappers
+        self.tail = tail
+        self.line_break = line_break
+
+
+# Split the lines of a cue into plain text and the tags that wrap each line. Tags at the start and end of a
+# line (and whitespace around them) are kept to be put back on output; tags in the middle of a line are
+# dropped, since there is no telling which words of the translation they belong to.
+def split_markup(lines, tag_re, unescape=None):
+    plain = []
+    wrappers = []
+    for line in lines:
+        pieces = []
+        last = 0
+        for match in tag_re.finditer(line):
+            pieces += [(False, line[last:match.start()]), (True, match.group())]
+            last = match.end()
+        pieces.append((False, line[last:]))
+        start = 0
+        while start < len(pieces) and (pieces[start][0] or not pieces[start][1].strip()):
+            start += 1
+        end = len(pieces)
+        while end > start and (pieces[end - 1][0] or not pieces[end - 1][1].strip()):
+            end -= 1
+        text = "".join(piece for is_tag, piece in pieces[start:end] if not is_tag)
+        plain.append(unescape(text) if unescape else text)
+        prefix, suffix = pieces[:start], pieces[end:]
+        wrappers.append(("".join(piece for _, piece in prefix), "".join(piece for _, piece in suffix)))
+    return "\n".join(plain), wrappers
+
+
+# Put the wrapping tags of the source lines back around the lines of a translation. With as many lines as the
+# source, each line gets its own tags; otherwise lines that were all styled alike keep that style, and any
+# other styling (or the one wrapper of a single-line source) opens on the first line and closes on the last,
+# so that no tag is repeated or left unclosed.
+def restore_markup(text, wrappers, escape=None):
+    lines = [escape(line) if escape else line for line in text.split("\n")]
+    if not wrappers:
+        return lines
+    if len(wrappers) == len(lines):
+        pairs = wrappers
+    elif len(wrappers) > 1 and len(set(wrappers)) == 1:
+        pairs = wrappers[:1] * len(lines)
+    else:
+        prefix = "".join(prefix for prefix, _ in wrappers)
+        suffix = "".join(suffix for _, suffix in reversed(wrappers))
+        if len(lines) == 1:
+            pairs = [(prefix, suffix)]
+        else:
+            pairs = [(prefix, "")] + [("", "")] * (len(lines) - 2) + [("", suffix)]
+    return [prefix + line + suffix for line, (prefix, suffix) in zip(lines, pairs)]
+
+
+# SubRip. Cue numbers and timecodes are written afresh, as serialize_srt does; only the styling is kept.
+class SrtFormat:
+    name = "srt"
+    extensions = (".srt",)
+    mimetype = "application/x-subrip"
+
+    def sniff(self, line):
+        return False
+
+    def read(self, lines, subtitles):
+        for cue in iter_cues(lines):
+            yield self.split(cue)
+
+    def split(self, cue):
+        text, wrappers = split_markup(cue.text.split("\n"), SRT_TAG_RE)
+        return cue.with_text(text), Frame(None, wrappers, None)
+
+    def format_cue(self, cue, frame):
+        text = "\n".join(restore_markup(cue.text, frame.wrappers)) if frame else cue.text
+        return f"{cue.index}\n{format_timestamp(cue.start_ms)} --> {format_timestamp(cue.end_ms)}\n{text}\n\n"
+
+
+# WebVTT. The header, NOTE/STYLE/REGION blocks, cue identifiers and cue settings (position, line, align)
+# are written back as they were.
+class VttFormat:
+    name = "vtt"
+    extensions = (".vtt",)
+    mimetype = "text/vtt"
+
+    def sniff(self, line):
+        return line.startswith("WEBVTT")
+
+    def read(self, lines, subtitles):
+        raw = []
+        cue = None
+        for line in lines:
+            if cue is not None:
+                if line.strip():
+                    cue[2].append(line.rstrip("\r\n"))
+                    continue
+                yield self._cue(len(subtitles.cues) + 1, *cue)
+                cue = None
+            match = VTT_TIMING_RE.match(line)
+            if match:
+                groups = [group or "0" for group in match.groups()]
+                cue = ("".join(raw) + line, (_to_ms(*groups[:4]), _to_ms(*groups[4:])), [])
+                raw = []
+            else:
+                raw.append(line)
+        if cue is not None:
+            yield self._cue(len(subtitles.cues) + 1, *cue)
+        subtitles.footer = "".join(raw)
+
+    def _cue(self, index, head, timing, lines):
+        text, wrappers = split_markup(lines, VTT_TAG_RE, html.unescape)
+        if not head.endswith("\n"):
+            head += "\n"
+        return Cue(index, timing[0], timing[1], text), Frame(head, wrappers, "\n")
+
+    # A cue without a frame (more cues than the source had) is written plain, with a timing line of its own
+    def format_cue(self, cue, frame):
+        if frame is None:
+            text = "\n".join(_vtt_escape(line) for line in cue.text.split("\n"))
+            return f"{_vtt_time(cue.start_ms)} --> {_vtt_time(cue.end_ms)}\n{text}\n\n"
+        if not frame.wrappers:
+            return frame.head
+        return frame.head + "\n".join(restore_markup(cue.text, frame.wrappers, _vtt_escape)) + frame.tail
+
+
+def _vtt_escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _vtt_time(ms):
+    return f"{ms // 3_600_000:02d}:{ms // 60_000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+
+# Advanced SubStation Alpha and SubStation Alpha. Script info, styles, fonts, comments and every field of a
+# Dialogue line but its text (layer, style, speaker, margins, effect) are written back as they were; \N line
+# breaks become cue lines, and drawings ({\p1} shapes) are kept as they are and never translated.
+class AssFormat:
+    name = "ass"
+    extensions = (".ass", ".ssa")
+    mimetype = "text/x-ssa"
+
+    def sniff(self, line):
+        return line.strip().lower() == "[script info]"
+
+    def read(self, lines, subtitles):
+        raw = []
+        section = None
+        fields = None
+        subtitles.extension = ".ssa"
+        for line in lines:
+            stripped = line.strip()
+            if stripped.startswith("[") and stripped.endswith("]"):
+                section = stripped.lower()
+                if section == "[v4+ styles]":
+                    subtitles.extension = ".ass"
+            elif section == "[events]" and stripped.lower().startswith("format:"):
+                fields = [field.strip().lower() for field in stripped.split(":", 1)[1].split(",")]
+            elif section == "[events]" and fields and stripped.startswith("Dialogue:"):
+                kind, body = line.split(":", 1)
+                values = body.rstrip("\r\n").split(",", len(fields) - 1)
+                if len(values) == len(fields):
+                    head = "".join(raw) + kind + ":" + ",".join(values[:-1]) + ","
+                    raw = []
+                    yield self._cue(len(subtitles.cues) + 1, head, values, fields)
+                    continue
+            raw.append(line)
+        subtitles.footer = "".join(raw)
+
+    def _cue(self, index, head, values, fields):
+        start, end = (_ass_ms(values[fields.index(name)]) if name in fields else 0 for name in ("start", "end"))
+        source = values[-1]
+        if ASS_DRAWING_RE.search(source):
+            text, wrappers = "", [(source, "")]
+        else:
+            text, wrappers = split_markup(ASS_LINE_BREAK_RE.split(source), ASS_TAG_RE, _ass_unescape)
+        return Cue(index, start, end, text), Frame(head, wrappers, "\n", "\\N")
+
+    def format_cue(self, cue, frame):
+        if frame is None:
+            text = cue.text.replace("\n", "\\N")
+            return f"Dialogue: 0,{_ass_time(cue.start_ms)},{_ass_time(cue.end_ms)},Default,,0,0,0,,{text}\n"
+        return frame.head + frame.line_break.join(restore_markup(cue.text, frame.wrappers)) + frame.tail
+
+
+def _ass_time(ms):
+    return f"{ms // 3_600_000}:{ms // 60_000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000 // 10:02d}"
+
+
+def _ass_ms(value):
+    match = ASS_TIME_RE.search(value)
+    if not match:
+        return 0
+    hours, minutes, seconds, fraction = match.groups()
+    return _to_ms(hours, minutes, seconds, fraction.ljust(2, "0"))
+
+
+def _ass_unescape(text):
+    return text.replace("\\h", " ")
+
+
+# TTML (and DFXP, IMSC). The document is written back as it was around the <p> paragraphs, one per cue, whose
+# start tags (timing, region, style) are kept; <span> styling around a line is restored and <br/> separates
+# the lines. Timing is read from the paragraph's begin with end or dur.
+class TtmlFormat:
+    name = "ttml"
+    extensions = (".ttml", ".dfxp")
+    mimetype = "application/ttml+xml"
+
+    def sniff(self, line):
+        return line.lstrip().startswith(("<?xml", "<tt"))
+
+    # Only the text since the last paragraph is held: `scanned` is where the next <p> start tag can begin
+    def read(self, lines, subtitles):
+        buffer = ""
+        scanned = 0
+        rates = None
+        for line in lines:
+            buffer += line
+            if rates is None:
+                root = TTML_ROOT_RE.search(buffer)
+                rates = _ttml_rates(root.group()) if root else None
+            while True:
+                opening = TTML_P_START_RE.search(buffer, scanned)
+                if not opening:
+                    scanned = max(scanned, buffer.rfind("<"))
+                    break
+                scanned = opening.start()
+                match = TTML_P_RE.match(buffer, scanned)
+                if not match:
+                    break
+                yield self._cue(len(subtitles.cues) + 1, buffer[:match.start()], match, rates)
+                buffer = buffer[match.end():]
+                scanned = 0
+        subtitles.footer = buffer
+
+    def _cue(self, index, before, match, rates):
+        name, attributes, content = match.groups()
+        values = {key.split(":")[-1]: first or second for key, first, second in TTML_ATTRIBUTE_RE.findall(attributes)}
+        start = _ttml_ms(values.get("begin"), rates)
+        if "end" in values:
+            end = _ttml_ms(values["end"], rates)
+        else:
+            end = start + _ttml_ms(values.get("dur"), rates)
+        prefix = name[:-1]
+        if content is None:
+            # An empty paragraph (<p .../>) is a cue without text, written back as it was
+            return Cue(index, start, end, ""), Frame(before + match.group(), [], "", f"<{prefix}br/>")
+        lines = [" ".join(line.split()) for line in TTML_BR_RE.split(content)]
+        text, wrappers = split_markup(lines, TTML_TAG_RE, html.unescape)
+        frame = Frame(before + f"<{name}{attributes}>", wrappers, f"</{name}>", f"<{prefix}br/>")
+        return Cue(index, start, end, text), frame
+
+    def format_cue(self, cue, frame):
+        if frame is None:
+            text = "<br/>".join(xml_escape(line) for line in cue.text.split("\n"))
+            return f'<p begin="{_vtt_time(cue.start_ms)}" end="{_vtt_time(cue.end_ms)}">{text}</p>\n'
+        return frame.head + frame.line_break.join(restore_markup(cue.text, frame.wrappers, xml_escape)) + frame.tail
+
+
+# (frames per second, ticks per second) from the ttp:frameRate and ttp:tickRate of the <tt> start tag
+def _ttml_rates(root):
+    frame_rate = re.search(r"frameRate\s*=\s*[\"'](\d+)", root)
+    tick_rate = re.search(r"tickRate\s*=\s*[\"'](\d+)", root)
+    frames = int(frame_rate.group(1)) if frame_rate else 30
+    return frames, int(tick_rate.group(1)) if tick_rate else (frames if frame_rate else 1)
+
+
+# Milliseconds of a TTML time expression: a clock time (00:00:01.500 or 00:00:01:12 in frames) or an offset
+# (1.5s, 1500ms, 36f, 15000000t)
+def _ttml_ms(value, rates):
+    if not value:
+        return 0
+    value = value.strip()
+    frames, ticks = rates or (30, 1)
+    match = TTML_CLOCK_RE.match(value)
+    if match:
+        hours, minutes, seconds, fraction, frame = match.groups()
+        ms = ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000
+        if fraction:
+            ms += round(float(fraction) * 1000)
+        elif frame:
+            ms += round(int(frame) * 1000 / frames)
+        return ms
+    match = TTML_OFFSET_RE.match(value)
+    if not match:
+        return 0
+    number, unit = float(match.group(1)), match.group(2)
+    if unit == "f":
+        return round(number * 1000 / frames)
+    if unit == "t":
+        return round(number * 1000 / ticks)
+    return round(number * TTML_OFFSET_MS[unit])
+
+
+FORMATS = {codec.name: codec for codec in (SrtFormat(), VttFormat(), AssFormat(), TtmlFormat())}
+FORMATS["ssa"] = FORMATS["ass"]
+FORMATS["dfxp"] = FORMATS["ttml"]
+# File extensions of every supported format, e.g. for a file uploader or a directory scan
+SUBTITLE_EXTENSIONS = tuple(extension for codec in dict.fromkeys(FORMATS.values()) for extension in codec.extensions)
+
+
+# A subtitle document in one of the supported formats: its cues with plain text only (what is sent for
+# translation) and, per cue, the Frame that puts the source's styling, positioning and layout back on output
+class Subtitles:
+    def __init__(self, codec, cues=None, frames=None, footer="", extension=None):
+        self.codec = codec
+        self.cues = cues if cues is not None else []
+        self.frames = frames if frames is not None else []
+        self.footer = footer
+        self.extension = extension or codec.extensions[0]
+
+    @property
+    def format(self):
+        return self.codec.name
+
+    def writer(self, stream):
+        return SubtitleWriter(self, stream)
+
+    # Write cues (the translated cues of this document, in order) to a text stream in this document's format
+    def write(self, cues, stream):
+        writer = self.writer(stream)
+        for cue in cues:
+            writer.write(cue)
+        writer.close()
+
+    def serialize(self, cues=None):
+        buffer = io.StringIO()
+        self.write(self.cues if cues is None else cues, buffer)
+        return buffer.getvalue()
+
+
+# Writes the cues of a document one at a time as they arrive (e.g. from translate_srt_stream), each with the
+# frame of the cue at the same position; close() writes the rest of the document
+class SubtitleWriter:
+    def __init__(self, subtitles, stream):
+        self.subtitles = subtitles
+        self.stream = stream
+        self._position = 0
+
+    def write(self, cue):
+        frames = self.subtitles.frames
+        frame = frames[self._position] if self._position < len(frames) else None
+        self.stream.write(self.subtitles.codec.format_cue(cue, frame))
+        self._position += 1
+
+    def close(self):
+        self.stream.write(self.subtitles.footer)
+
+
+# Subtitles for cues parsed elsewhere (e.g. with parse_srt), their SubRip tags moved out of the text as on a read
+def subtitles_from_cues(cues):
+    codec = FORMATS["srt"]
+    subtitles = Subtitles(codec)
+    for cue in cues:
+        cue, frame = codec.split(cue)
+        subtitles.cues.append(cue)
+        subtitles.frames.append(frame)
+    return subtitles
+
+
+# Codec for a format name ("srt", "vtt", "ass", "ssa", "ttml", "dfxp") or a file name with a known extension
+def subtitle_format(name):
+    key = name.lower()
+    if key in FORMATS:
+        return FORMATS[key]
+    extension = os.path.splitext(key)[1]
+    for codec in FORMATS.values():
+        if extension in codec.extensions:
+            return codec
+    raise ValueError(f"Unsupported subtitle format {name!r} (expected one of {', '.join(SUBTITLE_EXTENSIONS)})")
+
+
+# Stream a subtitle document (path, bytes-like object or file object) line by line into Subtitles. The format
+# is named, taken from the file extension of file_name (e.g. of an upload) or of a path, or recognised from
+# the first non-blank line (SubRip when nothing else matches, e.g. for TTML saved as .xml it is the <?xml
+# declaration).
+def read_subtitles(source, format_name=None, file_name=None):
+    lines = _iter_lines(source)
+    if file_name is None and isinstance(source, (str, os.PathLike)):
+        file_name = os.fspath(source)
+    if format_name is None and file_name:
+        try:
+            format_name = subtitle_format(file_name).name
+        except ValueError:
+            pass
+    if format_name is None:
+        peeked = []
+        for line in lines:
+            peeked.append(line)
+            if line.strip():
+                break
+        first = peeked[-1] if peeked else ""
+        codec = next((codec for codec in FORMATS.values() if codec.sniff(first)), FORMATS["srt"])
+        lines = itertools.chain(peeked, lines)
+    else:
+        codec = subtitle_format(format_name)
+    subtitles = Subtitles(codec)
+    with span("parse_subtitles", format=codec.name) as current:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            current.set(bytes=len(source))
+        for cue, frame in codec.read(lines, subtitles):
+            subtitles.cues.append(cue)
+            subtitles.frames.append(frame)
+        current.set(cues=len(subtitles.cues))
+    return subtitles
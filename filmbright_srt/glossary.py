@@ -0,0 +1,210 @@
+# filmbright_srt/glossary.py
+
+import os
+import re
+import threading
+import time
+from collections import Counter
+from filmbright_srt.readability import TAG_RE
+from filmbright_srt.storage import SqliteStore, select_in
+
+GLOSSARY_PATH = os.getenv("SRT_GLOSSARY_PATH", "glossary.sqlite3")
+# A term is pinned once it occurs in this many cues of a file; terms pinned earlier in the project are used
+# whenever they occur
+GLOSSARY_MIN_OCCURRENCES = int(os.getenv("SRT_GLOSSARY_MIN_OCCURRENCES", "2"))
+# Most frequent new terms sent for translation per file, and glossary entries added to one prompt
+GLOSSARY_MAX_TERMS = int(os.getenv("SRT_GLOSSARY_MAX_TERMS", "100"))
+GLOSSARY_PROMPT_TERMS = int(os.getenv("SRT_GLOSSARY_PROMPT_TERMS", "20"))
+# Longest run of capitalized words taken as one term ("Los Angeles Police Department")
+MAX_TERM_WORDS = 4
+
+# Words, sentence ends and the punctuation that separates terms ("Walter, Jesse")
+TOKEN_RE = re.compile(r"[^\W\d_][\w'’-]*|[.!?…]+|[^\w\s]")
+POSSESSIVE_RE = re.compile(r"['’]s$")
+# Capitalized words that are not names, and titles that belong to the name that follows
+STOPWORDS = frozenset("I I'm I'll I've I'd I’m I’ll I’ve I’d OK Okay Oh Ah Eh Hey Hi Mm Uh Um".split())
+HONORIFICS = frozenset("Mr Mrs Ms Dr Prof St Sr Jr".split())
+
+
+# Capitalized runs in one cue text as (words, sentence-initial) pairs
+def _capitalized_runs(text):
+    run = []
+    initial = sentence_start = True
+    for match in TOKEN_RE.finditer(TAG_RE.sub(" ", text)):
+        token = match.group()
+        if token[0].isalpha():
+            word = POSSESSIVE_RE.sub("", token)
+            if word[0].isupper() and word not in STOPWORDS:
+                if not run:
+                    initial = sentence_start
+                run.append(word)
+                if len(run) < MAX_TERM_WORDS:
+                    sentence_start = False
+                    continue
+            if run:
+                yield run, initial
+                run = []
+            sentence_start = False
+        elif token == "." and run and run[-1] in HONORIFICS:
+            run[-1] += "."
+        else:
+            if run:
+                yield run, initial
+                run = []
+            sentence_start = token[0] in ".!?…" or sentence_start
+    if run:
+        yield run, initial
+
+
+# Local frequency index of the proper nouns and other capitalized terms (names, places, organisations,
+# acronyms) in a film. A capitalized word at the start of a sentence only counts when the film also has it
+# capitalized mid-sentence or never has it in lower case, so "Look" or "Yes" do not become terms. Lines
+# written entirely in capitals (captions, lyrics) are skipped.
+class TermIndex:
+    def __init__(self, cues):
+        runs = []
+        evidence = set()
+        lowercase = set()
+        for position, cue in enumerate(cues):
+            if cue.text.upper() == cue.text:
+                continue
+            lowercase.update(token for token in TOKEN_RE.findall(cue.text) if token[0].islower())
+            for words, initial in _capitalized_runs(cue.text):
+                runs.append((position, words, initial))
+                if not initial:
+                    evidence.update(words)
+                elif len(words) > 1:
+                    evidence.update(words[1:])
+
+        self.positions = {}
+        for position, words, initial in runs:
+            if initial:
+                while words and words[0] not in evidence and words[0].lower() in lowercase:
+                    words = words[1:]
+            if not words or all(word.rstrip(".") in HONORIFICS for word in words):
+                continue
+            term = " ".join(words)
+            found = self.positions.setdefault(term, [])
+            if not found or found[-1] != position:
+                found.append(position)
+        self.counts = Counter({term: len(positions) for term, positions in self.positions.items()})
+        self._terms_at = {}
+        for term, positions in self.positions.items():
+            for position in positions:
+                self._terms_at.setdefault(position, []).append(term)
+
+    # Terms found in the cues at `positions` (all cues by default), most frequent first
+    def terms(self, positions=None):
+        if positions is None:
+            found = self.counts
+        else:
+            found = {term for position in positions for term in self._terms_at.get(position, ())}
+        return sorted(found, key=lambda term: (-self.counts[term], term))
+
+    # Terms worth pinning: those that recur in the film, most frequent first
+    def recurring(self, positions=None, min_occurrences=GLOSSARY_MIN_OCCURRENCES, limit=GLOSSARY_MAX_TERMS):
+        return [term for term in self.terms(positions) if self.counts[term] >= min_occurrences][:limit]
+
+    def first_position(self, term):
+        return self.positions[term][0]
+
+
+# The pinned translations ({term: translation}) that apply to one film and language, with its term index
+class Glossary:
+    def __init__(self, index, translations):
+        self.index = index
+        self.translations = translations
+
+    def __len__(self):
+        return len(self.translations)
+
+    # (term, translation) pairs for the terms in the cues at `positions`, to go into their prompt
+    def entries(self, positions, limit=GLOSSARY_PROMPT_TERMS):
+        terms = [term for term in self.index.terms(positions) if term in self.translations]
+        return [(term, self.translations[term]) for term in terms[:limit]]
+
+    # How many of the translated cues ({position: text}) leave out the pinned translation of one of their
+    # terms. Inflected languages change some names legitimately, so this is reported, not corrected.
+    def misses(self, translated):
+        missed = 0
+        for position, text in translated.items():
+            lowered = text.casefold()
+            if any(
+                translation.casefold() not in lowered
+                for term, translation in self.entries([position], limit=None)
+            ):
+                missed += 1
+        return missed
+
+
+# Pinned term translations per project (e.g. a series) and language, stored in SQLite. The first translation
+# of a term is kept, so every later chunk and episode of the project uses the same one; set_many overrides it.
+class GlossaryStore(SqliteStore):
+    def __init__(self, path=GLOSSARY_PATH):
+        super().__init__(path, (
+            """
+            CREATE TABLE IF NOT EXISTS glossary (
+                project TEXT NOT NULL,
+                target_language TEXT NOT NULL,
+                term TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                pinned_at REAL NOT NULL,
+                PRIMARY KEY (project, target_language, term)
+            )
+            """,
+        ))
+
+    # {term: translation} for the given terms (every term of the project and language by default)
+    def get(self, project, target_language, terms=None):
+        with self.connection() as conn:
+            if terms is None:
+                rows = conn.execute(
+                    "SELECT term, translation FROM glossary WHERE project = ? AND target_language = ? ORDER BY term",
+                    (project, target_language),
+                ).fetchall()
+                return dict(rows)
+            return dict(select_in(
+                conn,
+                "SELECT term, translation FROM glossary WHERE project = ? AND target_language = ? AND term IN ({})",
+                terms,
+                (project, target_language),
+            ))
+
+    # Pin translations ({term: translation}) that are not pinned yet and return the pinned translations of
+    # those terms, which differ where another job pinned a term first
+    def pin_many(self, project, target_language, translations):
+        self._write("INSERT OR IGNORE", project, target_language, translations)
+        return self.get(project, target_language, translations)
+
+    def set_many(self, project, target_language, translations):
+        self._write("INSERT OR REPLACE", project, target_language, translations)
+
+    def remove(self, project, target_language, terms):
+        with self.connection() as conn:
+            conn.executemany(
+                "DELETE FROM glossary WHERE project = ? AND target_language = ? AND term = ?",
+                [(project, target_language, term) for term in terms],
+            )
+
+    def _write(self, verb, project, target_language, translations):
+        now = time.time()
+        rows = [(project, target_language, term, translation, now) for term, translation in translations.items()]
+        if not rows:
+            return
+        with self.connection() as conn:
+            conn.executemany(f"{verb} INTO glossary VALUES (?, ?, ?, ?, ?)", rows)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# Process-wide glossary store, or None when SRT_GLOSSARY_PATH is set to an empty value
+def get_glossary_store():
+    global _store
+    if not GLOSSARY_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = GlossaryStore()
+        return _store
@@ -0,0 +1,204 @@
+# filmbright_srt/jobs.py
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from filmbright_srt.storage import SqliteStore
+from filmbright_srt.tracing import span, start_trace
+
+JOB_STORE_PATH = os.getenv("SRT_JOB_STORE_PATH", "jobs.sqlite3")
+# Jobs translating at the same time on the event loop; OpenAI requests are still capped by the rate-limit scheduler
+MAX_ACTIVE_JOBS = int(os.getenv("SRT_MAX_ACTIVE_JOBS", "32"))
+CALLBACK_TIMEOUT = float(os.getenv("SRT_JOB_CALLBACK_TIMEOUT", "10"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+# SQLite-backed record of every job, so status survives restarts and is visible to all workers
+class JobStore(SqliteStore):
+    def __init__(self, path=JOB_STORE_PATH):
+        super().__init__(
+            path,
+            (
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    trace TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """,
+            ),
+            row_factory=sqlite3.Row,
+        )
+        # Stores created before job traces were kept have no trace column yet
+        with self.connection() as conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "trace" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN trace TEXT")
+
+    def create(self, payload):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, stage, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, None, json.dumps(payload), now, now),
+            )
+        return job_id
+
+    def update(self, job_id, **fields):
+        for name in ("result", "trace"):
+            if name in fields:
+                fields[name] = json.dumps(fields[name])
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self.connection() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with self.connection() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def trace(self, job_id):
+        with self.connection() as conn:
+            row = conn.execute("SELECT trace FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["trace"]) if row and row["trace"] else None
+
+    def unfinished(self):
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+
+def _row_to_job(row):
+    return {
+        "job_id": row["id"],
+        "status": row["status"],
+        "stage": row["stage"],
+        "payload": json.loads(row["payload"]),
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+# In-process job runner on the event loop: every submitted job becomes a task that awaits
+# handler(payload, set_stage), and up to max_active jobs are in flight at once. Blocking work inside the
+# handler (Drive calls) must go through asyncio.to_thread. Store reads and writes run on a thread of their own,
+# so a busy default executor never delays accepting a job. Every job is traced (see filmbright_srt.tracing):
+# the trace of a running job is kept in memory and stored with the job once it has finished.
+class JobQueue:
+    def __init__(self, handler, store=None, max_active=MAX_ACTIVE_JOBS):
+        self.handler = handler
+        self.store = store or JobStore()
+        self._slots = asyncio.Semaphore(max(1, max_active))
+        self._tasks = set()
+        self._traces = {}
+        self._store_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="srt-job-store")
+
+    def _store(self, method, *args, **kwargs):
+        return asyncio.get_running_loop().run_in_executor(
+            self._store_thread, lambda: getattr(self.store, method)(*args, **kwargs)
+        )
+
+    # Queue a job and return its ID immediately
+    async def submit(self, payload):
+        job_id = await self._store("create", payload)
+        self._schedule(job_id, payload)
+        return job_id
+
+    # Re-queue jobs that were still queued or running when the process stopped
+    async def recover(self):
+        jobs = await self._store("unfinished")
+        for job in jobs:
+            await self._store("update", job["job_id"], status=QUEUED, stage=None)
+            self._schedule(job["job_id"], job["payload"])
+        return len(jobs)
+
+    async def get(self, job_id):
+        return await self._store("get", job_id)
+
+    # JSON trace of a job: live while it runs, from the store once it has finished
+    async def trace(self, job_id):
+        trace = self._traces.get(job_id)
+        if trace is not None:
+            return trace.as_dict()
+        return await self._store("trace", job_id)
+
+    @property
+    def depth(self):
+        return len(self._tasks)
+
+    def _schedule(self, job_id, payload):
+        task = asyncio.get_running_loop().create_task(self._run(job_id, payload))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # The trace is stored with the job however the job ends, even when running it raised or was cancelled
+    async def _run(self, job_id, payload):
+        try:
+            with start_trace(job_id) as trace:
+                self._traces[job_id] = trace
+                try:
+                    await self._run_traced(job_id, payload)
+                finally:
+                    del self._traces[job_id]
+        finally:
+            await self._store("update", job_id, trace=trace.as_dict())
+
+    async def _run_traced(self, job_id, payload):
+        async with self._slots:
+            await self._store("update", job_id, status=RUNNING)
+
+            async def set_stage(stage):
+                await self._store("update", job_id, stage=stage)
+
+            try:
+                with span("job.run"):
+                    result = await self.handler(payload, set_stage)
+                await self._store("update", job_id, status=SUCCEEDED, stage=None, result=result)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                await self._store("update", job_id, status=FAILED, error=str(e))
+        callback_url = payload.get("callback_url")
+        if callback_url:
+            await _send_callback(callback_url, await self.get(job_id))
+
+    # Stop the running jobs; they stay "running" in the store and are picked up again by recover()
+    async def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._store_thread.shutdown()
+
+
+# Notify the caller (e.g. Make.com) that a job finished; any failure is logged, not retried, so that it never
+# escapes the job's task
+async def _send_callback(url, job):
+    import httpx
+
+    body = {key: job[key] for key in ("job_id", "status", "result", "error")}
+    try:
+        with span("job.callback") as current:
+            async with httpx.AsyncClient(timeout=CALLBACK_TIMEOUT) as client:
+                response = await client.post(url, json=body)
+            current.set(status_code=response.status_code)
+    except Exception as e:
+        print(f"Callback to {url} for job {job['job_id']} failed: {e}")
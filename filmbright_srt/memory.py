@@ -0,0 +1,109 @@
+# filmbright_srt/memory.py
+
+import hashlib
+import os
+import threading
+import time
+import unicodedata
+from filmbright_srt.storage import SqliteStore, select_in
+
+TRANSLATION_MEMORY_PATH = os.getenv("SRT_TRANSLATION_MEMORY_PATH", "translation_memory.sqlite3")
+TRANSLATION_MEMORY_MAX_ENTRIES = int(os.getenv("SRT_TRANSLATION_MEMORY_MAX_ENTRIES", "500000"))
+
+
+# Normalize cue text so that trivial whitespace or Unicode differences still hit the cache
+def normalize_text(text):
+    text = unicodedata.normalize("NFC", text)
+    return "\n".join(" ".join(line.split()) for line in text.strip().splitlines() if line.strip())
+
+
+def _make_key(text, target_language, model, prompt_version):
+    raw = "\x1f".join([normalize_text(text), target_language, model, str(prompt_version)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# On-disk translation memory (SQLite) with least-recently-used eviction
+class TranslationMemory(SqliteStore):
+    def __init__(self, path=TRANSLATION_MEMORY_PATH, max_entries=TRANSLATION_MEMORY_MAX_ENTRIES):
+        super().__init__(
+            path,
+            (
+                """
+                CREATE TABLE IF NOT EXISTS translations (
+                    key TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    target_language TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """,
+                "CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)",
+            ),
+            synchronous="NORMAL",
+        )
+        self.max_entries = max_entries
+
+    # Look up translations for many source texts at once, returning {source_text: translation} for hits
+    def get_many(self, texts, target_language, model, prompt_version):
+        keys = {}
+        for text in texts:
+            keys.setdefault(_make_key(text, target_language, model, prompt_version), []).append(text)
+        if not keys:
+            return {}
+        hits = {}
+        with self.connection() as conn:
+            rows = select_in(conn, "SELECT key, translation FROM translations WHERE key IN ({})", keys)
+            for key, translation in rows:
+                for text in keys[key]:
+                    hits[text] = translation
+            if rows:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE translations SET last_used = ? WHERE key = ?", [(now, key) for key, _ in rows]
+                )
+        return hits
+
+    # Store translations given as (source_text, translation) pairs
+    def put_many(self, pairs, target_language, model, prompt_version):
+        now = time.time()
+        rows = [
+            (_make_key(source, target_language, model, prompt_version), source, target_language, model,
+             str(prompt_version), translation, now)
+            for source, translation in pairs
+        ]
+        if not rows:
+            return
+        with self.connection() as conn:
+            conn.executemany("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._evict(conn)
+
+    def _evict(self, conn):
+        (count,) = conn.execute("SELECT COUNT(*) FROM translations").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+
+    def __len__(self):
+        with self.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+# Process-wide translation memory, or None when SRT_TRANSLATION_MEMORY_PATH is set to an empty value
+def get_translation_memory():
+    global _memory
+    if not TRANSLATION_MEMORY_PATH:
+        return None
+    with _memory_lock:
+        if _memory is None:
+            _memory = TranslationMemory()
+        return _memory
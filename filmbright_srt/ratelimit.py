@@ -0,0 +1,344 @@
+# filmbright_srt/ratelimit.py
+
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "80000"))
+MAX_CONCURRENT_REQUESTS = int(os.getenv("SRT_MAX_CONCURRENT_REQUESTS", "8"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "6"))
+RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "60"))
+
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and server-side failures
+# (looked up lazily so that importing this module does not load the openai SDK)
+@lru_cache(maxsize=None)
+def retryable_errors():
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+# Classic token bucket: holds up to `capacity` units and refills at `rate` units per second
+class TokenBucket:
+    def __init__(self, capacity, rate):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self._level = float(capacity)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # Take `amount` units if they are available and return 0, otherwise return the seconds until they will be
+    def try_acquire(self, amount=1):
+        amount = min(float(amount), self.capacity)
+        with self._cond:
+            self._refill()
+            if self._level >= amount:
+                self._level -= amount
+                return 0.0
+            return (amount - self._level) / self.rate
+
+    # Block until `amount` units are available and take them; returns the time spent waiting
+    def acquire(self, amount=1):
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        with self._cond:
+            while True:
+                self._refill()
+                if self._level >= amount:
+                    self._level -= amount
+                    return waited
+                delay = (amount - self._level) / self.rate
+                start = time.monotonic()
+                self._cond.wait(delay)
+                waited += time.monotonic() - start
+
+    # acquire() for coroutines: waits with asyncio.sleep so the event loop keeps running
+    async def acquire_async(self, amount=1):
+        waited = 0.0
+        while True:
+            delay = self.try_acquire(amount)
+            if delay == 0:
+                return waited
+            start = time.monotonic()
+            await asyncio.sleep(delay)
+            waited += time.monotonic() - start
+
+    # Give back (positive) or charge extra (negative) units once the real cost is known
+    def adjust(self, amount):
+        with self._cond:
+            self._refill()
+            self._level = min(self.capacity, self._level + amount)
+            self._cond.notify_all()
+
+    @property
+    def level(self):
+        with self._cond:
+            self._refill()
+            return self._level
+
+
+# Seconds to wait according to the Retry-After / retry-after-ms headers of an API error, if any
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    # An HTTP date; anything malformed falls back to the jittered backoff instead of failing the retry
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+# A fixed number of slots shared by threads and coroutines (of any event loop), handed out strictly in the order
+# they were asked for. A release passes the slot straight to the oldest waiter: a thread is woken through its
+# Event, a coroutine through its future on its own loop, so nobody polls and nobody can jump the queue.
+class SlotPool:
+    def __init__(self, size):
+        self._free = size
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+            # Cancelled after the slot was handed over: pass it on (a cancelled future is handled by _hand_over)
+            if not queued and future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(self._hand_over, future)
+                    return
+                except RuntimeError:
+                    # Its event loop is closed; the next waiter gets the slot
+                    continue
+            self._free += 1
+
+    def _hand_over(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+# Schedules OpenAI calls within requests-per-minute and tokens-per-minute budgets and retries transient failures
+class RateLimitScheduler:
+    def __init__(
+        self,
+        requests_per_minute=OPENAI_REQUESTS_PER_MINUTE,
+        tokens_per_minute=OPENAI_TOKENS_PER_MINUTE,
+        max_concurrent=MAX_CONCURRENT_REQUESTS,
+        max_retries=OPENAI_MAX_RETRIES,
+        base_delay=RETRY_BASE_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+    ):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._slots = SlotPool(max_concurrent)
+        self._lock = threading.Lock()
+        self._stats = {
+            "queue_depth": 0,
+            "in_flight": 0,
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failures": 0,
+            "throttle_events": 0,
+            "throttle_seconds": 0.0,
+            "backoff_seconds": 0.0,
+            "estimated_tokens": 0,
+            "actual_tokens": 0,
+        }
+
+    def _count(self, **changes):
+        with self._lock:
+            for name, change in changes.items():
+                self._stats[name] += change
+
+    # Hold one of the concurrent request slots (kept for the whole duration of a streamed response)
+    @contextmanager
+    def slot(self):
+        self._count(queue_depth=1)
+        self._slots.acquire()
+        self._count(queue_depth=-1, in_flight=1)
+        try:
+            yield
+        finally:
+            self._count(in_flight=-1)
+            self._slots.release()
+
+    # Same as slot() for coroutines; the slots are shared with threads using slot() and served in one queue
+    @asynccontextmanager
+    async def slot_async(self):
+        self._count(queue_depth=1)
+        try:
+            await self._slots.acquire_async()
+        finally:
+            self._count(queue_depth=-1)
+        self._count(in_flight=1)
+        try:
+            yield
+        finally:
+            self._count(in_flight=-1)
+            self._slots.release()
+
+    def _throttle(self, estimated_tokens):
+        waited = self.requests.acquire(1) + self.tokens.acquire(estimated_tokens)
+        if waited > 0:
+            self._count(throttle_events=1, throttle_seconds=waited)
+
+    async def _throttle_async(self, estimated_tokens):
+        waited = await self.requests.acquire_async(1) + await self.tokens.acquire_async(estimated_tokens)
+        if waited > 0:
+            self._count(throttle_events=1, throttle_seconds=waited)
+
+    def _backoff(self, attempt, error):
+        delay = retry_after_seconds(error)
+        if delay is None:
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return min(delay, self.max_delay)
+
+    # Seconds to wait before retrying a failed call, or re-raise the error if it is not worth retrying
+    def _retry_delay(self, attempt, error):
+        import openai
+
+        if not isinstance(error, retryable_errors()):
+            self._count(failures=1)
+            raise error
+        if isinstance(error, openai.RateLimitError):
+            self._count(rate_limited=1)
+        if attempt >= self.max_retries:
+            self._count(failures=1)
+            raise error
+        delay = self._backoff(attempt, error)
+        self._count(retries=1, backoff_seconds=delay)
+        print(f"OpenAI request failed ({error.__class__.__name__}), retrying in {delay:.1f}s")
+        return delay
+
+    # Run fn() once the budgets allow it, retrying transient API errors with jittered backoff
+    def call(self, fn, estimated_tokens):
+        import openai
+
+        attempt = 0
+        while True:
+            self._throttle(estimated_tokens)
+            self._count(requests=1, estimated_tokens=estimated_tokens)
+            try:
+                return fn()
+            except openai.OpenAIError as e:
+                time.sleep(self._retry_delay(attempt, e))
+                attempt += 1
+
+    # call() for coroutines: awaits fn() and waits for budgets and backoff without blocking the event loop
+    async def call_async(self, fn, estimated_tokens):
+        import openai
+
+        attempt = 0
+        while True:
+            await self._throttle_async(estimated_tokens)
+            self._count(requests=1, estimated_tokens=estimated_tokens)
+            try:
+                return await fn()
+            except openai.OpenAIError as e:
+                await asyncio.sleep(self._retry_delay(attempt, e))
+                attempt += 1
+
+    # Correct the token budget once the real usage of a request is known
+    def record_usage(self, estimated_tokens, actual_tokens):
+        self._count(actual_tokens=actual_tokens)
+        self.tokens.adjust(estimated_tokens - actual_tokens)
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["request_budget_available"] = round(self.requests.level, 2)
+        stats["token_budget_available"] = round(self.tokens.level, 2)
+        return stats
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# Process-wide scheduler shared by every translation in this process
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RateLimitScheduler()
+        return _scheduler
+
+
+# Replace the process-wide scheduler with one using different limits (e.g. from command-line options)
+def configure_scheduler(**options):
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = RateLimitScheduler(**options)
+        return _scheduler
@@ -0,0 +1,132 @@
+# filmbright_srt/readability.py
+
+import os
+import re
+
+# Subtitle limits checked locally after translation (common broadcast and streaming guidelines)
+MAX_LINE_LENGTH = int(os.getenv("SRT_MAX_LINE_LENGTH", "42"))
+MAX_LINES = int(os.getenv("SRT_MAX_LINES", "2"))
+MAX_CHARS_PER_SECOND = float(os.getenv("SRT_MAX_CHARS_PER_SECOND", "17"))
+# How many times the cues that break the limits are sent back for a shorter rendition
+READABILITY_MAX_RETRIES = int(os.getenv("SRT_READABILITY_MAX_RETRIES", "1"))
+
+# Formatting tags (<i>, </font>, {\an8}) take no room on screen
+TAG_RE = re.compile(r"<[^>\n]*>|\{\\[^}\n]*\}")
+
+
+def visible_length(line):
+    return len(TAG_RE.sub("", line).strip())
+
+
+# Reading speed and layout of a list of cue texts, computed with NumPy over the whole list at once:
+#   cps      visible characters per second of display time (line breaks not counted)
+#   longest  visible length of the longest line
+#   lines    number of lines
+class ReadingMetrics:
+    __slots__ = ("cps", "longest", "lines")
+
+    def __init__(self, start_ms, end_ms, texts):
+        import numpy as np
+
+        # Strip the tags of the whole film in one pass and measure every line with NumPy's string functions
+        plain = "\n".join(texts)
+        if "<" in plain or "{" in plain:
+            plain = TAG_RE.sub("", plain)
+        lines = np.strings.count(np.array(texts, dtype=str), "\n").astype(np.int64) + 1
+        lengths = np.strings.str_len(np.strings.strip(np.array(plain.split("\n"))))
+        offsets = np.zeros(len(texts), dtype=np.int64)
+        np.cumsum(lines[:-1], out=offsets[1:])
+        if len(texts):
+            longest = np.maximum.reduceat(lengths, offsets)
+            chars = np.add.reduceat(lengths, offsets)
+        else:
+            longest = chars = np.zeros(0, dtype=np.int64)
+        seconds = np.maximum(np.asarray(end_ms, dtype=np.int64) - np.asarray(start_ms, dtype=np.int64), 1) / 1000
+        self.cps = chars / seconds
+        self.longest = longest
+        self.lines = lines
+
+
+# Timing arrays for the cues at `positions` (all cues by default)
+def cue_times(cues, positions=None):
+    import numpy as np
+
+    selected = cues if positions is None else [cues[position] for position in positions]
+    start_ms = np.fromiter((cue.start_ms for cue in selected), dtype=np.int64, count=len(selected))
+    end_ms = np.fromiter((cue.end_ms for cue in selected), dtype=np.int64, count=len(selected))
+    return start_ms, end_ms
+
+
+# Indices (into `texts`) of the translations that break the limits: a line that is too long, too many lines,
+# or a reading speed above max_cps that is also faster than the source cue's (a fast original is not the
+# translation's fault). Shown on screen for the same time as source_texts.
+def violations(
+    start_ms, end_ms, source_texts, texts,
+    max_line_length=MAX_LINE_LENGTH, max_lines=MAX_LINES, max_cps=MAX_CHARS_PER_SECOND,
+):
+    import numpy as np
+
+    source = ReadingMetrics(start_ms, end_ms, source_texts)
+    translated = ReadingMetrics(start_ms, end_ms, texts)
+    broken = (
+        (translated.longest > max_line_length)
+        | (translated.lines > max_lines)
+        | ((translated.cps > max_cps) & (translated.cps > source.cps))
+    )
+    return np.flatnonzero(broken).tolist()
+
+
+# Longest text (visible characters) each cue can hold: its lines, capped by the reading speed over its duration
+def character_budgets(start_ms, end_ms, max_line_length=MAX_LINE_LENGTH, max_lines=MAX_LINES,
+                      max_cps=MAX_CHARS_PER_SECOND):
+    import numpy as np
+
+    seconds = (np.asarray(end_ms, dtype=np.int64) - np.asarray(start_ms, dtype=np.int64)) / 1000
+    return np.clip(np.floor(seconds * max_cps), 1, max_line_length * max_lines).astype(np.int64).tolist()
+
+
+# Break a cue's words into at most max_lines lines of at most max_line_length visible characters, keeping the
+# lines as even as possible (the lower line the longer on a tie). Text that fits on one line becomes one line;
+# dialogue ("- " lines, one per speaker) keeps its breaks. Returns the text unchanged if it cannot fit.
+def rewrap(text, max_line_length=MAX_LINE_LENGTH, max_lines=MAX_LINES):
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+    if len(lines) > 1 and all(line.startswith("-") for line in lines):
+        return "\n".join(lines)
+    words = " ".join(lines).split()
+    if not words:
+        return text
+    widths = [visible_length(word) for word in words]
+    for count in range(1, min(max_lines, len(words)) + 1):
+        breaks = _balanced_breaks(widths, count)
+        wrapped = [" ".join(words[start:end]) for start, end in zip([0] + breaks, breaks + [len(words)])]
+        if max(visible_length(line) for line in wrapped) <= max_line_length:
+            return "\n".join(wrapped)
+    return text
+
+
+# Word indices at which to start lines 2..count so that the longest line is as short as possible
+def _balanced_breaks(widths, count):
+    if count == 1:
+        return []
+    total = len(widths)
+    prefix = [0]
+    for width in widths:
+        prefix.append(prefix[-1] + width)
+
+    def line_width(start, end):
+        return prefix[end] - prefix[start] + (end - start - 1)
+
+    # best[k][end]: (longest line, breaks) for the first `end` words on k lines
+    best = [{end: (line_width(0, end), []) for end in range(1, total + 1)}]
+    for lines in range(2, count + 1):
+        level = {}
+        for end in range(lines, total + 1):
+            candidates = (
+                (max(best[-1][start][0], line_width(start, end)), best[-1][start][1] + [start])
+                for start in range(lines - 1, end)
+                if start in best[-1]
+            )
+            # On equal widths prefer the earlier break, which leaves the lower line the longer one
+            level[end] = min(candidates, key=lambda candidate: (candidate[0], candidate[1][-1]))
+        best.append(level)
+    return best[-1][total][1]
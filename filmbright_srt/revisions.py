@@ -0,0 +1,132 @@
+# filmbright_srt/revisions.py
+
+import os
+import threading
+import time
+from difflib import SequenceMatcher
+from filmbright_srt.cues import parse_srt, serialize_srt
+from filmbright_srt.memory import normalize_text
+from filmbright_srt.storage import SqliteStore
+
+# Last source and translation of every file (by Drive file ID, upload name or path); empty disables the store
+REVISION_STORE_PATH = os.getenv("SRT_REVISION_STORE_PATH", "revisions.sqlite3")
+
+UNCHANGED = "unchanged"
+RETIMED = "retimed"
+EDITED = "edited"
+ADDED = "added"
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# SQLite record of the latest revision translated for each (file, language)
+class RevisionStore(SqliteStore):
+    def __init__(self, path=REVISION_STORE_PATH):
+        super().__init__(path, (
+            """
+            CREATE TABLE IF NOT EXISTS revisions (
+                file_key TEXT NOT NULL,
+                target_language TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                source TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (file_key, target_language)
+            )
+            """,
+        ))
+
+    # Previous (source cues, translated cues), or None if there is none for this model and prompt version
+    def get(self, file_key, target_language, model, prompt_version):
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT source, translation FROM revisions "
+                "WHERE file_key = ? AND target_language = ? AND model = ? AND prompt_version = ?",
+                (file_key, target_language, model, str(prompt_version)),
+            ).fetchone()
+        if row is None:
+            return None
+        return parse_srt(row[0].encode("utf-8")), parse_srt(row[1].encode("utf-8"))
+
+    def put(self, file_key, target_language, model, prompt_version, source_cues, translated_cues):
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO revisions "
+                "(file_key, target_language, model, prompt_version, source, translation, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    file_key, target_language, model, str(prompt_version),
+                    serialize_srt(source_cues), serialize_srt(translated_cues), time.time(),
+                ),
+            )
+
+
+# Process-wide revision store, or None when disabled
+def get_revision_store():
+    global _store
+    if not REVISION_STORE_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = RevisionStore(REVISION_STORE_PATH)
+        return _store
+
+
+# Cue-level difference between two revisions of a subtitle file
+class CueDiff:
+    __slots__ = ("changes", "removed")
+
+    def __init__(self, changes, removed):
+        # One (kind, old position or None) per cue of the new revision
+        self.changes = changes
+        self.removed = removed
+
+    def counts(self):
+        counts = dict.fromkeys((UNCHANGED, RETIMED, EDITED, ADDED), 0)
+        for kind, _ in self.changes:
+            counts[kind] += 1
+        counts["removed"] = self.removed
+        return counts
+
+    def summary(self):
+        counts = self.counts()
+        return ", ".join(f"{value} {kind}" for kind, value in counts.items())
+
+
+# Align the cues of a new revision with the old one by text. Cues whose text is unchanged are UNCHANGED, or
+# RETIMED if their number or timecodes moved; replaced cues are EDITED and inserted ones ADDED.
+def diff_cues(old_cues, new_cues):
+    old_texts = [normalize_text(cue.text) for cue in old_cues]
+    new_texts = [normalize_text(cue.text) for cue in new_cues]
+    changes = []
+    removed = 0
+    matcher = SequenceMatcher(None, old_texts, new_texts, autojunk=False)
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            for old_position, new_position in zip(range(old_start, old_end), range(new_start, new_end)):
+                old, new = old_cues[old_position], new_cues[new_position]
+                same_timing = (old.index, old.start_ms, old.end_ms) == (new.index, new.start_ms, new.end_ms)
+                changes.append((UNCHANGED if same_timing else RETIMED, old_position))
+        elif tag == "replace":
+            changes.extend((EDITED, None) for _ in range(new_start, new_end))
+            removed += max(0, (old_end - old_start) - (new_end - new_start))
+        elif tag == "insert":
+            changes.extend((ADDED, None) for _ in range(new_start, new_end))
+        else:
+            removed += old_end - old_start
+    return CueDiff(changes, removed)
+
+
+# Translations that carry over from the previous revision: {new position: translated text} for every cue whose
+# text did not change. Cues the previous run left in the source language are translated again.
+def carry_over(diff, old_cues, old_translations):
+    carried = {}
+    for position, (kind, old_position) in enumerate(diff.changes):
+        if old_position is None or not old_cues[old_position].text.strip():
+            continue
+        translated = old_translations[old_position].text
+        if translated != old_cues[old_position].text:
+            carried[position] = translated
+    return carried
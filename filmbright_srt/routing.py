@@ -0,0 +1,208 @@
+# filmbright_srt/routing.py
+
+import heapq
+import os
+import re
+from filmbright_srt.chunking import CHUNK_TOKEN_BUDGET, estimate_tokens
+from filmbright_srt.readability import TAG_RE, visible_length
+
+# How the cues of a job are spread over the two model tiers unless the job says otherwise:
+#   auto     runs of simple cues go to the fast model, everything else to the premium model
+#   premium  every cue goes to the premium model
+#   fast     every cue goes to the fast model (failed and doubtful lines are still escalated)
+ROUTING_POLICY = os.getenv("SRT_ROUTING_POLICY", "auto")
+PREMIUM_MODEL = os.getenv("SRT_PREMIUM_MODEL", "gpt-4")
+FAST_MODEL = os.getenv("SRT_FAST_MODEL", "gpt-4o-mini")
+# A cue is simple with at most this many words, in Latin script and without a dialogue exchange
+ROUTING_SIMPLE_WORDS = int(os.getenv("SRT_ROUTING_SIMPLE_WORDS", "6"))
+# Runs of at least this many hard cues are dense dialogue and stay on the premium model; a shorter run of hard
+# cues between simple ones goes to the fast model with them (and is escalated if it comes back doubtful)
+ROUTING_DENSE_CUES = int(os.getenv("SRT_ROUTING_DENSE_CUES", "3"))
+# Every run of one tier is worth at least this many tokens: each run starts its own chunks, so a short run costs
+# another partly filled request with its own instructions and context. Shorter runs merge with their neighbours,
+# which keeps auto routing at about as many requests as a single model.
+ROUTING_MIN_RUN_TOKENS = int(os.getenv("SRT_ROUTING_MIN_RUN_TOKENS", str(CHUNK_TOKEN_BUDGET // 2)))
+# A fast batch goes to the premium model as a whole when fewer of its lines than this pass the checks
+ROUTING_MIN_CONFIDENCE = float(os.getenv("SRT_ROUTING_MIN_CONFIDENCE", "0.8"))
+
+FAST = "fast"
+PREMIUM = "premium"
+MODES = ("auto", PREMIUM, FAST)
+
+WORD_RE = re.compile(r"\w+")
+# Sound descriptions and on-screen notes such as [LAUGHS] or (door slams)
+ANNOTATION_RE = re.compile(r"^[\[(][^\])]*[\])]$")
+
+
+def _is_latin(char):
+    return char < "ɐ" or "Ḁ" <= char <= "ỿ"
+
+
+# Model tier for one cue text. Cues without letters (numbers, music notes) and sound descriptions are simple;
+# so are short single-speaker lines in Latin script. Other scripts (CJK, Cyrillic, Arabic, ...) give no
+# reliable word count and stay on the premium model, as does anything long or with several speakers.
+def classify(text, max_simple_words=ROUTING_SIMPLE_WORDS):
+    plain = " ".join(TAG_RE.sub(" ", text).split())
+    letters = [char for char in plain if char.isalpha()]
+    if not letters or ANNOTATION_RE.match(plain):
+        return FAST
+    if sum(1 for char in letters if _is_latin(char)) < 0.8 * len(letters):
+        return PREMIUM
+    lines = [line for line in text.split("\n") if line.strip()]
+    if len(lines) > 1 and sum(1 for line in lines if line.lstrip().startswith("-")) > 1:
+        return PREMIUM
+    return FAST if len(WORD_RE.findall(plain)) <= max_simple_words else PREMIUM
+
+
+# A translation that passed validation but looks wrong: far longer or shorter than its source, or left in
+# the source language. The fast model's lines are checked with it before they are accepted.
+def doubtful(source, translation):
+    source_length = visible_length(source.replace("\n", " "))
+    length = visible_length(translation.replace("\n", " "))
+    if source_length >= 12 and not 0.3 <= length / source_length <= 3:
+        return True
+    return len(source.split()) >= 3 and source.split() == translation.split()
+
+
+# Which model translates which cues of a job, set per job (from the UI, the webhook payload or the command
+# line) with routing_policy()
+class RoutingPolicy:
+    def __init__(
+        self, mode=ROUTING_POLICY, fast_model=FAST_MODEL, premium_model=PREMIUM_MODEL,
+        max_simple_words=ROUTING_SIMPLE_WORDS, dense_cues=ROUTING_DENSE_CUES, min_run_tokens=ROUTING_MIN_RUN_TOKENS,
+        min_confidence=ROUTING_MIN_CONFIDENCE,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown routing mode {mode!r} (expected one of {', '.join(MODES)})")
+        self.mode = mode
+        self.models = {FAST: fast_model, PREMIUM: premium_model}
+        self.max_simple_words = max_simple_words
+        self.dense_cues = dense_cues
+        self.min_run_tokens = min_run_tokens
+        self.min_confidence = min_confidence
+
+    def model(self, tier):
+        return self.models[tier]
+
+    # Name under which the job's translations are remembered (translation memory, revisions): translations
+    # made under one policy are not reused by a job that asked for another
+    def model_key(self, model_id):
+        if self.mode != "auto":
+            return model_id(self.models[self.mode])
+        return f"{model_id(self.models[PREMIUM])}+{model_id(self.models[FAST])}"
+
+    # Split cue positions (in order) into consecutive runs for one tier: [(tier, [positions])]. Short runs of hard
+    # cues between simple ones join them, then runs too small to be worth a request of their own merge with the
+    # ones around them (see _merge_short_runs), which also keeps an ambiguous "Right." with its dialogue.
+    def route(self, cues, positions):
+        if not positions:
+            return []
+        if self.mode != "auto":
+            return [(self.mode, list(positions))]
+        runs = _runs([(classify(cues[position].text, self.max_simple_words), position) for position in positions])
+        joined = []
+        for number, (tier, run) in enumerate(runs):
+            if tier == PREMIUM and len(run) < self.dense_cues and 0 < number < len(runs) - 1:
+                tier = FAST
+            joined += [(tier, position) for position in run]
+        runs = _runs(joined)
+        tokens = [sum(estimate_tokens(cues[position].text) for position in run) for _, run in runs]
+        return _merge_short_runs(runs, tokens, self.min_run_tokens)
+
+    # Positions of a fast batch to send to the premium model: the lines that failed validation or look
+    # doubtful, or the whole batch when fewer than min_confidence of its lines passed
+    def escalations(self, cues, positions, translated, failed):
+        suspect = set(failed)
+        suspect.update(position for position, text in translated.items() if doubtful(cues[position].text, text))
+        if len(positions) - len(suspect) < self.min_confidence * len(positions):
+            return list(positions)
+        return sorted(suspect)
+
+    def as_dict(self):
+        return {
+            "mode": self.mode,
+            "fast_model": self.models[FAST],
+            "premium_model": self.models[PREMIUM],
+            "max_simple_words": self.max_simple_words,
+            "dense_cues": self.dense_cues,
+            "min_run_tokens": self.min_run_tokens,
+            "min_confidence": self.min_confidence,
+        }
+
+
+# Group (tier, position) pairs into consecutive runs of one tier: [(tier, [positions])]
+def _runs(routed):
+    runs = []
+    for tier, position in routed:
+        if runs and runs[-1][0] == tier:
+            runs[-1][1].append(position)
+        else:
+            runs.append((tier, [position]))
+    return runs
+
+
+# Merge runs ([(tier, [positions])], alternating tiers, with their token counts) until each one is worth a request
+# of its own: smallest first, a run below min_tokens takes the tier of the runs around it and joins them. Long
+# runs of either tier keep theirs, however they are interleaved. A merged run is kept as a span of the original
+# runs, runs[start:ends[start] + 1], linked to its neighbours, so the whole merge takes O(n log n).
+def _merge_short_runs(runs, tokens, min_tokens):
+    tokens = list(tokens)
+    tiers = [tier for tier, _ in runs]
+    ends = list(range(len(runs)))
+    before = list(range(-1, len(runs) - 1))
+    after = list(range(1, len(runs) + 1))
+    heap = [(size, start) for start, size in enumerate(tokens)]
+    heapq.heapify(heap)
+    remaining = len(runs)
+    while remaining > 1:
+        size, start = heapq.heappop(heap)
+        if size != tokens[start]:
+            # Merged into another run since, or grown and queued again
+            continue
+        if size >= min_tokens:
+            break
+        members = [number for number in (before[start], start, after[start]) if 0 <= number < len(runs)]
+        first = members[0]
+        tiers[first] = tiers[first] if first != start else tiers[members[1]]
+        tokens[first] = sum(tokens[number] for number in members)
+        for number in members[1:]:
+            tokens[number] = None
+        ends[first] = ends[members[-1]]
+        after[first] = after[members[-1]]
+        if after[first] < len(runs):
+            before[after[first]] = first
+        heapq.heappush(heap, (tokens[first], first))
+        remaining -= len(members) - 1
+    merged = []
+    start = 0
+    while start < len(runs):
+        merged.append((tiers[start], [position for _, run in runs[start:ends[start] + 1] for position in run]))
+        start = after[start]
+    return merged
+
+
+# Routing policy from a job setting: None (the defaults), a mode name, a dict of RoutingPolicy options (as sent
+# in a webhook payload) or a RoutingPolicy. Raises ValueError for anything else.
+def routing_policy(setting=None):
+    if setting is None:
+        return RoutingPolicy()
+    if isinstance(setting, RoutingPolicy):
+        return setting
+    if isinstance(setting, str):
+        return RoutingPolicy(mode=setting)
+    if isinstance(setting, dict):
+        options = RoutingPolicy().as_dict()
+        unknown = set(setting) - set(options)
+        if unknown:
+            raise ValueError(f"Unknown routing options: {', '.join(sorted(unknown))}")
+        options.update(setting)
+        for name in ("mode", "fast_model", "premium_model"):
+            if not isinstance(options[name], str) or not options[name]:
+                raise ValueError(f"Routing option {name} must be a non-empty string")
+        for name in ("max_simple_words", "dense_cues", "min_run_tokens"):
+            if not isinstance(options[name], int) or isinstance(options[name], bool) or options[name] < 0:
+                raise ValueError(f"Routing option {name} must be a non-negative integer")
+        if not isinstance(options["min_confidence"], (int, float)) or not 0 <= options["min_confidence"] <= 1:
+            raise ValueError("Routing option min_confidence must be between 0 and 1")
+        return RoutingPolicy(**options)
+    raise ValueError("routing must be a mode name or an object of routing options")
@@ -0,0 +1,52 @@
+# filmbright_srt/storage.py
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Values bound per statement by select_in; SQLite builds before 3.32 allow at most 999 parameters
+MAX_BOUND_VALUES = 500
+
+
+# One SQLite connection in WAL mode shared by every thread of the process, used under a lock. The on-disk
+# stores (translation memory, revisions, glossary, jobs, Drive upload sessions) build on it and pass the
+# statements that create their tables.
+class SqliteStore:
+    def __init__(self, path, schema=(), synchronous=None, row_factory=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if row_factory is not None:
+            self._conn.row_factory = row_factory
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        if synchronous:
+            self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        with self.connection() as conn:
+            for statement in schema:
+                conn.execute(statement)
+
+    # The connection, held for the block and committed after it (rolled back if it raises)
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Rows of a query whose "IN ({})" clause takes many values, run in slices of MAX_BOUND_VALUES; `params` are
+# bound before the values of each slice. Call it with the connection of SqliteStore.connection().
+def select_in(conn, sql, values, params=()):
+    values = list(values)
+    rows = []
+    for i in range(0, len(values), MAX_BOUND_VALUES):
+        batch = values[i:i + MAX_BOUND_VALUES]
+        rows += conn.execute(sql.format(",".join("?" * len(batch))), (*params, *batch)).fetchall()
+    return rows
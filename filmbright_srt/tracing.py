@@ -0,0 +1,225 @@
+# filmbright_srt/tracing.py
+
+import contextvars
+import itertools
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Numeric span attributes that are also summed into Prometheus counters, with the metric each one feeds
+COUNTED_ATTRIBUTES = {
+    "bytes": ("srt_stage_bytes_total", "Bytes read or written by each stage"),
+    "prompt_tokens": ("srt_stage_prompt_tokens_total", "Prompt tokens sent by each stage"),
+    "completion_tokens": ("srt_stage_completion_tokens_total", "Completion tokens received by each stage"),
+    "cues": ("srt_stage_cues_total", "Subtitle cues handled by each stage"),
+}
+# A trace keeps at most this many spans, so a huge job cannot grow its trace without bound
+TRACE_MAX_SPANS = 5000
+
+_current_trace = contextvars.ContextVar("srt_trace", default=None)
+_current_span = contextvars.ContextVar("srt_span", default=None)
+_span_ids = itertools.count(1)
+
+
+# One timed stage: a name, attributes such as bytes and token counts, and the error that ended it, if any
+class Span:
+    __slots__ = ("id", "parent", "name", "attributes", "started", "seconds", "error")
+
+    def __init__(self, name, attributes, parent=None):
+        self.id = next(_span_ids)
+        self.parent = parent
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+# Every span recorded while a job (or a Streamlit run) is being processed, for its JSON trace
+class Trace:
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self._spans = []
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            if len(self._spans) < TRACE_MAX_SPANS:
+                self._spans.append(span)
+            else:
+                self._dropped += 1
+
+    # Totals per stage. Stages run concurrently, so their seconds can add up to more than the wall time.
+    def stages(self):
+        with self._lock:
+            spans = list(self._spans)
+        stages = {}
+        for span in spans:
+            stage = stages.setdefault(span.name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "errors": 0})
+            stage["count"] += 1
+            stage["seconds"] += span.seconds
+            stage["max_seconds"] = max(stage["max_seconds"], span.seconds)
+            stage["errors"] += span.error is not None
+            for name in COUNTED_ATTRIBUTES:
+                if isinstance(span.attributes.get(name), (int, float)):
+                    stage[name] = stage.get(name, 0) + span.attributes[name]
+        for stage in stages.values():
+            stage["seconds"] = round(stage["seconds"], 4)
+            stage["max_seconds"] = round(stage["max_seconds"], 4)
+        return stages
+
+    def as_dict(self):
+        with self._lock:
+            spans = list(self._spans)
+            dropped = self._dropped
+        return {
+            "trace_id": self.trace_id,
+            "started_at": self.started_at,
+            "seconds": round(time.perf_counter() - self._origin, 4),
+            "stages": self.stages(),
+            "spans": [
+                {
+                    "id": span.id,
+                    "parent": span.parent,
+                    "name": span.name,
+                    "start_ms": round((span.started - self._origin) * 1000, 2),
+                    "duration_ms": round(span.seconds * 1000, 2),
+                    "attributes": span.attributes,
+                    "error": span.error,
+                }
+                for span in spans
+            ],
+            "dropped_spans": dropped,
+        }
+
+
+# Process-wide aggregates of every span, exported in the Prometheus text format
+class SpanMetrics:
+    def __init__(self, buckets=SPAN_BUCKETS):
+        self.buckets = buckets
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, span):
+        with self._lock:
+            stage = self._stages.get(span.name)
+            if stage is None:
+                stage = self._stages[span.name] = {
+                    "buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0, "errors": 0,
+                    "counted": dict.fromkeys(COUNTED_ATTRIBUTES, 0),
+                }
+            for number, bound in enumerate(self.buckets):
+                if span.seconds <= bound:
+                    stage["buckets"][number] += 1
+            stage["count"] += 1
+            stage["sum"] += span.seconds
+            stage["errors"] += span.error is not None
+            for name in COUNTED_ATTRIBUTES:
+                if isinstance(span.attributes.get(name), (int, float)):
+                    stage["counted"][name] += span.attributes[name]
+
+    def render(self, gauges=None):
+        with self._lock:
+            stages = {
+                name: {**stage, "buckets": list(stage["buckets"]), "counted": dict(stage["counted"])}
+                for name, stage in sorted(self._stages.items())
+            }
+        lines = [
+            "# HELP srt_stage_duration_seconds Time spent in each stage of the translation pipeline",
+            "# TYPE srt_stage_duration_seconds histogram",
+        ]
+        for name, stage in stages.items():
+            label = _label(name)
+            for bound, count in zip(self.buckets, stage["buckets"]):
+                lines.append(f'srt_stage_duration_seconds_bucket{{stage="{label}",le="{bound}"}} {count}')
+            lines.append(f'srt_stage_duration_seconds_bucket{{stage="{label}",le="+Inf"}} {stage["count"]}')
+            lines.append(f'srt_stage_duration_seconds_sum{{stage="{label}"}} {stage["sum"]:.6f}')
+            lines.append(f'srt_stage_duration_seconds_count{{stage="{label}"}} {stage["count"]}')
+        lines += ["# HELP srt_stage_errors_total Stages that ended with an error",
+                  "# TYPE srt_stage_errors_total counter"]
+        lines += [
+            f'srt_stage_errors_total{{stage="{_label(name)}"}} {stage["errors"]}' for name, stage in stages.items()
+        ]
+        for attribute, (metric, help_text) in COUNTED_ATTRIBUTES.items():
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [
+                f'{metric}{{stage="{_label(name)}"}} {stage["counted"][attribute]}'
+                for name, stage in stages.items() if stage["counted"][attribute]
+            ]
+        for name, (value, help_text) in (gauges or {}).items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_metrics = SpanMetrics()
+
+
+def get_span_metrics():
+    return _metrics
+
+
+# Time a stage: `with span("drive.download", file_id=file_id) as current: ...; current.set(bytes=n)`.
+# The span goes to the process-wide metrics and, inside start_trace(), to the current trace; spans opened
+# inside it (in this thread, in its asyncio tasks or in functions wrapped with in_context) are its children.
+@contextmanager
+def span(name, **attributes):
+    current = Span(name, attributes, parent=_current_span.get())
+    token = _current_span.set(current.id)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{e.__class__.__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        _finish(current)
+
+
+# Record a stage that was timed by the caller, e.g. across the yields of a generator
+def record_span(name, seconds, error=None, **attributes):
+    current = Span(name, attributes, parent=_current_span.get())
+    current.started -= seconds
+    current.error = error
+    _finish(current, seconds)
+
+
+def _finish(current, seconds=None):
+    current.seconds = seconds if seconds is not None else time.perf_counter() - current.started
+    _metrics.observe(current)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(current)
+
+
+# Collect the spans of everything run inside the block (a job, a Streamlit run) into a Trace
+@contextmanager
+def start_trace(trace_id=None):
+    trace = Trace(trace_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+# Wrap fn so that it runs with the caller's trace and parent span, e.g. when it is handed to a thread pool
+def in_context(fn):
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
@@ -0,0 +1,65 @@
+# filmbright_srt/transfers.py
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from filmbright_srt.drive import GOOGLE_CREDENTIALS_PATH, download_srt_file, get_drive_service, upload_file_to_drive
+from filmbright_srt.tracing import in_context, span
+
+DRIVE_TRANSFER_WORKERS = int(os.getenv("DRIVE_TRANSFER_WORKERS", "8"))
+# Drive accepts at most 100 calls in one batch request
+DRIVE_BATCH_SIZE = 100
+DRIVE_METADATA_FIELDS = "id, name, mimeType, size, parents"
+
+
+# Metadata of many files in as few round-trips as possible: one Drive batch request per 100 files.
+# Returns {file_id: metadata}; the first failed lookup is raised once the batch has finished.
+def get_files_metadata(file_ids, fields=DRIVE_METADATA_FIELDS, credentials_path=GOOGLE_CREDENTIALS_PATH):
+    service = get_drive_service(credentials_path)
+    file_ids = list(dict.fromkeys(file_ids))
+    metadata = {}
+    errors = []
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            errors.append(exception)
+        else:
+            metadata[file_ids[int(request_id)]] = response
+
+    for start in range(0, len(file_ids), DRIVE_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=on_response)
+        for position in range(start, min(start + DRIVE_BATCH_SIZE, len(file_ids))):
+            batch.add(service.files().get(fileId=file_ids[position], fields=fields), request_id=str(position))
+        with span("drive.metadata", files=min(DRIVE_BATCH_SIZE, len(file_ids) - start)):
+            batch.execute()
+        if errors:
+            raise errors[0]
+    return metadata
+
+
+# Download several files concurrently, each worker thread using its own Drive connection.
+# Returns {file_id: bytes} in the order the IDs were given.
+def download_files(file_ids, credentials_path=GOOGLE_CREDENTIALS_PATH, max_workers=DRIVE_TRANSFER_WORKERS):
+    file_ids = list(dict.fromkeys(file_ids))
+    if not file_ids:
+        return {}
+
+    def download(file_id):
+        return download_srt_file(get_drive_service(credentials_path), file_id)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(file_ids))) as executor:
+        return dict(zip(file_ids, executor.map(in_context(download), file_ids)))
+
+
+# Upload several in-memory files concurrently. `files` holds (file_name, content) or
+# (file_name, content, mimetype) tuples; returns the new file IDs in the same order.
+def upload_files(files, folder_id, credentials_path=GOOGLE_CREDENTIALS_PATH, max_workers=DRIVE_TRANSFER_WORKERS):
+    files = list(files)
+    if not files:
+        return []
+
+    def upload(file):
+        file_name, content, *mimetype = file
+        return upload_file_to_drive(get_drive_service(credentials_path), content, file_name, folder_id, *mimetype)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as executor:
+        return list(executor.map(in_context(upload), files))
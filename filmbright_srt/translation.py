@@ -0,0 +1,876 @@
+# filmbright_srt/translation.py
+
+import asyncio
+import contextlib
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from filmbright_srt.backends import get_backend
+from filmbright_srt.alignment import (
+    ALIGNMENT_MAX_RETRIES, AlignmentStats, failed_lines, timing_mismatches, validate_lines,
+)
+from filmbright_srt.chunking import (
+    CHUNK_CONTEXT_ITEMS, CHUNK_TOKEN_BUDGET, MAX_CONCURRENT_CHUNKS,
+    estimate_tokens, make_chunks, run_chunks,
+)
+from filmbright_srt.cues import Cue, encode_line, format_numbered_lines, iter_numbered_lines
+from filmbright_srt.estimator import count_tokens, get_throughput_history
+from filmbright_srt.formats import Subtitles, read_subtitles, subtitles_from_cues
+from filmbright_srt.glossary import Glossary, TermIndex, get_glossary_store
+from filmbright_srt.memory import get_translation_memory, normalize_text
+from filmbright_srt.ratelimit import MAX_CONCURRENT_REQUESTS, OPENAI_TOKENS_PER_MINUTE, get_scheduler
+from filmbright_srt.readability import (
+    READABILITY_MAX_RETRIES, character_budgets, cue_times, rewrap, violations, visible_length,
+)
+from filmbright_srt.revisions import ADDED, EDITED, carry_over, diff_cues, get_revision_store
+from filmbright_srt.routing import FAST, PREMIUM, PREMIUM_MODEL, doubtful, routing_policy
+from filmbright_srt.tracing import in_context, record_span, span
+
+# Model (the premium tier, see filmbright_srt.routing) and prompt revision; bump PROMPT_VERSION whenever the
+# prompt changes so cached translations are not reused
+TRANSLATION_MODEL = PREMIUM_MODEL
+PROMPT_VERSION = 5
+# Translate repeated cue texts ("Yes.", a chorus) once per file and copy the translation to every repeat
+DEDUPLICATE_CUES = os.getenv("SRT_DEDUPLICATE_CUES", "1") != "0"
+
+
+# Raised when a chunk cannot be translated, so that a failure never ends up inside the subtitle file
+class TranslationError(Exception):
+    pass
+
+
+# Instructions shared by every request for a language. They live in the system message, so they are sent
+# once per request instead of being wrapped around every chunk, and form an identical prefix across requests.
+def _system_message(target_language):
+    return (
+        f"You are a professional subtitle translator. Translate film subtitles into {target_language}.\n"
+        "Each input line is ID|text, where <br> is a line break inside the subtitle. Answer with exactly one "
+        "line ID|translation per input line, with the same IDs in the same order, keeping <br>. Never merge, "
+        "split, skip or add lines, and output nothing else.\n"
+        "Write natural, idiomatic subtitles about as long as the originals rather than word-for-word "
+        "translations, using the surrounding dialogue for context. Lines under \"Context:\" are neighbouring "
+        "subtitles for reference only; do not translate them."
+    )
+
+
+# Build the chat messages for translating numbered lines, with neighbouring cue texts as optional context.
+# max_chars (one number per line) asks for translations that fit the subtitle's room on screen; glossary
+# ((term, translation) pairs) gives the pinned renditions of the names and terms in these lines.
+def _build_messages(text, target_language, context_before="", context_after="", max_chars=None, glossary=None):
+    sections = []
+    if context_before:
+        sections.append(f"Context:\n{context_before}")
+    if glossary:
+        entries = "\n".join(f"{term} = {translation}" for term, translation in glossary)
+        sections.append(f"Glossary (always render these names and terms this way):\n{entries}")
+    if max_chars:
+        limits = "\n".join(f"{number}: {limit}" for number, limit in enumerate(max_chars, start=1))
+        sections.append(
+            "Keep each translation within its character limit below (not counting <br> and tags). Condense or "
+            f"paraphrase, never cut a sentence off.\n{limits}"
+        )
+    sections.append(f"Translate:\n{text}")
+    if context_after:
+        sections.append(f"Context:\n{context_after}")
+    return [
+        {"role": "system", "content": _system_message(target_language)},
+        {"role": "user", "content": "\n\n".join(sections)},
+    ]
+
+
+# Tokens a request is expected to use: the prompt plus a translation about as long as the input
+def estimate_request_tokens(messages, text):
+    return sum(estimate_tokens(message["content"]) for message in messages) + int(estimate_tokens(text) * 1.5)
+
+
+# Translate subtitles on `model` with the configured backend (OpenAI by default, see filmbright_srt.backends).
+# The request's latency, tokens and cost are added to `stats` (an AlignmentStats) when given.
+def translate_text(
+    text, target_language, context_before="", context_after="", max_chars=None, glossary=None,
+    model=TRANSLATION_MODEL, stats=None,
+):
+    import openai
+
+    backend = get_backend()
+    scheduler = get_scheduler()
+    messages = _build_messages(text, target_language, context_before, context_after, max_chars, glossary)
+    estimated_tokens = estimate_request_tokens(messages, text)
+
+    timing = {}
+
+    def request():
+        started = time.monotonic()
+        result = backend.complete(model, messages)
+        timing["seconds"] = time.monotonic() - started
+        return result
+
+    try:
+        # Call the chat completions API within the shared rate limits
+        with span("translate.request", language=target_language, lines=_line_count(text), model=model) as current:
+            with scheduler.slot():
+                completion = scheduler.call(request, estimated_tokens)
+            current.set(prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens)
+        return _completion_text(completion, target_language, estimated_tokens, timing["seconds"], model, stats)
+
+    except openai.OpenAIError as e:
+        print(f"OpenAI API Error: {e}")
+        raise TranslationError(f"OpenAI API Error: {e}") from e
+
+
+def _line_count(text):
+    return text.count("\n") + 1
+
+
+# Name under which translations are remembered for a routing policy; the mock backend keeps its own
+def _model_key(routing=None):
+    return routing_policy(routing).model_key(get_backend().model_id)
+
+
+def _record_usage(completion, target_language, estimated_tokens, seconds, model, stats):
+    if completion.total_tokens:
+        get_scheduler().record_usage(estimated_tokens, completion.total_tokens)
+        get_throughput_history().record(
+            get_backend().model_id(model), target_language, completion.prompt_tokens, completion.completion_tokens,
+            seconds,
+        )
+    if stats is not None:
+        stats.add_usage(model, seconds, completion.prompt_tokens, completion.completion_tokens)
+
+
+# Record the usage of a completed request and return its text
+def _completion_text(completion, target_language, estimated_tokens, seconds, model, stats):
+    _record_usage(completion, target_language, estimated_tokens, seconds, model, stats)
+    if not completion.content:
+        raise TranslationError("OpenAI returned an empty translation")
+    return completion.content.strip()
+
+
+# translate_text for coroutines (with the event loop's AsyncOpenAI client); shares the rate limits with threads
+async def translate_text_async(
+    text, target_language, context_before="", context_after="", max_chars=None, glossary=None,
+    model=TRANSLATION_MODEL, stats=None,
+):
+    import openai
+
+    backend = get_backend()
+    scheduler = get_scheduler()
+    messages = _build_messages(text, target_language, context_before, context_after, max_chars, glossary)
+    estimated_tokens = estimate_request_tokens(messages, text)
+
+    timing = {}
+
+    async def request():
+        started = time.monotonic()
+        result = await backend.complete_async(model, messages)
+        timing["seconds"] = time.monotonic() - started
+        return result
+
+    try:
+        with span("translate.request", language=target_language, lines=_line_count(text), model=model) as current:
+            async with scheduler.slot_async():
+                completion = await scheduler.call_async(request, estimated_tokens)
+            current.set(prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens)
+        # Recording the usage writes the job log, which is kept off the event loop
+        return await asyncio.to_thread(
+            _completion_text, completion, target_language, estimated_tokens, timing["seconds"], model, stats
+        )
+
+    except openai.OpenAIError as e:
+        print(f"OpenAI API Error: {e}")
+        raise TranslationError(f"OpenAI API Error: {e}") from e
+
+
+# Streaming variant of translate_text: yields (line number, translated text) as soon as each line is complete
+def translate_text_stream(
+    text, target_language, context_before="", context_after="", glossary=None, model=TRANSLATION_MODEL, stats=None
+):
+    import openai
+
+    backend = get_backend()
+    scheduler = get_scheduler()
+    messages = _build_messages(text, target_language, context_before, context_after, glossary=glossary)
+    estimated_tokens = estimate_request_tokens(messages, text)
+    usage = None
+
+    def fragments(events):
+        nonlocal usage
+        for fragment, completion in events:
+            if completion is not None:
+                usage = completion
+            yield fragment
+
+    # The span is recorded at the end: a generator must not hold the current span across its yields
+    requested = time.monotonic()
+    attributes = {"language": target_language, "lines": _line_count(text), "model": model, "stream": True}
+    try:
+        with scheduler.slot():
+            started = time.monotonic()
+            events = scheduler.call(lambda: backend.stream(model, messages), estimated_tokens)
+            yield from iter_numbered_lines(fragments(events))
+            seconds = time.monotonic() - started
+        if usage:
+            _record_usage(usage, target_language, estimated_tokens, seconds, model, stats)
+            attributes.update(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+        record_span("translate.request", time.monotonic() - requested, **attributes)
+
+    except openai.OpenAIError as e:
+        record_span("translate.request", time.monotonic() - requested, error=f"{e.__class__.__name__}: {e}",
+                    **attributes)
+        print(f"OpenAI API Error: {e}")
+        raise TranslationError(f"OpenAI API Error: {e}") from e
+
+
+# Accept a parsed document (e.g. shared between languages), a list of cues or anything read_subtitles reads
+# (SRT, WebVTT, ASS/SSA or TTML, told apart by file_name when given). Only the plain text of the cues is ever
+# sent for translation; the document keeps their styling and positioning for the output.
+def load_subtitles(source, file_name=None):
+    if isinstance(source, Subtitles):
+        return source
+    if isinstance(source, (list, tuple)) and all(isinstance(cue, Cue) for cue in source):
+        return subtitles_from_cues(source)
+    return read_subtitles(source, file_name=file_name)
+
+
+def load_cues(source):
+    return load_subtitles(source).cues
+
+
+# Look up the translation memory and group the remaining cues into token-budgeted chunks of cue positions.
+# Cues whose normalized text repeats an earlier cue's are left out of the chunks: only the first occurrence is
+# sent, with its own neighbours as context, and `duplicates` ({first position: [repeat positions]}) says where
+# its translation goes as well. The routing policy splits the cues into runs for one model tier each; every
+# chunk belongs to one run (chunk.tier) and the chunks stay in cue order.
+def _plan_translation(cues, target_language, memory, known=None, routing=None):
+    routing = routing_policy(routing)
+    known = known or {}
+    translations = [known.get(position, cue.text) for position, cue in enumerate(cues)]
+    hits = {}
+    if memory is not None:
+        hits = memory.get_many(
+            {cue.text for position, cue in enumerate(cues) if cue.text.strip() and position not in known},
+            target_language, _model_key(routing), PROMPT_VERSION,
+        )
+    pending = []
+    first = {}
+    duplicates = {}
+    for position, cue in enumerate(cues):
+        if position in known:
+            continue
+        if cue.text in hits:
+            translations[position] = hits[cue.text]
+        elif cue.text.strip():
+            pending.append(position)
+            key = normalize_text(cue.text) if DEDUPLICATE_CUES else position
+            if key in first:
+                duplicates.setdefault(first[key], []).append(position)
+            else:
+                first[key] = position
+
+    # Route every cue still to translate, repeats included, and only then leave the repeats out of the runs:
+    # taking them out first would cut the runs of one tier into more (and smaller) requests
+    repeats = {repeat for positions in duplicates.values() for repeat in positions}
+    runs = []
+    for tier, run in routing.route(cues, pending):
+        run = [position for position in run if position not in repeats]
+        if runs and runs[-1][0] == tier:
+            runs[-1][1].extend(run)
+        elif run:
+            runs.append((tier, run))
+
+    chunks = []
+    for tier, run in runs:
+        for chunk in make_chunks(
+            run,
+            max_tokens=CHUNK_TOKEN_BUDGET,
+            size=lambda position: estimate_tokens(cues[position].text),
+        ):
+            chunk.position = len(chunks)
+            chunk.tier = tier
+            chunks.append(chunk)
+    return translations, chunks, duplicates
+
+
+# Copy the translations of first occurrences ({position: text}, updated in place) to their repeats
+def _fan_out(translated, duplicates):
+    for position in [position for position in translated if position in duplicates]:
+        for repeat in duplicates[position]:
+            translated[repeat] = translated[position]
+    return translated
+
+
+# The positions of a chunk followed by the repeats of its cues
+def _with_repeats(positions, duplicates):
+    return list(positions) + [repeat for position in positions for repeat in duplicates.get(position, ())]
+
+
+# Prompt arguments for some cue positions: their texts as numbered lines plus the real neighbouring cues as context
+def _lines_prompt(cues, positions):
+    first, last = positions[0], positions[-1]
+    return (
+        format_numbered_lines(cues[position].text for position in positions),
+        "\n".join(encode_line(cue.text) for cue in cues[max(0, first - CHUNK_CONTEXT_ITEMS):first]),
+        "\n".join(encode_line(cue.text) for cue in cues[last + 1:last + 1 + CHUNK_CONTEXT_ITEMS]),
+    )
+
+
+def _chunk_prompt(cues, chunk):
+    return _lines_prompt(cues, chunk.items)
+
+
+# Predict wall time and cost of translating a source with the given concurrency, from real token counts
+# of the chunks that would be sent (translation memory hits excluded), the model each chunk is routed to and
+# the measured throughput history of that model
+def estimate_translation(source, target_language, max_workers=MAX_CONCURRENT_CHUNKS, routing=None):
+    cues = load_cues(source)
+    routing = routing_policy(routing)
+    _, chunks, _ = _plan_translation(cues, target_language, get_translation_memory(), routing=routing)
+    chunk_tokens = {}
+    for chunk in chunks:
+        model = routing.model(chunk.tier)
+        text, context_before, context_after = _chunk_prompt(cues, chunk)
+        messages = _build_messages(text, target_language, context_before, context_after)
+        input_tokens = sum(count_tokens(message["content"], model) for message in messages)
+        chunk_tokens.setdefault(get_backend().model_id(model), []).append(
+            (input_tokens, int(count_tokens(text, model) * 1.2))
+        )
+    return get_throughput_history().predict_routed(
+        target_language,
+        chunk_tokens,
+        concurrency=min(max_workers, MAX_CONCURRENT_REQUESTS),
+        tokens_per_minute=OPENAI_TOKENS_PER_MINUTE,
+    )
+
+
+# Check a model answer (numbered line pairs) for the cues at `positions`. Returns ({position: translation}
+# for the lines that align, positions to re-request, issues found)
+def _align_output(cues, positions, pairs):
+    valid, issues = validate_lines(pairs, [cues[position].text for position in positions])
+    translated = {positions[number - 1]: text for number, text in valid.items()}
+    return translated, [positions[number - 1] for number in failed_lines(issues)], issues
+
+
+# Resume translation steps with the answer to their last request, or with the TranslationError it raised.
+# Returns (True, result) once they are done, else (False, the keyword arguments of their next request).
+def _resume(steps, output=None, error=None):
+    try:
+        return False, (steps.throw(error) if error is not None else steps.send(output))
+    except StopIteration as done:
+        return True, done.value
+
+
+# The stages of a translation that talk to the model (a chunk, its retries and shortenings, the glossary terms)
+# are written once, as generators ("steps") that yield the arguments of each translate_text request and are
+# sent its answer. _run_steps runs them in the calling thread with blocking requests.
+def _run_steps(steps):
+    done, value = _resume(steps)
+    while not done:
+        try:
+            output, error = translate_text(**value), None
+        except TranslationError as e:
+            output, error = None, e
+        done, value = _resume(steps, output, error)
+    return value
+
+
+# _run_steps for coroutines: only the requests are awaited on the event loop, while the work between them
+# (alignment, readability checks, translation memory, glossary and term index) runs in a worker thread. `limit`
+# (an asyncio.Semaphore) is only held for the first request, so the follow-ups of a started chunk never queue
+# behind new chunks.
+async def _run_steps_async(steps, limit=None):
+    done, value = await asyncio.to_thread(_resume, steps)
+    while not done:
+        gate, limit = (limit if limit is not None else contextlib.nullcontext()), None
+        try:
+            async with gate:
+                output, error = await translate_text_async(**value), None
+        except TranslationError as e:
+            output, error = None, e
+        done, value = await asyncio.to_thread(_resume, steps, output, error)
+    return value
+
+
+# Steps sending the cues at the given positions again, on their own and up to ALIGNMENT_MAX_RETRIES times, until
+# their lines validate. Returns {position: translation} for the cues that were repaired.
+def _retry_failed(cues, positions, target_language, stats, glossary=None, model=TRANSLATION_MODEL):
+    repaired = {}
+    pending = list(positions)
+    stats.add(retried=len(pending))
+    for _ in range(ALIGNMENT_MAX_RETRIES):
+        if not pending:
+            break
+        text, context_before, context_after = _lines_prompt(cues, pending)
+        output = yield dict(
+            text=text, target_language=target_language, context_before=context_before, context_after=context_after,
+            glossary=_glossary_entries(glossary, pending), model=model, stats=stats,
+        )
+        stats.add(retry_requests=1)
+        translated, pending, _ = _align_output(cues, pending, iter_numbered_lines([output]))
+        repaired.update(translated)
+    stats.add(repaired=len(repaired))
+    return repaired
+
+
+# Positions among `positions` whose translation breaks the subtitle limits (line length, line count, reading speed)
+def _broken_positions(cues, positions, translated):
+    start_ms, end_ms = cue_times(cues, positions)
+    source_texts = [cues[position].text for position in positions]
+    broken = violations(start_ms, end_ms, source_texts, [translated[position] for position in positions])
+    return [positions[number] for number in broken]
+
+
+# Re-wrap the translations ({position: text}, updated in place) that break the limits. Returns the positions
+# that still break them, which need a shorter rendition, and how many cues were re-wrapped.
+def _rewrap_broken(cues, translated):
+    broken = _broken_positions(cues, sorted(translated), translated)
+    rewrapped = 0
+    for position in broken:
+        text = rewrap(translated[position])
+        if text != translated[position]:
+            translated[position] = text
+            rewrapped += 1
+    return (_broken_positions(cues, broken, translated) if rewrapped else broken), rewrapped
+
+
+# A single streamed line, re-wrapped if needed, or None when it needs a shorter rendition
+def _fit_line(cues, position, text):
+    fitted = {position: text}
+    broken, _ = _rewrap_broken(cues, fitted)
+    return None if broken else fitted[position]
+
+
+# Prompt arguments asking for shorter renditions of some cues, with the room each one has on screen
+def _shorten_prompt(cues, positions):
+    return (*_lines_prompt(cues, positions), character_budgets(*cue_times(cues, positions)))
+
+
+# Take the renditions in `output` that are shorter than the current translations. Returns the positions that
+# still break the limits.
+def _accept_shorter(cues, positions, translated, output):
+    candidates, _, _ = _align_output(cues, positions, iter_numbered_lines([output]))
+    for position, text in candidates.items():
+        text = rewrap(text)
+        if visible_length(text.replace("\n", " ")) < visible_length(translated[position].replace("\n", " ")):
+            translated[position] = text
+    return _broken_positions(cues, positions, translated)
+
+
+# Steps holding the translations of a chunk ({position: text}, updated in place) to the subtitle limits: lines
+# that overflow are re-wrapped locally and only the cues that still break the limits are sent back, up to
+# READABILITY_MAX_RETRIES times, for a shorter rendition. Cues that cannot be fixed keep their translation.
+def _enforce_readability(cues, translated, target_language, stats, glossary=None, model=TRANSLATION_MODEL):
+    pending, rewrapped = _rewrap_broken(cues, translated)
+    requested = len(pending)
+    for _ in range(READABILITY_MAX_RETRIES):
+        if not pending:
+            break
+        text, context_before, context_after, max_chars = _shorten_prompt(cues, pending)
+        try:
+            output = yield dict(
+                text=text, target_language=target_language, context_before=context_before,
+                context_after=context_after, max_chars=max_chars, glossary=_glossary_entries(glossary, pending),
+                model=model, stats=stats,
+            )
+        except TranslationError as e:
+            print(f"Could not shorten cues {[cues[position].index for position in pending]}: {e}")
+            break
+        stats.add(shorten_requests=1)
+        pending = _accept_shorter(cues, pending, translated, output)
+    stats.add(rewrapped=rewrapped, shorten_requested=requested, shortened=requested - len(pending),
+              over_limits=len(pending))
+    return translated
+
+
+# Record the outcome of one chunk: statistics, a warning for cues left untranslated and translation memory
+# entries for the validated translations. `delivered` holds positions already streamed out with an unvalidated line.
+def _finish_chunk(
+    cues, positions, translated, target_language, memory, stats, delivered=(), glossary=None, routing=None
+):
+    missing = [
+        cues[position].index for position in positions if position not in translated and position not in delivered
+    ]
+    stats.add(fallback=len(missing))
+    if glossary:
+        stats.add(glossary_misses=glossary.misses(translated))
+    if missing:
+        print(f"Translation is missing cues {missing}; keeping the original text for them")
+    if memory is not None:
+        found = [(cues[position].text, translated[position]) for position in positions if position in translated]
+        memory.put_many(found, target_language, _model_key(routing), PROMPT_VERSION)
+
+
+def _start_job(cues, chunks, duplicates, stats, reused=0):
+    requested = sum(len(chunk.items) for chunk in chunks)
+    fast = sum(len(chunk.items) for chunk in chunks if chunk.tier == FAST)
+    deduplicated = sum(len(repeats) for repeats in duplicates.values())
+    stats.add(
+        cues=len(cues),
+        requested=requested,
+        reused=reused,
+        deduplicated=deduplicated,
+        memory_hits=sum(1 for cue in cues if cue.text.strip()) - requested - reused - deduplicated,
+        requests=len(chunks),
+        fast_cues=fast,
+        premium_cues=requested - fast,
+    )
+
+
+# Translations carried over from the last revision of the same file (by revision_key), for the cues whose
+# text has not changed since; retimed or renumbered cues keep their translation and take the new timing.
+# The diff is reported on the "revisions.diff" span and as the `revised` counter of stats.
+def _previous_revision(revision_key, cues, target_language, routing=None, stats=None):
+    store = get_revision_store() if revision_key else None
+    previous = store.get(revision_key, target_language, _model_key(routing), PROMPT_VERSION) if store else None
+    if previous is None or len(previous[0]) != len(previous[1]):
+        return {}
+    old_cues, old_translations = previous
+    with span("revisions.diff", language=target_language) as current:
+        diff = diff_cues(old_cues, cues)
+        counts = diff.counts()
+        current.set(**counts)
+    if stats is not None:
+        stats.add(revised=counts[EDITED] + counts[ADDED])
+    return carry_over(diff, old_cues, old_translations)
+
+
+def _save_revision(revision_key, cues, translated_cues, target_language, routing=None):
+    store = get_revision_store() if revision_key else None
+    if store is not None:
+        store.put(revision_key, target_language, _model_key(routing), PROMPT_VERSION, cues, translated_cues)
+
+
+# Positions of a chunk to send again after its first answer: those that failed validation, and for a chunk on
+# the fast model also the lines that look doubtful (the whole chunk when too few lines passed), which the retry
+# sends to the premium model. Positions in `delivered` were already streamed out and are not sent again.
+def _escalations(cues, chunk, translated, failed, routing, stats, delivered=()):
+    if chunk.tier == FAST:
+        failed = routing.escalations(cues, chunk.items, translated, failed)
+    failed = [position for position in failed if position not in delivered]
+    if chunk.tier == FAST:
+        stats.add(escalated=len(failed))
+    return failed
+
+
+# Glossary entries for the prompt of the cues at `positions`, or None without a glossary
+def _glossary_entries(glossary, positions):
+    return glossary.entries(positions) if glossary else None
+
+
+# Names and terms of the cues still to translate: their index, the translations already pinned in the project
+# and the recurring terms that have none yet
+def _glossary_plan(cues, chunks, target_language, project):
+    positions = [position for chunk in chunks for position in chunk.items]
+    if not positions:
+        return None, {}, []
+    index = TermIndex(cues)
+    store = get_glossary_store() if project else None
+    pinned = store.get(project, target_language, index.terms(positions)) if store else {}
+    return index, pinned, [term for term in index.recurring(positions) if term not in pinned]
+
+
+# Prompt arguments for translating glossary terms: one term per line, with the cue each first occurs in as context
+def _terms_prompt(cues, index, terms):
+    first = dict.fromkeys(index.first_position(term) for term in terms)
+    return format_numbered_lines(terms), "\n".join(encode_line(cues[position].text) for position in first)
+
+
+# Pin the validated term translations of `output` in the project and build the film's glossary
+def _pin_terms(index, pinned, terms, output, target_language, project, stats):
+    found = {}
+    if output:
+        valid, _ = validate_lines(iter_numbered_lines([output]), terms)
+        found = {terms[number - 1]: text for number, text in valid.items()}
+    store = get_glossary_store() if project else None
+    pinned.update(store.pin_many(project, target_language, found) if store and found else found)
+    stats.add(glossary_terms=len(pinned))
+    return Glossary(index, pinned) if pinned else None
+
+
+# Steps pinning the renditions of the film's names and recurring terms before its chunks are translated: the
+# project's glossary (a series, say) is reused and the recurring terms it lacks are translated together in one
+# request, so every chunk, retry and later episode of the project renders them the same way. Each prompt only gets
+# the entries for the terms in its own lines. Without a project the glossary only lives for this film.
+def _prepare_glossary(cues, chunks, target_language, project, stats, model=TRANSLATION_MODEL):
+    index, pinned, terms = _glossary_plan(cues, chunks, target_language, project)
+    output = ""
+    if terms:
+        text, context_before = _terms_prompt(cues, index, terms)
+        try:
+            output = yield dict(
+                text=text, target_language=target_language, context_before=context_before, model=model, stats=stats
+            )
+        except TranslationError as e:
+            print(f"Could not translate the glossary terms: {e}")
+        stats.add(glossary_requests=1)
+    return _pin_terms(index, pinned, terms, output, target_language, project, stats)
+
+
+# Parse a source and plan its translation: the translations carried over from its last revision, the
+# translation memory hits and the chunks left to send. Returns (subtitles, memory, translations, chunks, duplicates).
+def _plan_job(source, target_language, stats, revision_key, routing):
+    # Parse the file into cues; only their plain texts go to the model
+    subtitles = load_subtitles(source)
+    cues = subtitles.cues
+    # Reuse the previous revision and the translation memory, and only send the rest to the API
+    memory = get_translation_memory()
+    known = _previous_revision(revision_key, cues, target_language, routing, stats)
+    translations, chunks, duplicates = _plan_translation(cues, target_language, memory, known, routing)
+    _start_job(cues, chunks, duplicates, stats, reused=len(known))
+    return subtitles, memory, translations, chunks, duplicates
+
+
+# Steps checking a chunk's answer (numbered line pairs) line by line: only the cues that fail, or that the fast
+# model got doubtful, are re-requested, then repeats take the same translation and every cue is held to the
+# limits of its own timing. Positions in `delivered` were already streamed out. Returns {position: translation}.
+def _settle_chunk(cues, chunk, pairs, target_language, duplicates, glossary, routing, stats, delivered=()):
+    translated, failed, issues = _align_output(cues, chunk.items, pairs)
+    stats.add(aligned=len(translated))
+    stats.add_issues(issues)
+    failed = _escalations(cues, chunk, translated, failed, routing, stats, delivered)
+    if failed:
+        translated.update(
+            (yield from _retry_failed(cues, failed, target_language, stats, glossary, routing.model(PREMIUM)))
+        )
+    _fan_out(translated, duplicates)
+    yield from _enforce_readability(cues, translated, target_language, stats, glossary, routing.model(chunk.tier))
+    return translated
+
+
+# Steps translating one chunk on the model of its tier and recording the outcome
+def _translate_chunk(cues, chunk, target_language, duplicates, glossary, routing, memory, stats):
+    text, context_before, context_after = _chunk_prompt(cues, chunk)
+    try:
+        output = yield dict(
+            text=text, target_language=target_language, context_before=context_before, context_after=context_after,
+            glossary=_glossary_entries(glossary, chunk.items), model=routing.model(chunk.tier), stats=stats,
+        )
+    except TranslationError:
+        # A chunk the fast model could not translate goes to the premium model as a whole
+        if chunk.tier != FAST:
+            raise
+        output = ""
+    translated = yield from _settle_chunk(
+        cues, chunk, iter_numbered_lines([output]), target_language, duplicates, glossary, routing, stats
+    )
+    positions = _with_repeats(chunk.items, duplicates)
+    _finish_chunk(cues, positions, translated, target_language, memory, stats, glossary=glossary, routing=routing)
+    return translated
+
+
+# Translate a subtitle file (any format load_subtitles reads) in token-budgeted chunks, several chunks at a
+# time, and return it in its own format with the source's styling and positioning. Every answer is aligned
+# line by line with the cues that were sent and only the cues that fail are re-requested; lines are then held
+# to the subtitle limits (re-wrapped, or sent back for a shorter rendition). Pass an AlignmentStats as
+# `stats` to collect the alignment counters of the job. With a revision_key (e.g. the Drive file ID) only the
+# cues edited since the last translated revision of that file are sent to the model. Names and recurring terms
+# are pinned in a glossary first; with a project (e.g. a series) the glossary is shared by all of its files.
+# `routing` (see filmbright_srt.routing.routing_policy) picks the model tier of each chunk: simple cues can go
+# to a fast model, whose failed or doubtful lines are escalated to the premium model.
+def translate_srt(
+    source, target_language, max_workers=MAX_CONCURRENT_CHUNKS, on_progress=None, stats=None, revision_key=None,
+    project=None, routing=None,
+):
+    stats = stats if stats is not None else AlignmentStats()
+    routing = routing_policy(routing)
+    subtitles, memory, translations, chunks, duplicates = _plan_job(
+        source, target_language, stats, revision_key, routing
+    )
+    cues = subtitles.cues
+    glossary = _run_steps(_prepare_glossary(cues, chunks, target_language, project, stats, routing.model(PREMIUM)))
+
+    def translate_chunk(chunk):
+        with span("translate.chunk", language=target_language, cues=len(chunk.items), tier=chunk.tier):
+            return _run_steps(
+                _translate_chunk(cues, chunk, target_language, duplicates, glossary, routing, memory, stats)
+            )
+
+    # Translate the chunks concurrently and put the results back in cue order;
+    # indices and timecodes are rebuilt locally and never pass through the model
+    results = run_chunks(chunks, translate_chunk, max_workers=max_workers, on_done=on_progress)
+    return _assemble(subtitles, translations, results, target_language, stats, revision_key, routing)
+
+
+# asyncio.gather that cancels the other coroutines as soon as one of them fails (asyncio.TaskGroup needs Python
+# 3.11), so the rest of a failed job stops taking request slots and tokens. Returns the results in order.
+async def gather_or_cancel(coroutines):
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+# translate_srt for coroutines: up to max_workers chunks in flight on the running event loop. The same steps run
+# here, but only the API requests are awaited on the loop; parsing, planning, the stores and the checks between
+# requests run in worker threads (asyncio.to_thread) so they never hold up the other jobs on the loop.
+async def translate_srt_async(
+    source, target_language, max_workers=MAX_CONCURRENT_CHUNKS, stats=None, revision_key=None, project=None,
+    routing=None,
+):
+    stats = stats if stats is not None else AlignmentStats()
+    routing = routing_policy(routing)
+    subtitles, memory, translations, chunks, duplicates = await asyncio.to_thread(
+        _plan_job, source, target_language, stats, revision_key, routing
+    )
+    cues = subtitles.cues
+    glossary = await _run_steps_async(
+        _prepare_glossary(cues, chunks, target_language, project, stats, routing.model(PREMIUM))
+    )
+    limit = asyncio.Semaphore(max(1, max_workers))
+
+    async def translate_chunk(chunk):
+        with span("translate.chunk", language=target_language, cues=len(chunk.items), tier=chunk.tier):
+            return await _run_steps_async(
+                _translate_chunk(cues, chunk, target_language, duplicates, glossary, routing, memory, stats), limit
+            )
+
+    results = await gather_or_cancel(translate_chunk(chunk) for chunk in chunks)
+    return await asyncio.to_thread(
+        _assemble, subtitles, translations, results, target_language, stats, revision_key, routing
+    )
+
+
+# Put chunk results ({position: translation}) back in cue order, check the timings, keep the revision and write
+# the document out in its format
+def _assemble(subtitles, translations, results, target_language, stats, revision_key, routing=None):
+    cues = subtitles.cues
+    for translated in results:
+        for position, text in translated.items():
+            translations[position] = text
+    output_cues = [cue.with_text(text) for cue, text in zip(cues, translations)]
+    stats.add(timing_mismatches=len(timing_mismatches(cues, output_cues)))
+    _save_revision(revision_key, cues, output_cues, target_language, routing)
+    return subtitles.serialize(output_cues)
+
+
+_STREAM_DONE = object()
+
+
+# Translate a subtitle source and yield translated cues in order as soon as they arrive from the model. The
+# cues carry plain text: write them with the writer of the source's document (load_subtitles(source).writer)
+# to get the file back in its format, styling included.
+# Chunks stream concurrently, but only max_workers chunks run ahead of the consumer, so memory stays flat.
+# Lines are passed on as they arrive, so a cue is only re-requested when its line never came back usable;
+# a line that breaks the subtitle limits even once re-wrapped is held back for a shorter rendition, and a
+# doubtful line from the fast model is held back for the premium model.
+def translate_srt_stream(
+    source, target_language, max_workers=MAX_CONCURRENT_CHUNKS, on_progress=None, stats=None, revision_key=None,
+    project=None, routing=None,
+):
+    stats = stats if stats is not None else AlignmentStats()
+    routing = routing_policy(routing)
+    subtitles, memory, translations, chunks, duplicates = _plan_job(
+        source, target_language, stats, revision_key, routing
+    )
+    cues = subtitles.cues
+    chunk_of = {position: chunk for chunk in chunks for position in _with_repeats(chunk.items, duplicates)}
+    glossary = _run_steps(_prepare_glossary(cues, chunks, target_language, project, stats, routing.model(PREMIUM)))
+
+    def stream_chunk(chunk, out):
+        try:
+            with span("translate.chunk", language=target_language, cues=len(chunk.items), tier=chunk.tier):
+                deliver_chunk(chunk, out)
+            out.put(_STREAM_DONE)
+        except Exception as e:
+            out.put(e)
+
+    def deliver_chunk(chunk, out):
+        pairs = []
+        seen = set()
+        delivered = set()
+        text, context_before, context_after = _chunk_prompt(cues, chunk)
+        lines = translate_text_stream(
+            text, target_language, context_before, context_after, _glossary_entries(glossary, chunk.items),
+            routing.model(chunk.tier), stats,
+        )
+        try:
+            for number, text in lines:
+                pairs.append((number, text))
+                if 1 <= number <= len(chunk.items) and text and number not in seen:
+                    seen.add(number)
+                    position = chunk.items[number - 1]
+                    if chunk.tier == FAST and doubtful(cues[position].text, text):
+                        continue
+                    # Lines that break the subtitle limits wait for their shorter rendition; so do the repeats of
+                    # a cue that only break them with their own timing
+                    for target in (position, *duplicates.get(position, ())):
+                        fitted = _fit_line(cues, target, text)
+                        if fitted is not None:
+                            delivered.add(target)
+                            out.put((target, fitted))
+        except TranslationError:
+            # The lines the fast model did deliver are kept; the premium model takes the rest
+            if chunk.tier != FAST:
+                raise
+        translated = _run_steps(
+            _settle_chunk(cues, chunk, pairs, target_language, duplicates, glossary, routing, stats, delivered)
+        )
+        for position, text in translated.items():
+            if position not in delivered:
+                out.put((position, text))
+        positions = _with_repeats(chunk.items, duplicates)
+        _finish_chunk(cues, positions, translated, target_language, memory, stats, delivered, glossary, routing)
+        validated.update(translated)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    upcoming = iter(chunks)
+    outputs = {}
+    validated = {}
+
+    def start_next_chunk():
+        chunk = next(upcoming, None)
+        if chunk is not None:
+            outputs[chunk.position] = queue.Queue()
+            executor.submit(in_context(stream_chunk), chunk, outputs[chunk.position])
+
+    try:
+        for _ in range(max_workers):
+            start_next_chunk()
+
+        received = {}
+        finished = set()
+        for position, cue in enumerate(cues):
+            chunk = chunk_of.get(position)
+            if chunk is None:
+                yield cue.with_text(translations[position])
+                continue
+
+            # Read from this chunk's stream until the cue arrives or the chunk ends
+            while position not in received and chunk.position not in finished:
+                item = outputs[chunk.position].get()
+                if item is _STREAM_DONE:
+                    finished.add(chunk.position)
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    received[item[0]] = item[1]
+            # Repeats of a cue can come long after its chunk has finished, so each line is dropped once used
+            yield cue.with_text(received.pop(position, cue.text))
+
+            if position == chunk.items[-1]:
+                # Wait for the chunk to be validated, so that only checked lines are kept for the next revision
+                while chunk.position not in finished:
+                    item = outputs[chunk.position].get()
+                    if item is _STREAM_DONE:
+                        finished.add(chunk.position)
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        received[item[0]] = item[1]
+                for p in chunk.items:
+                    received.pop(p, None)
+                del outputs[chunk.position]
+                start_next_chunk()
+                if on_progress:
+                    on_progress(chunk.position + 1, len(chunks))
+
+        if revision_key:
+            for position, text in validated.items():
+                translations[position] = text
+            translated_cues = [cue.with_text(text) for cue, text in zip(cues, translations)]
+            _save_revision(revision_key, cues, translated_cues, target_language, routing)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,94 @@
+# filmbright_srt/ui.py
+
+import streamlit as st
+
+# Filmbright branding (green #8DC83D and white) shared by every Streamlit page
+BRAND_CSS = """
+    <style>
+    /* Use a clean, modern font */
+    @import url('https://fonts.googleapis.com/css2?family=Montserrat:wght@400;600&display=swap');
+
+    html, body, [class*="css"]  {
+        font-family: 'Montserrat', sans-serif;
+        background-color: #FFFFFF; /* White background */
+    }
+
+    /* Logo styling */
+    .filmbright-logo {
+        display: block;
+        margin: 0 auto 1rem auto;
+        text-align: center;
+    }
+
+    /* Title styling */
+    .main-title {
+        color: #8DC83D;
+        font-size: 2.2rem;
+        font-weight: 600;
+        text-align: center;
+        margin-bottom: 0.2rem;
+    }
+
+    /* Subtitle styling */
+    .subtitle {
+        color: #333333;
+        font-size: 1rem;
+        text-align: center;
+        margin-bottom: 2rem;
+    }
+
+    /* Streamlit Button styling */
+    .stButton button {
+        background-color: #8DC83D;
+        color: #FFFFFF;
+        border: none;
+        padding: 0.6rem 1.2rem;
+        border-radius: 5px;
+        cursor: pointer;
+        font-weight: 600;
+        transition: background-color 0.3s ease;
+    }
+    .stButton button:hover {
+        background-color: #7BB02E;
+    }
+
+    /* Streamlit warnings, errors, successes */
+    .stAlert {
+        border-radius: 5px;
+    }
+    .stWarning, .stError, .stSuccess {
+        padding: 1rem;
+    }
+    /* Table or widget text color */
+    .css-1kyxreq {
+        color: #333333;
+    }
+    </style>
+"""
+
+# Hide Streamlit menu and footer
+HIDE_STREAMLIT_CHROME_CSS = """
+    <style>
+    /* Hide Streamlit menu and footer */
+    #MainMenu {visibility: hidden;}
+    footer {visibility: hidden;}
+    header {visibility: hidden;}
+    </style>
+"""
+
+# Both style blocks in a single element, so every rerun sends one small delta instead of several
+PAGE_CSS = BRAND_CSS + HIDE_STREAMLIT_CHROME_CSS
+
+
+def apply_branding():
+    st.markdown(PAGE_CSS, unsafe_allow_html=True)
+
+
+# Logo image, loaded once per process instead of on every rerun
+@st.cache_resource
+def load_logo(path="assets/filmbright_logo.png"):
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.load()
+        return image.copy()
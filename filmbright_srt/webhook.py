@@ -0,0 +1,291 @@
+# filmbright_srt/webhook.py
+
+import asyncio
+import ipaddress
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from filmbright_srt.alignment import AlignmentStats
+from filmbright_srt.batch import translate_srt_many_async, translated_file_name, zip_translations
+from filmbright_srt.ratelimit import get_scheduler
+from filmbright_srt.routing import routing_policy
+from filmbright_srt.tracing import get_span_metrics
+from filmbright_srt.translation import load_subtitles, translate_srt_async
+
+# Starlette, the job queue and the Drive modules are imported where they are used, so that importing this module
+# (e.g. from the Streamlit page on every rerun) stays cheap until the service actually starts
+
+
+# Drive services are per thread, so each blocking call authenticates on the worker thread that runs it
+def _download(file_id):
+    from filmbright_srt.drive import authenticate_google_drive, download_srt_file
+
+    return download_srt_file(authenticate_google_drive(), file_id)
+
+
+def _upload(content, file_name):
+    from filmbright_srt.drive import TRANSLATED_FILES_FOLDER_ID, authenticate_google_drive, upload_file_to_drive
+
+    return upload_file_to_drive(authenticate_google_drive(), content, file_name, TRANSLATED_FILES_FOLDER_ID)
+
+
+# Download, translate and upload one file. Runs as a task on the event loop: the blocking Drive calls go to
+# worker threads and the translation awaits the async OpenAI client, so many jobs share one loop.
+async def process_translation_job(payload, set_stage):
+    from filmbright_srt.drive import TRANSLATED_FILES_FOLDER_ID
+    from filmbright_srt.transfers import upload_files
+
+    if "file_ids" in payload:
+        return await process_bundle_job(payload, set_stage)
+    file_id = payload["file_id"]
+    file_name = payload["file_name"]
+    target_languages = payload.get("target_languages") or [payload["target_language"]]
+    project = payload.get("project")
+    routing = payload.get("routing")
+
+    # Authenticate Google Drive and download the file into memory
+    await set_stage("download")
+    source = await asyncio.to_thread(_download, file_id)
+
+    # Translate the subtitle file; the outputs keep its format (SRT, WebVTT, ASS/SSA or TTML)
+    await set_stage("translate")
+    subtitles = await asyncio.to_thread(load_subtitles, source, file_name=file_name)
+    stats = AlignmentStats()
+    if len(target_languages) == 1:
+        target_language = target_languages[0]
+        translated_content = await translate_srt_async(
+            subtitles, target_language, stats=stats, revision_key=file_id, project=project, routing=routing
+        )
+
+        # Upload the translated file to Google Drive
+        await set_stage("upload")
+        translated_file_id = await asyncio.to_thread(
+            _upload, translated_content, f"translated_{target_language}{subtitles.extension}"
+        )
+        return {"translated_file_id": translated_file_id, "alignment": stats.as_dict()}
+
+    # Several languages: parse once, translate concurrently and upload every file plus a zip of all of them
+    translations = await translate_srt_many_async(
+        subtitles, target_languages, stats=stats, revision_key=file_id, project=project, routing=routing
+    )
+    await set_stage("upload")
+    files = [(f"translated_{language}{subtitles.extension}", content) for language, content in translations.items()]
+    zip_name = f"translated_{os.path.splitext(file_name)[0]}.zip"
+    files.append((zip_name, zip_translations(translations, file_name), "application/zip"))
+    *translated_ids, zip_file_id = await asyncio.to_thread(upload_files, files, TRANSLATED_FILES_FOLDER_ID)
+    return {
+        "translated_file_ids": dict(zip(translations, translated_ids)),
+        "zip_file_id": zip_file_id,
+        "alignment": stats.as_dict(),
+    }
+
+
+# Bundle of files (e.g. every episode of a season): names come from one batched metadata call, downloads
+# and uploads run concurrently, and each output is named "{language}_{original name}". The files share one
+# glossary: the payload's project, or else the bundle's own (named after its first file).
+async def process_bundle_job(payload, set_stage):
+    from filmbright_srt.drive import TRANSLATED_FILES_FOLDER_ID
+    from filmbright_srt.transfers import download_files, get_files_metadata, upload_files
+
+    file_ids = list(dict.fromkeys(payload["file_ids"]))
+    target_languages = payload.get("target_languages") or [payload["target_language"]]
+    project = payload.get("project") or f"bundle:{file_ids[0]}"
+    routing = payload.get("routing")
+
+    await set_stage("download")
+    metadata = await asyncio.to_thread(get_files_metadata, file_ids, fields="id, name")
+    sources = await asyncio.to_thread(download_files, file_ids)
+
+    await set_stage("translate")
+    stats = AlignmentStats()
+    outputs = []
+    for file_id in file_ids:
+        file_name = metadata[file_id]["name"]
+        subtitles = await asyncio.to_thread(load_subtitles, sources.pop(file_id), file_name=file_name)
+        translations = await translate_srt_many_async(
+            subtitles, target_languages, stats=stats, revision_key=file_id, project=project,
+            routing=routing,
+        )
+        for language, content in translations.items():
+            outputs.append((file_id, language, translated_file_name(language, file_name), content))
+
+    await set_stage("upload")
+    uploaded_ids = await asyncio.to_thread(
+        upload_files, [(name, content) for _, _, name, content in outputs], TRANSLATED_FILES_FOLDER_ID
+    )
+    translated_file_ids = {file_id: {} for file_id in file_ids}
+    for (file_id, language, _, _), uploaded_id in zip(outputs, uploaded_ids):
+        translated_file_ids[file_id][language] = uploaded_id
+    return {"translated_file_ids": translated_file_ids, "alignment": stats.as_dict()}
+
+
+def _error(message, status_code):
+    from starlette.responses import JSONResponse
+
+    return JSONResponse({"status": "error", "message": message}, status_code=status_code)
+
+
+def _non_empty_string(value):
+    return isinstance(value, str) and bool(value.strip())
+
+
+# A callback URL the service may post to: http(s) with a host, and not this machine or a private network
+# (an IP literal that is not globally routable, or localhost)
+def _callback_url(value):
+    if not isinstance(value, str):
+        return False
+    try:
+        url = urlsplit(value.strip())
+        host = url.hostname
+    except ValueError:
+        return False
+    if url.scheme not in ("http", "https") or not host:
+        return False
+    if host == "localhost" or host.endswith(".localhost"):
+        return False
+    try:
+        return ipaddress.ip_address(host).is_global
+    except ValueError:
+        return True
+
+
+# Webhook endpoint: queue the job and answer 202 right away
+async def handle_webhook(request):
+    from starlette.responses import JSONResponse
+
+    try:
+        data = await request.json()
+    except ValueError:
+        return _error("Request body must be JSON", 400)
+    if not isinstance(data, dict):
+        return _error("Request body must be a JSON object", 400)
+    file_id = data.get("file_id")
+    file_name = data.get("file_name")
+    file_ids = data.get("file_ids")
+    target_language = data.get("target_language")
+    target_languages = data.get("target_languages")
+
+    if not all([file_ids or (file_id and file_name), target_language or target_languages]):
+        return _error("Missing required fields", 400)
+    if target_language is not None and not _non_empty_string(target_language):
+        return _error("target_language must be a language name", 400)
+    if target_languages is not None and not (
+        isinstance(target_languages, list) and all(_non_empty_string(language) for language in target_languages)
+    ):
+        return _error("target_languages must be a list of language names", 400)
+    if not file_ids and not (_non_empty_string(file_id) and _non_empty_string(file_name)):
+        return _error("file_id and file_name must be strings", 400)
+    if file_ids is not None and not (
+        isinstance(file_ids, list) and all(_non_empty_string(file_id) for file_id in file_ids)
+    ):
+        return _error("file_ids must be a list of Drive file IDs", 400)
+    if data.get("callback_url") is not None and not _callback_url(data["callback_url"]):
+        return _error("callback_url must be a public http(s) URL", 400)
+    if data.get("project") is not None and not isinstance(data["project"], str):
+        return _error("project must be a string", 400)
+    # routing: a mode name ("auto", "premium", "fast") or an object of options, see filmbright_srt.routing
+    try:
+        routing_policy(data.get("routing"))
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    payload = {"file_ids": file_ids} if file_ids else {"file_id": file_id, "file_name": file_name}
+    if target_languages:
+        payload["target_languages"] = target_languages
+    else:
+        payload["target_language"] = target_language
+    if data.get("project"):
+        payload["project"] = data["project"]
+    if data.get("routing") is not None:
+        payload["routing"] = data["routing"]
+    if data.get("callback_url"):
+        payload["callback_url"] = data["callback_url"]
+
+    job_id = await request.app.state.jobs.submit(payload)
+    status_url = str(request.url_for("job_status", job_id=job_id))
+    return JSONResponse(
+        {"status": "queued", "job_id": job_id, "status_url": status_url},
+        status_code=202,
+        headers={"Location": status_url},
+    )
+
+
+# Job status and result endpoint
+async def job_status(request):
+    from starlette.responses import JSONResponse
+
+    job = await request.app.state.jobs.get(request.path_params["job_id"])
+    if job is None:
+        return _error("Unknown job", 404)
+
+    body = {"job_id": job["job_id"], "status": job["status"], "stage": job["stage"]}
+    if job["result"]:
+        body.update(job["result"])
+    if job["error"]:
+        body["message"] = job["error"]
+    return JSONResponse(body)
+
+
+# OpenAI scheduler metrics (queue depth, throttling, retries) and the number of jobs waiting or running
+async def rate_limit_metrics(request):
+    from starlette.responses import JSONResponse
+
+    metrics = get_scheduler().metrics()
+    metrics["job_queue_depth"] = request.app.state.jobs.depth
+    return JSONResponse(metrics)
+
+
+# Per-stage timings (histograms), errors, bytes and tokens of every span in the Prometheus text format,
+# with the current depth of the job and request queues
+async def prometheus_metrics(request):
+    from starlette.responses import PlainTextResponse
+
+    scheduler = get_scheduler().metrics()
+    gauges = {
+        "srt_job_queue_depth": (request.app.state.jobs.depth, "Jobs queued or running in this process"),
+        "srt_request_queue_depth": (scheduler["queue_depth"], "Translation requests waiting for a slot"),
+        "srt_requests_in_flight": (scheduler["in_flight"], "Translation requests in flight"),
+        "srt_request_budget_available": (scheduler["request_budget_available"], "Requests left in the rate limit"),
+        "srt_token_budget_available": (scheduler["token_budget_available"], "Tokens left in the rate limit"),
+    }
+    return PlainTextResponse(get_span_metrics().render(gauges), media_type="text/plain; version=0.0.4")
+
+
+# Span-by-span trace of a job: live while it runs, stored with the job once it has finished
+async def job_trace(request):
+    from starlette.responses import JSONResponse
+
+    trace = await request.app.state.jobs.trace(request.path_params["job_id"])
+    if trace is None:
+        return _error("Unknown job or no trace recorded", 404)
+    return JSONResponse(trace)
+
+
+# The job queue lives on the server's event loop; jobs left unfinished by a previous run are picked up again
+@asynccontextmanager
+async def webhook_lifespan(app):
+    from filmbright_srt.jobs import JobQueue
+
+    app.state.jobs = JobQueue(process_translation_job)
+    recovered = await app.state.jobs.recover()
+    if recovered:
+        print(f"Recovered {recovered} unfinished jobs")
+    try:
+        yield
+    finally:
+        await app.state.jobs.shutdown()
+
+
+# ASGI application serving /webhook, /jobs/{job_id}, /rate-limit and /metrics
+def create_app():
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+
+    routes = [
+        Route("/webhook", handle_webhook, methods=["POST"]),
+        Route("/jobs/{job_id}", job_status, methods=["GET"], name="job_status"),
+        Route("/jobs/{job_id}/trace", job_trace, methods=["GET"]),
+        Route("/rate-limit", rate_limit_metrics, methods=["GET"]),
+        Route("/metrics", prometheus_metrics, methods=["GET"]),
+    ]
+    return Starlette(routes=routes, lifespan=webhook_lifespan)